@@ -0,0 +1,57 @@
+/*
+ * SF49 Studio 디자인 완성 축하 효과 (canvas-confetti.min.js가 먼저 로드되어 있어야 함)
+ */
+(function (global) {
+  'use strict';
+
+  var DURATION = 5 * 1000;
+
+  function randomInRange(min, max) {
+    return Math.random() * (max - min) + min;
+  }
+
+  // 화면 양옆에서 색종이를 뿌림
+  function sideCannons() {
+    var end = Date.now() + DURATION;
+    (function frame() {
+      global.confetti({ particleCount: 3, angle: 60, spread: 55, origin: { x: 0 } });
+      global.confetti({ particleCount: 3, angle: 120, spread: 55, origin: { x: 1 } });
+      if (Date.now() < end) {
+        global.requestAnimationFrame(frame);
+      }
+    }());
+  }
+
+  // 좌우 상단에서 점점 잦아드는 불꽃
+  function fireworks() {
+    var animationEnd = Date.now() + DURATION;
+    var defaults = { startVelocity: 30, spread: 360, ticks: 60 };
+    (function frame() {
+      var timeLeft = animationEnd - Date.now();
+      if (timeLeft <= 0) {
+        return;
+      }
+      var particleCount = 50 * (timeLeft / DURATION);
+      global.confetti(Object.assign({}, defaults, {
+        particleCount: particleCount,
+        origin: { x: randomInRange(0.1, 0.3), y: Math.random() - 0.2 }
+      }));
+      global.confetti(Object.assign({}, defaults, {
+        particleCount: particleCount,
+        origin: { x: randomInRange(0.7, 0.9), y: Math.random() - 0.2 }
+      }));
+      global.requestAnimationFrame(frame);
+    }());
+  }
+
+  // canvas-confetti를 아직 받지 않았으면(tools/vendor_assets.py) 효과 없이 넘어감
+  function whenLoaded(effect) {
+    return function () {
+      if (typeof global.confetti === 'function') {
+        effect();
+      }
+    };
+  }
+
+  global.sf49Effects = { confetti: whenLoaded(sideCannons), fireworks: whenLoaded(fireworks) };
+})(window);
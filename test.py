@@ -1,13 +1,33 @@
 import streamlit as st 
-from openai import OpenAI
+import httpx
+from openai import DefaultHttpxClient, NotFoundError, OpenAI, OpenAIError
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
-from typing import Dict, List, Optional
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
 import time
 import random
 import io
-import base64
-from PIL import Image
+import os
+import hashlib
+import importlib.util
+import hmac
+import mimetypes
+import re
+import socket
+import sys
+import sqlite3
+import uuid
+import unicodedata
+from email.utils import parsedate_to_datetime
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from PIL import Image, features
 from streamlit_extras.stylable_container import stylable_container
 
 st.set_page_config(
@@ -17,6 +37,50 @@ st.set_page_config(
         initial_sidebar_state="collapsed",
     )
     
+def get_setting(name: str, default=None):
+    """환경 변수 → st.secrets 순서로 설정값 조회"""
+    if name in os.environ:
+        return os.environ[name]
+    try:
+        return st.secrets.get(name, default)
+    except FileNotFoundError:
+        return default
+
+STREAM_RESPONSES = True  # 런 이벤트 스트림으로 토큰을 받아 바로 표시
+USE_TYPEWRITER = True  # 스트리밍하지 않은 응답에 타이핑 효과 적용
+TYPEWRITER_FRAME_SECONDS = 1 / 30  # 화면 갱신 최소 간격 (프레임 예산)
+
+SNAIL_FRAMES = [
+    "🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
+    "⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
+    "⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
+    "⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
+    "⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
+    "⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
+    "⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
+    "⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
+    "⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
+    "⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
+    "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
+    "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
+    "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
+    "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
+    "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
+    "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
+    "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
+    "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯",
+    "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯",
+    "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯",
+    "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯",
+    "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯",
+    "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯",
+    "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯",
+    "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯",
+    "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯",
+    "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯",
+    "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌",
+]
+
 def set_custom_style():
     with stylable_container(
         key="main_container",
@@ -27,593 +91,2419 @@ def set_custom_style():
             }
         """
     ):
-        st.markdown("""
-            <style>
-            /* Streamlit 메인 컨테이너 배경색 오버라이드 */
-            .st-emotion-cache-1jicfl2 {
-                background: transparent !important;
-            }
-
-            .st-emotion-cache-bm2z3a {
-                background: transparent !important;
-            }
-            
-            /* 네비게이션 컨테이너 */
-            .nav-container {
-                position: fixed;
-                top: 4.5rem;  /* Streamlit 헤더 고려 */
-                right: 20px;
-                z-index: 1000;
-                display: flex;
-                gap: 0.5rem;
-                background: transparent;
-            }
-
-            /* 아이콘 버튼 */
-            .nav-icon {
-                width: 40px;
-                height: 40px;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                background: rgba(255, 255, 255, 0.1);
-                border-radius: 50%;
-                cursor: pointer;
-                transition: all 0.3s ease;
-                backdrop-filter: blur(10px);
-                font-size: 1.2rem;
-                text-decoration: none;
-                color: rgba(255, 255, 255, 0.8);
-                position: relative;
-                border: 1px solid rgba(255, 255, 255, 0.1);
-            }
-
-            .nav-icon:hover {
-                background: rgba(255, 75, 75, 0.2);
-                transform: translateY(-2px);
-                border-color: rgba(255, 75, 75, 0.3);
-            }
-
-            /* 툴팁 */
-            .nav-icon::after {
-                content: attr(data-tooltip);
-                position: absolute;
-                right: 50px;
-                top: 50%;
-                transform: translateY(-50%);
-                background: rgba(0, 0, 0, 0.8);
-                color: white;
-                padding: 0.5rem 1rem;
-                border-radius: 4px;
-                font-size: 0.875rem;
-                white-space: nowrap;
-                opacity: 0;
-                visibility: hidden;
-                transition: all 0.3s ease;
-                backdrop-filter: blur(10px);
-            }
-
-            .nav-icon:hover::after {
-                opacity: 1;
-                visibility: visible;
-                right: 45px;
-            }
-            
-            /* 채팅 인터페이스 */
-            .stChatMessage {
-                background: rgba(45, 45, 45, 0.95) !important;  /* 어두운 회색 배경 */
-                border: 1px solid rgba(255, 255, 255, 0.1);
-                border-radius: 8px;
-                padding: 1.2rem !important;
-                margin: 1.2rem 0 !important;
-                box-shadow: 0 8px 24px rgba(0, 0, 0, 0.2),   /* 외부 그림자 */
-                            0 2px 8px rgba(0, 0, 0, 0.1),     /* 중간 그림자 */
-                            0 1px 3px rgba(0, 0, 0, 0.05);    /* 미세 그림자 */
-                font-size: 1.1rem !important;
-                color: rgba(255, 255, 255, 0.9) !important;
-                transform: translateY(0);                      /* 애니메이션 시작 위치 */
-                transition: all 0.3s ease;                    /* 부드러운 전환 효과 */
-            }
+        # 첫 화면부터 적용돼야 하는 스타일이므로 iframe으로 나중에 받지 않고 (줄인) CSS를 인라인
+        st.markdown(f"<style>{read_asset('style.css')}</style>", unsafe_allow_html=True)
 
-            .stChatMessage:hover {
-                border-color: rgba(255, 75, 75, 0.2);
-                background: rgba(50, 50, 50, 0.95) !important;
-                box-shadow: 0 12px 28px rgba(0, 0, 0, 0.25),  /* 호버 시 그림자 강화 */
-                            0 4px 10px rgba(0, 0, 0, 0.15),
-                            0 2px 4px rgba(0, 0, 0, 0.1);
-                transform: translateY(-2px);                   /* 호버 시 살짝 위로 떠오르는 효과 */
-            }
-
-            /* 채팅 메시지 내부의 모든 텍스트 요소에 대한 색상 지정 */
-            .stChatMessage p, 
-            .stChatMessage span, 
-            .stChatMessage div {
-                color: rgba(255, 255, 255, 0.9) !important;  /* 하얀색 글씨 */
-            }
-
-            /* 입력 필드 */
-            .stTextInput > div > div > input {
-                background: rgba(255, 255, 255, 0.05);
-                border: 1px solid rgba(255, 255, 255, 0.1);
-                padding: 1rem 1.2rem !important;
-                border-radius: 6px;
-                color: white;
-                width: calc(100% - 2rem);
-                margin: 0 auto;
-                font-size: 1.1rem !important;
-            }
-            
-            .stTextInput > div > div > input:focus {
-                border-color: #FF4B4B;
-                box-shadow: 0 0 0 1px rgba(255, 75, 75, 0.3);
-            }
-            
-            /* 프로그레스 바 */
-            .stProgress > div > div {
-                background: linear-gradient(90deg, #1DB954, #1ED760) !important;
-            }
-            
-            .stProgress {
-                background: rgba(255, 255, 255, 0.1);
-            }
-            
-            /* 캡션과 설명 텍스트 */
-            .header-subtitle {
-                color: rgba(255, 255, 255, 0.7);
-                font-size: 1.3rem !important;
-                margin-bottom: 2rem;
-            }
-            
-            .intro-text {
+def typewriter_effect(text: str, speed: float = 0.03, frame_budget: float = TYPEWRITER_FRAME_SECONDS):
+    """텍스트를 타이핑 효과로 표시 (글자마다가 아니라 프레임 예산마다 묶어서 갱신)"""
+    with stylable_container(
+        key="typewriter",
+        css_styles="""
+            {
                 background: rgba(255, 255, 255, 0.05);
-                padding: 1.5rem;
-                border-radius: 8px;
-                border: 1px solid rgba(255, 255, 255, 0.1);
-                margin: 1rem 0 2rem 0;
-                box-shadow: 0 4px 15px rgba(0, 0, 0, 0.2);
-            }
-            
-            /* 이미지 스일 */
-            .image-container {
-                margin: 1rem 0;
-                transition: all 0.3s ease;
-                position: relative;
-                box-shadow: 0 4px 15px rgba(0, 0, 0, 0.3);
-                width: 100%;
-            }
-            
-            .image-container img {
-                width: 100%;
                 border-radius: 8px;
-                border: 1px solid rgba(255, 255, 255, 0.1);
-                display: block;
-            }
-            
-            .image-container:hover {
-                transform: scale(1.02);
-            }
-            
-            .image-caption {
-                text-align: center;
-                color: rgba(255, 255, 255, 0.7);
-                margin-top: 0.8rem;
-                font-size: 1.1rem !important;
-            }
-
-            /* 이미지 오버레이 버튼 */
-            .image-container .overlay-buttons {
-                position: absolute;
-                top: 10px;
-                right: 10px;
-                display: flex;
-                gap: 0.5rem;
-                opacity: 0;
-                transition: opacity 0.3s ease;
-            }
-
-            .image-container:hover .overlay-buttons {
-                opacity: 1;
-            }
-
-            .overlay-button {
-                background: rgba(0, 0, 0, 0.6);
-                color: white;
-                border: none;
-                padding: 0.5rem;
-                border-radius: 50%;
-                cursor: pointer;
-                font-size: 1.2rem;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                transition: background 0.3s ease;
-            }
-
-            .overlay-button:hover {
-                background: rgba(255, 75, 75, 0.8);
-            }
-
-            /* Streamlit 기본 요소 조정 */
-            .stDeployButton {
-                display: none;
-            }
-            
-            header[data-testid="stHeader"] {
-                background: rgba(26, 27, 30, 0.9);
-                backdrop-filter: blur(10px);
-            }
-
-            .main > div:first-child {
-                padding-top: 5rem !important;  /* 상단 여백 추가 */
-            }
-
-            /* st-emotion-cache 영역 조정 */
-            .st-emotion-cache-qcqlej {
-                max-height: 70vh !important;
-                overflow-y: auto;
-            }
-
-            /* 채팅 컨테이너 스타일 */
-            .chat-container {
-                display: flex;
-                flex-direction: column;
-                height: calc(100vh - 200px);
-                margin-bottom: 20px;
-            }
-
-            .messages-container {
-                flex-grow: 1;
-                overflow-y: auto;
-                padding: 20px;
-                margin-bottom: 20px;
+                padding: 1rem;
+                margin: 0.5rem 0;
             }
+        """
+    ):
+        message_placeholder = st.empty()
+        # 보일 글자 수는 경과 시간으로 정함 (렌더링이 느려도 전체 시간은 약 len(text) * speed)
+        started = time.monotonic()
+        shown = 0
+        while speed > 0:
+            visible = int((time.monotonic() - started) / speed)
+            if visible >= len(text):
+                break
+            if visible > shown:
+                message_placeholder.markdown(text[:visible] + "▌")
+                shown = visible
+            time.sleep(frame_budget)
+        message_placeholder.markdown(text)
+        return message_placeholder
 
-            .input-container {
-                position: fixed;
-                bottom: 0;
-                left: 0;
-                right: 0;
-                background: rgba(26, 27, 30, 0.95);
-                padding: 20px;
-                backdrop-filter: blur(10px);
-                border-top: 1px solid rgba(255, 255, 255, 0.1);
-                z-index: 1000;
-            }
-            
-            /* Streamlit 기본 헤더 완전히 제거 */
-            .stAppHeader,
-            header[data-testid="stHeader"],
-            .stHeader,
-            header.st-emotion-cache-8ahh38,
-            header.ezrtsby2 {
-                display: none !important;
-                visibility: hidden !important;
-                height: 0 !important;
-                padding: 0 !important;
-                margin: 0 !important;
-                opacity: 0 !important;
-                pointer-events: none !important;
-            }
+class StreamingText:
+    """스트리밍 토큰을 모아 두었다가 프레임 예산마다 한 번씩 화면에 반영"""
 
-            /* 네비게이션 컨테이너를 최상단에 고정 */
-            .nav-container {
-                position: fixed !important;
-                top: 0 !important;
-                left: 0 !important;
-                right: 0 !important;
-                height: 60px !important;
-                background-color: #FF5722 !important;
-                display: flex !important;
-                justify-content: flex-start !important;
-                align-items: center !important;
-                padding: 0 20px !important;
-                padding-left: 60% !important;
-                z-index: 999999 !important;
-                gap: 10px !important;
-                box-shadow: 0 2px 10px rgba(0, 0, 0, 0.3) !important;
-            }
+    def __init__(self, placeholder, frame_budget: float = TYPEWRITER_FRAME_SECONDS):
+        self.placeholder = placeholder
+        self.frame_budget = frame_budget
+        self._parts: List[str] = []
+        self._last_flush = 0.0
 
-            /* 아이콘 크기 조정 */
-            .nav-icon {
-                width: 40px !important;
-                height: 40px !important;
-                font-size: 1.5rem !important;
-                background: rgba(255, 255, 255, 0.1) !important;
-                border: none !important;
-                display: flex !important;
-                align-items: center !important;
-                justify-content: center !important;
-                margin: 0 5px !important;
-                transition: all 0.3s ease !important;
-                box-shadow: 0 2px 5px rgba(0, 0, 0, 0.2) !important;
-                border-radius: 50% !important;
-            }
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
 
-            .nav-icon:hover {
-                background: rgba(255, 255, 255, 0.2) !important;
-                transform: translateY(-2px) !important;
-                box-shadow: 0 4px 8px rgba(0, 0, 0, 0.3) !important;
-            }
+    def append(self, delta: str):
+        self._parts.append(delta)
+        if time.monotonic() - self._last_flush >= self.frame_budget:
+            self.flush(cursor=True)
 
-            /* 툴팁 위치 재조정 */
-            .nav-icon::after {
-                top: 65px !important;
-            }
+    def new_paragraph(self):
+        """다음 메시지를 앞 메시지와 붙지 않게 문단을 나눔 (앞 내용이 있을 때만)"""
+        if self._parts and not self.text.endswith("\n\n"):
+            self._parts.append("\n\n")
 
-            /* 메인 컨텐츠 여백 조정 */
-            .main > div:first-child {
-                padding-top: 60px !important;
-            }
-            
-            /* 불필요한 여백 제거 */
-            .st-emotion-cache-1v0mbdj,  /* stVerticalBlock */
-            .st-emotion-cache-16idsys,
-            .st-emotion-cache-10trblm,
-            .st-emotion-cache-1kyxreq,
-            .st-emotion-cache-1wbqy5l {
-                margin: 0 !important;
-                padding: 0 !important;
-                height: auto !important;
-                min-height: 0 !important;
-            }
+    def flush(self, cursor: bool = False):
+        if self._parts:
+            self.placeholder.markdown(self.text + ("▌" if cursor else ""))
+        self._last_flush = time.monotonic()
 
-            /* 제목과 컨텐츠 위치 조정 */
-            [data-testid="stVerticalBlock"] {
-                gap: 0 !important;
-                padding: 0 !important;
-            }
+CONFETTI_ASSET = "canvas-confetti.min.js"  # tools/vendor_assets.py로 받은 canvas-confetti 1.4.0
 
-            /* 상단 여백 조정 */
-            .main .block-container {
-                padding-top: 60px !important;  /* 헤더 높이만큼만 여백 설정 */
-                max-width: none !important;
-            }
-
-            /* 추가 여백 제거 */
-            .st-emotion-cache-18ni7ap {
-                padding: 0 !important;
-            }
-
-            .st-emotion-cache-6qob1r {
-                margin: 0 !important;
-                padding: 0 !important;
-            }
-            
-            /* Streamlit 기본 텍스트 크기 조정 */
-            .stMarkdown, .stText {
-                font-size: 1.1rem !important;
-            }
-
-            /* 제목 크기 조정 */
-            h1 {
-                font-size: 2.5rem !important;
-            }
+def confetti_effect():
+    """화면 양옆에서 색종이를 뿌리는 효과 (로컬 canvas-confetti 사용)"""
+    # 매번 다른 HTML이어야 iframe이 새로 만들어져 효과가 다시 실행됨
+    load_assets([CONFETTI_ASSET, "effects.js"], f"parent.sf49Effects.confetti(); // {uuid.uuid4().hex}")
 
-            h2 {
-                font-size: 2rem !important;
-            }
+def fireworks_effect():
+    """불꽃놀이 효과 (로컬 canvas-confetti 사용)"""
+    load_assets([CONFETTI_ASSET, "effects.js"], f"parent.sf49Effects.fireworks(); // {uuid.uuid4().hex}")
+
+HTTP_POOL_SIZE = 64  # 호스트별로 유지할 keep-alive 연결 수
+HTTP_RETRIES = 3  # 연결 실패·일시적 오류 재시도 횟수
+OPENAI_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+OPENAI_MAX_RETRIES = 2
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """프로세스 전체에서 공유하는 HTTP 세션 (커넥션 풀·keep-alive·재시도)"""
+    session = requests.Session()
+    # 연결 실패는 모든 메서드에서 재시도하고, 응답 오류는 멱등한 GET/HEAD만 재시도
+    retry = Retry(
+        total=HTTP_RETRIES,
+        backoff_factor=0.3,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True
+    )
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+@st.cache_resource
+def get_webhook_session() -> requests.Session:
+    """웹훅 전용 HTTP 세션 (재시도는 _post_webhook_with_retries가 시간 한도 안에서 맡으므로 어댑터 재시도는 끔)"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+@st.cache_resource
+def get_openai_client() -> OpenAI:
+    """프로세스 전체에서 공유하는 OpenAI 클라이언트"""
+    return OpenAI(
+        api_key=st.secrets["openai_api_key"],
+        base_url=get_setting("OPENAI_BASE_URL"),
+        timeout=OPENAI_TIMEOUT,
+        max_retries=OPENAI_MAX_RETRIES,
+        http_client=DefaultHttpxClient(
+            limits=httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE)
+        )
+    )
 
-            h3 {
-                font-size: 1.75rem !important;
-            }
+METRICS_PATH = "/metrics"
+METRICS_HOST = "127.0.0.1"  # 외부 수집기가 직접 긁어야 하면 METRICS_HOST로 명시
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+METRIC_HELP = {
+    "sf49_stage_seconds": ("histogram", "단계별 소요 시간(초)"),
+    "sf49_poll_attempts_total": ("counter", "런·이미지 완료 확인 요청 수"),
+    "sf49_cache_requests_total": ("counter", "캐시 조회 결과별 횟수"),
+    "sf49_errors_total": ("counter", "단계별 오류 수"),
+    "sf49_image_jobs_in_flight": ("gauge", "이 프로세스에서 진행 중인 이미지 작업 수"),
+    "sf49_image_polls_pending": ("gauge", "완료를 기다리는 이미지 요청 수"),
+    "sf49_prefilter_matches_total": ("counter", "사전 필터가 모델 호출 없이 답한 요청 수"),
+    "sf49_run_tokens_total": ("counter", "런·브리프 요약에 쓴 토큰 수"),
+    "sf49_thread_rotations_total": ("counter", "브리프로 요약하고 새 스레드로 옮긴 횟수"),
+    "sf49_session_message_bytes": ("gauge", "세션 메모리에 있는 메시지 크기(바이트)"),
+    "sf49_sessions_active": ("gauge", "최근 활동한 세션 수"),
+}
+
+class Metrics:
+    """프로세스 단위 지표 (단계별 히스토그램·카운터·게이지)를 Prometheus 텍스트 형식으로 제공"""
+
+    def __init__(self, buckets: Tuple[float, ...] = STAGE_BUCKETS, json_logs: bool = False):
+        self.buckets = buckets
+        self.json_logs = json_logs
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._histograms: Dict[Tuple[str, Tuple], List[float]] = {}
+        self._gauges: Dict[Tuple[str, Tuple], Callable[[], float]] = {}
+        self._lock = threading.Lock()
+        self._logger = logging.getLogger("sf49")
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, str]) -> Tuple[str, Tuple]:
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name: str, amount: float = 1.0, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            # 구간별 누적 개수 + [합계, 개수]
+            entry = self._histograms.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def gauge(self, name: str, read: Callable[[], float], **labels):
+        """값은 지표를 내보낼 때 read()로 읽음"""
+        with self._lock:
+            self._gauges[self._key(name, labels)] = read
+
+    def observe_stage(self, stage: str, seconds: float, timings: Optional[Dict[str, float]] = None):
+        self.observe("sf49_stage_seconds", seconds, stage=stage)
+        if timings is not None:
+            timings[stage] = round(timings.get(stage, 0.0) + seconds, 4)
+
+    @contextmanager
+    def timer(self, stage: str, timings: Optional[Dict[str, float]] = None):
+        """블록 소요 시간을 단계 히스토그램에 기록 (예외는 오류 카운터에도 반영)"""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc("sf49_errors_total", stage=stage)
+            raise
+        finally:
+            self.observe_stage(stage, time.perf_counter() - started, timings)
+
+    def log(self, event: str, **fields):
+        """요청 단위 구조화 로그 (METRICS_JSON_LOGS가 켜진 경우만)"""
+        if self.json_logs:
+            self._logger.info(json.dumps({"event": event, "ts": round(time.time(), 3), **fields},
+                                         ensure_ascii=False, default=str))
+
+    @staticmethod
+    def _labels(labels: Tuple, extra: str = "") -> str:
+        # Prometheus 텍스트 형식대로 라벨 값의 역슬래시·큰따옴표·줄바꿈을 이스케이프
+        parts = [
+            f'{k}="' + str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+            for k, v in labels
+        ]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self) -> str:
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: list(entry) for key, entry in self._histograms.items()}
+            gauges = dict(self._gauges)
+
+        samples: Dict[str, List[str]] = {}
+        for (name, labels), value in counters.items():
+            samples.setdefault(name, []).append(f"{name}{self._labels(labels)} {value:g}")
+        for (name, labels), read in gauges.items():
+            try:
+                value = float(read())
+            except Exception:
+                continue
+            samples.setdefault(name, []).append(f"{name}{self._labels(labels)} {value:g}")
+        for (name, labels), entry in histograms.items():
+            lines = samples.setdefault(name, [])
+            bounds = [f"{bound:g}" for bound in self.buckets] + ["+Inf"]
+            for bound, count in zip(bounds, entry[:len(self.buckets)] + [entry[-1]]):
+                le = 'le="' + bound + '"'
+                lines.append(f"{name}_bucket{self._labels(labels, le)} {count}")
+            lines.append(f"{name}_sum{self._labels(labels)} {entry[-2]:.6f}")
+            lines.append(f"{name}_count{self._labels(labels)} {entry[-1]}")
+
+        output = []
+        for name in sorted(samples):
+            kind, help_text = METRIC_HELP.get(name, ("untyped", name))
+            output.append(f"# HELP {name} {help_text}")
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(sorted(samples[name]) if kind != "histogram" else samples[name])
+        return "\n".join(output) + "\n"
+
+@st.cache_resource
+def get_metrics() -> Metrics:
+    """프로세스 전체에서 공유하는 지표 (METRICS_JSON_LOGS=1이면 요청별 JSON 로그도 출력)"""
+    json_logs = str(get_setting("METRICS_JSON_LOGS", "")).lower() in ("1", "true", "yes")
+    metrics = Metrics(json_logs=json_logs)
+    if json_logs and not metrics._logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        metrics._logger.addHandler(handler)
+        metrics._logger.setLevel(logging.INFO)
+        metrics._logger.propagate = False
+    return metrics
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = get_setting("DATA_DIR", os.path.join(APP_DIR, "data"))  # 대화·작업 DB 위치 (벤치마크는 임시 폴더 사용)
+STATIC_DIR = os.path.join(APP_DIR, "static")
+ASSET_SOURCE_DIR = os.path.join(APP_DIR, "assets")
+ASSET_BUILD_DIR = os.path.join(STATIC_DIR, "assets")
+ASSET_BUILD_SCRIPT = os.path.join(APP_DIR, "tools", "build_assets.py")
+
+# Streamlit 정적 서빙은 .css/.js를 text/plain(nosniff)으로 내려주어 <link>·<script src>로는 적용되지 않음.
+# 그래서 내용 높이만큼(빈 문서라 0)인 st.iframe 안에서 내용을 받아 부모 문서에 <script>로 한 번만 넣음.
+# Streamlit 정적 서빙은 Cache-Control을 붙이지 않으므로 장기 캐시는 리버스 프록시 규칙으로 붙임
+# (tools/build_assets.py 참고)
+ASSET_LOADER_JS = """
+function sf49Load(entries, done) {
+  var parent = window.parent, doc = parent.document;
+  var loaded = parent.__sf49Assets = parent.__sf49Assets || {};
+  Promise.all(entries.map(function (entry) {
+    if (!loaded[entry.key]) {
+      var body = entry.url
+        ? fetch(new URL(entry.url, doc.baseURI)).then(function (r) { return r.text(); })
+        : Promise.resolve(entry.text);
+      loaded[entry.key] = body.then(function (text) {
+        var el = doc.createElement(entry.kind);
+        el.setAttribute("data-sf49-asset", entry.key);
+        el.textContent = text;
+        doc.head.appendChild(el);
+      }).catch(function (error) {
+        delete loaded[entry.key];
+        throw error;
+      });
+    }
+    return loaded[entry.key];
+  })).then(done);
+}
+"""
+
+def assets_stale(manifest_path: str) -> bool:
+    """manifest가 없거나 assets/ 원본 중 하나라도 manifest보다 새로우면 True"""
+    try:
+        built_at = os.path.getmtime(manifest_path)
+    except OSError:
+        return True
+    return any(
+        os.path.getmtime(os.path.join(ASSET_SOURCE_DIR, name)) > built_at
+        for name in os.listdir(ASSET_SOURCE_DIR)
+    )
 
-            /* 툴팁 크기 조정 */
-            .nav-icon::after {
-                font-size: 1rem !important;
-                padding: 0.6rem 1.2rem !important;
-            }
+@st.cache_resource
+def load_asset_manifest() -> Dict[str, Dict[str, str]]:
+    """tools/build_assets.py가 만든 자산 목록 (원본 이름 → 해시가 붙은 파일)
+
+    static/assets/는 저장소에 없으므로 빌드본이 없거나 원본보다 오래됐으면 시작할 때 한 번 빌드함.
+    빌드할 수 없으면(읽기 전용 배포 등) 빈 dict를 돌려주고 원본을 인라인으로 사용
+    """
+    manifest_path = os.path.join(ASSET_BUILD_DIR, "manifest.json")
+    try:
+        if assets_stale(manifest_path):
+            spec = importlib.util.spec_from_file_location("sf49_build_assets", ASSET_BUILD_SCRIPT)
+            builder = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(builder)
+            return builder.build(ASSET_SOURCE_DIR, ASSET_BUILD_DIR)
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.getLogger("sf49").warning("static assets unavailable, inlining sources: %s", e)
+        return {}
+
+@st.cache_resource
+def read_asset(name: str) -> str:
+    """자산 내용 (빌드본이 있으면 줄인 파일, 없으면 assets/ 원본)"""
+    built = load_asset_manifest().get(name)
+    path = os.path.join(ASSET_BUILD_DIR, built["file"]) if built else os.path.join(ASSET_SOURCE_DIR, name)
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def load_assets(names: List[str], run: str = ""):
+    """자산을 부모 문서에 한 번만 넣은 뒤 run 코드를 실행 (빌드본은 ?v=해시 URL이라 프록시가 장기 캐시할 수 있음)"""
+    manifest = load_asset_manifest()
+    entries = []
+    for name in names:
+        kind = "style" if name.endswith(".css") else "script"
+        built = manifest.get(name)
+        if built:
+            entries.append({"key": f"{name}:{built['hash']}", "kind": kind,
+                            "url": f"app/static/assets/{built['file']}?v={built['hash']}"})
+        elif os.path.exists(os.path.join(ASSET_SOURCE_DIR, name)):
+            entries.append({"key": f"{name}:source", "kind": kind, "text": read_asset(name)})
+        # 아직 받지 않은 외부 라이브러리는 건너뜀 (효과 스크립트가 없는 함수를 확인함)
+    st.iframe(
+        f"<script>{ASSET_LOADER_JS}sf49Load({json.dumps(entries)}, function () {{ {run}\n}});</script>",
+        height="content"
+    )
 
-            /* AI 메시지 스타일 */
-            .stChatMessage[data-testid="assistant"] {
-                background: rgba(255, 87, 34, 0.95) !important;  /* 오렌지색(#FF5722) 배경 */
-                box-shadow: 0 8px 24px rgba(255, 87, 34, 0.15),
-                            0 2px 8px rgba(255, 87, 34, 0.1),
-                            0 1px 3px rgba(255, 87, 34, 0.05);
-            }
+# Streamlit 정적 파일 서빙(app/static/...)으로 원본을 그대로 내려주기 위해 static 아래에 둠
+IMAGE_CACHE_DIR = os.path.join(STATIC_DIR, "image_cache")
+IMAGE_CACHE_MAX_BYTES = 512 * 1024 * 1024  # 디스크 캐시 최대 용량
+IMAGE_CACHE_HOT_ITEMS = 32  # 메모리에 유지할 최근 이미지 수
+IMAGE_FETCH_WORKERS = 8  # 동시에 내려받을 최대 이미지 수
+THUMBNAIL_WIDTH = 640  # 2열 그리드 표시용 축소본 폭 (고해상도 화면 기준)
+THUMBNAIL_QUALITY = 80
+
+class ImageCache:
+    """URL·콘텐츠 해시 기반 이미지 캐시 (디스크 LRU + 메모리 핫 티어)"""
+
+    def __init__(self, root: str, max_bytes: int, hot_items: int, session: requests.Session,
+                 metrics: Optional[Metrics] = None):
+        self.root = root
+        self.session = session
+        self.metrics = metrics or Metrics()
+        self.blob_dir = os.path.join(root, "blobs")
+        self.rendition_dir = os.path.join(root, "renditions")
+        self.url_dir = os.path.join(root, "urls")
+        for path in (self.blob_dir, self.rendition_dir, self.url_dir):
+            os.makedirs(path, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hot_items = hot_items
+        self._hot: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._total_bytes = sum(size for _, size, _ in self._stored_files(with_records=True))
+        # 이전 버전은 원본을 지워도 URL 기록을 남겼으므로 시작할 때 한 번 정리
+        self._drop_orphan_records()
+
+    def _url_record_path(self, url: str) -> str:
+        return os.path.join(self.url_dir, hashlib.sha256(url.encode()).hexdigest() + ".json")
+
+    def get(self, url: str) -> Tuple[bytes, str]:
+        """이미지 바이트와 콘텐츠 타입 반환 (캐시 미스일 때만 네트워크 요청)"""
+        with self._lock:
+            if url in self._hot:
+                self._hot.move_to_end(url)
+                self.metrics.inc("sf49_cache_requests_total", cache="image", result="hot")
+                return self._hot[url]
+
+        entry = self._read_disk(url)
+        if entry is None:
+            self.metrics.inc("sf49_cache_requests_total", cache="image", result="miss")
+            entry = self._fetch(url)
+            self._write_disk(url, *entry)
+        else:
+            self.metrics.inc("sf49_cache_requests_total", cache="image", result="disk")
+        self._remember(url, entry)
+        return entry
+
+    def publish(self, url: str) -> str:
+        """원본 파일의 정적 경로 반환 (바이트를 메모리에 올리지 않음)"""
+        blob_name = self._blob_name(url)
+        if blob_name is None:
+            self.metrics.inc("sf49_cache_requests_total", cache="image", result="miss")
+            data, content_type = self._fetch(url)
+            blob_name = self._write_disk(url, data, content_type)
+        else:
+            self.metrics.inc("sf49_cache_requests_total", cache="image", result="disk")
+        return self._static_path(self.blob_dir, blob_name)
+
+    def rendition(self, url: str, width: int = THUMBNAIL_WIDTH) -> str:
+        """표시용 축소본(WebP, 미지원 환경은 JPEG)의 정적 경로 반환 (이미지당 한 번만 생성)"""
+        record = self._read_record(url)
+        if record is None:
+            self.publish(url)
+            record = self._read_record(url)
+
+        if features.check("webp"):
+            image_format, extension = "WEBP", ".webp"
+        else:
+            image_format, extension = "JPEG", ".jpg"
+        rendition_name = f"{record['digest']}_{width}{extension}"
+        rendition_path = os.path.join(self.rendition_dir, rendition_name)
+
+        if os.path.exists(rendition_path):
+            os.utime(rendition_path)
+            return self._static_path(self.rendition_dir, rendition_name)
+
+        data, _ = self.get(url)
+        buffer = io.BytesIO()
+        with Image.open(io.BytesIO(data)) as img:
+            # 원본보다 크게 늘리지 않고 비율 유지
+            img.thumbnail((width, img.height))
+            if image_format == "JPEG" and img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            img.save(buffer, format=image_format, quality=THUMBNAIL_QUALITY)
+
+        with self._lock:
+            tmp_path = f"{rendition_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(buffer.getvalue())
+            os.replace(tmp_path, rendition_path)
+            self._total_bytes += buffer.tell()
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+        return self._static_path(self.rendition_dir, rendition_name)
+
+    def _static_path(self, directory: str, name: str) -> str:
+        return f"app/static/{os.path.basename(self.root)}/{os.path.basename(directory)}/{name}"
+
+    def _read_record(self, url: str) -> Optional[Dict]:
+        try:
+            with open(self._url_record_path(url), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _blob_name(self, url: str) -> Optional[str]:
+        record = self._read_record(url)
+        if record is None or "blob" not in record:
+            return None
+        blob_name = record["blob"]
+        blob_path = os.path.join(self.blob_dir, blob_name)
+        if not os.path.exists(blob_path):
+            return None
+        os.utime(blob_path)
+        return blob_name
+
+    def _remember(self, url: str, entry: Tuple[bytes, str]):
+        with self._lock:
+            self._hot[url] = entry
+            self._hot.move_to_end(url)
+            while len(self._hot) > self.hot_items:
+                self._hot.popitem(last=False)
+
+    def _fetch(self, url: str) -> Tuple[bytes, str]:
+        with self.metrics.timer("image_download"):
+            response = self.session.get(url, timeout=30)
+            response.raise_for_status()
+        content_type = response.headers.get("Content-Type", "application/octet-stream")
+        return response.content, content_type.split(";")[0].strip()
 
-            /* AI 메시지 내부 텍스트 스타일 */
-            .stChatMessage[data-testid="assistant"] p, 
-            .stChatMessage[data-testid="assistant"] span, 
-            .stChatMessage[data-testid="assistant"] div {
-                color: rgba(33, 33, 33, 0.95) !important;  /* 어두운 글자색 */
-            }
+    def _read_disk(self, url: str) -> Optional[Tuple[bytes, str]]:
+        record = self._read_record(url)
+        if record is None:
+            return None
+        try:
+            blob_path = os.path.join(self.blob_dir, record["blob"])
+            with open(blob_path, "rb") as f:
+                data = f.read()
+        except (OSError, ValueError, KeyError):
+            return None
+
+        # 손상되었거나 쓰기 도중 남은 파일은 캐시 미스로 처리
+        if hashlib.sha256(data).hexdigest() != record["digest"]:
+            return None
+
+        # 최근 사용 시각 갱신 (LRU 기준)
+        os.utime(blob_path)
+        return data, record["content_type"]
+
+    def _write_disk(self, url: str, data: bytes, content_type: str) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        extension = mimetypes.guess_extension(content_type) or ".bin"
+        blob_name = f"{digest}{extension}"
+        blob_path = os.path.join(self.blob_dir, blob_name)
+
+        with self._lock:
+            if not os.path.exists(blob_path):
+                tmp_path = f"{blob_path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, blob_path)
+                self._total_bytes += len(data)
+
+            record = {"digest": digest, "blob": blob_name, "content_type": content_type}
+            record_path = self._url_record_path(url)
+            try:
+                self._total_bytes -= os.path.getsize(record_path)
+            except OSError:
+                pass
+            tmp_path = f"{record_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(record, f)
+            os.replace(tmp_path, record_path)
+            self._total_bytes += os.path.getsize(record_path)
+
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+        return blob_name
+
+    def _stored_files(self, with_records: bool = False) -> List[Tuple[float, int, str]]:
+        """원본·축소본(with_records면 URL 기록까지) 파일의 (최근 사용 시각, 크기, 경로) 목록"""
+        files = []
+        directories = (self.blob_dir, self.rendition_dir, self.url_dir) if with_records else (
+            self.blob_dir, self.rendition_dir)
+        for directory in directories:
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _evict(self):
+        """가장 오래 사용되지 않은 파일부터 삭제하여 용량의 90% 이하로 유지
+
+        URL 기록은 읽을 때 사용 시각을 갱신하지 않으므로 LRU 대상에서 빼고,
+        가리키던 원본이 지워졌을 때 함께 정리함
+        """
+        target = int(self.max_bytes * 0.9)
+        evicted_blob = False
+        for _, size, path in sorted(self._stored_files()):
+            if self._total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._total_bytes -= size
+            evicted_blob = evicted_blob or os.path.dirname(path) == self.blob_dir
+        if evicted_blob:
+            self._drop_orphan_records()
+
+    def _drop_orphan_records(self):
+        """원본이 없는 URL 기록 삭제"""
+        for name in os.listdir(self.url_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.url_dir, name)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    blob_name = json.load(f)["blob"]
+            except OSError:
+                continue
+            except (ValueError, KeyError, TypeError):
+                blob_name = None  # 손상된 기록도 함께 정리
+            if blob_name and os.path.exists(os.path.join(self.blob_dir, blob_name)):
+                continue
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                continue
+            self._total_bytes -= size
+
+@st.cache_resource
+def get_image_cache() -> ImageCache:
+    """프로세스 전체에서 공유하는 이미지 캐시"""
+    # 다른 곳을 가리키면 app/static으로 서빙되지 않으므로 벤치마크처럼 화면에 보이지 않는 경우에만 바꿈
+    return ImageCache(get_setting("IMAGE_CACHE_DIR", IMAGE_CACHE_DIR), IMAGE_CACHE_MAX_BYTES,
+                      IMAGE_CACHE_HOT_ITEMS, get_http_session(), get_metrics())
+
+@st.cache_resource
+def get_image_fetch_pool() -> ThreadPoolExecutor:
+    """프로세스 전체에서 공유하는 이미지 다운로드 스레드 풀"""
+    return ThreadPoolExecutor(max_workers=IMAGE_FETCH_WORKERS, thread_name_prefix="image-fetch")
+
+IMAGE_GRID_COLUMNS = 2
+# 조회 웹훅이 전체 개수(total)를 알려주지 않을 때 작업 하나에 미리 잡아둘 타일 수
+IMAGE_TILES_PER_JOB = int(get_setting("IMAGE_TILES_PER_JOB", 4))
+
+def image_grid_slots(count: int) -> List["st.delta_generator.DeltaGenerator"]:
+    """타일 count개의 자리를 행 단위 격자로 미리 잡아둠 (이미지가 늦게 와도 배치가 흔들리지 않도록)"""
+    slots = []
+    for row_start in range(0, count, IMAGE_GRID_COLUMNS):
+        cols = st.columns(IMAGE_GRID_COLUMNS)
+        slots.extend(col.empty() for col in cols[:count - row_start])
+    return slots
+
+def image_placeholder_html(idx: int) -> str:
+    """아직 도착하지 않은 이미지 자리에 둘 가벼운 자리표시 타일"""
+    return f"""
+        <div class="image-container image-placeholder">
+            <div class="image-placeholder-box"></div>
+            <p class="image-caption">Design Option {idx + 1}</p>
+        </div>
+    """
+
+def image_tile_html(idx: int, display_path: str, original_path: str) -> str:
+    """디자인 이미지 타일 HTML (화면엔 축소본, 💾·🔍는 원본 경로만 참조)"""
+    extension = os.path.splitext(original_path)[1]
+    return f"""
+        <div class="image-container">
+            <img src="{display_path}" loading="lazy">
+            <div class="overlay-buttons">
+                <a href="{original_path}" download="Design_Option_{idx + 1}{extension}" class="overlay-button" title="이미지 다운로드">💾</a>
+                <a href="{original_path}" target="_blank" class="overlay-button" title="크게 보기">🔍</a>
+            </div>
+            <p class="image-caption">Design Option {idx + 1}</p>
+        </div>
+    """
+
+def prepare_image_tile(cache: ImageCache, url: str) -> Tuple[str, str]:
+    """타일에 필요한 (축소본 경로, 원본 경로) 준비"""
+    original_path = cache.publish(url)
+    return cache.rendition(url), original_path
+
+def fill_image_slots(slots: List[Tuple["st.delta_generator.DeltaGenerator", str, int]]):
+    """(자리, URL, 순번) 목록을 병렬로 내려받아 도착하는 순서대로 타일을 채움"""
+    if not slots:
+        return
+    pool = get_image_fetch_pool()
+    cache = get_image_cache()
+    with get_metrics().timer("render_images"):
+        futures = {pool.submit(prepare_image_tile, cache, url): (slot, url, idx) for slot, url, idx in slots}
+        for future in as_completed(futures):
+            slot, url, idx = futures[future]
+            try:
+                display_path, original_path = future.result()
+            except (requests.exceptions.RequestException, OSError):
+                # 캐시에 저장하거나 축소본을 만들지 못하면 원본 URL로 직접 연결
+                display_path = original_path = url
+            slot.markdown(image_tile_html(idx, display_path, original_path), unsafe_allow_html=True)
+
+IMAGE_POLL_DEFAULT_DELAY = 60.0  # 완료 기록이 없을 때 첫 확인까지 대기 시간
+IMAGE_POLL_MIN_DELAY = 5.0  # 학습된 첫 대기 시간의 하한
+# 첫 대기 시간 전에 미리 확인하는 지점 (첫 대기 시간에 대한 비율)
+# 폴링으로만 완료를 알게 되면 기록은 항상 "확인한 시각"이라 실제 완료 시간보다 길게 남으므로,
+# 더 이른 지점도 확인해야 학습된 값이 실제보다 긴 쪽에 갇히지 않고 내려올 수 있음
+IMAGE_POLL_PROBES = (0.25, 0.5)
+IMAGE_POLL_BASE_INTERVAL = 2.0  # 첫 확인 이후 재확인 간격 시작값
+IMAGE_POLL_MAX_INTERVAL = 15.0
+IMAGE_POLL_BACKOFF = 1.5
+IMAGE_POLL_JITTER = 0.2  # 간격에 ±20% 무작위 편차
+IMAGE_POLL_DEADLINE = 300.0  # 이 시간이 지나면 타임아웃 처리
+# 콜백 모드의 조회는 콜백이 유실됐을 때의 안전망이므로 미리 확인 없이 늦게, 드문드문 확인
+IMAGE_CALLBACK_FALLBACK_DELAY = 120.0
+IMAGE_CALLBACK_FALLBACK_INTERVAL = 30.0
+
+class CompletionStats:
+    """최근 이미지 생성 완료 시간 기록 (첫 대기 시간 학습용)
+    폴링으로 알게 된 완료는 확인 시각이 기록되므로 실제보다 늦을 수 있음 → PollScheduler가 미리 확인해 값을 끌어내림"""
+
+    def __init__(self, size: int = 50):
+        self._samples: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def initial_delay(self, default: float = IMAGE_POLL_DEFAULT_DELAY,
+                      minimum: float = IMAGE_POLL_MIN_DELAY) -> float:
+        """최근 완료 시간의 하위 20% 지점 (빠른 생성을 놓치지 않도록 보수적으로)"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return default
+        return max(minimum, samples[int(len(samples) * 0.2)])
+
+@st.cache_resource
+def get_completion_stats() -> CompletionStats:
+    """프로세스 전체에서 공유하는 완료 시간 기록"""
+    return CompletionStats()
+
+class PollScheduler:
+    """미리 확인 → 첫 대기 → 지수 백오프(지터 포함) → 마감 시간 순으로 폴링 간격 결정
+
+    initial_delay가 60이고 probes가 (0.25, 0.5)이면 15·30·60초 시점에 확인한 뒤 백오프함
+
+    clock·rng를 주입할 수 있어 가짜 시계로 동작을 재현할 수 있음
+    """
+
+    def __init__(self, initial_delay: float = IMAGE_POLL_DEFAULT_DELAY,
+                 base_interval: float = IMAGE_POLL_BASE_INTERVAL,
+                 max_interval: float = IMAGE_POLL_MAX_INTERVAL,
+                 backoff: float = IMAGE_POLL_BACKOFF,
+                 jitter: float = IMAGE_POLL_JITTER,
+                 deadline: float = IMAGE_POLL_DEADLINE,
+                 probes: Tuple[float, ...] = IMAGE_POLL_PROBES,
+                 clock: Callable[[], float] = time.monotonic,
+                 rng: Callable[[], float] = random.random):
+        self.initial_delay = initial_delay
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.deadline = deadline
+        self.checkpoints = [initial_delay * fraction for fraction in probes] + [initial_delay]
+        self.clock = clock
+        self.rng = rng
+        self.attempts = 0
+        self.started = clock()
+
+    def elapsed(self) -> float:
+        return self.clock() - self.started
+
+    def next_delay(self) -> Optional[float]:
+        """다음 확인까지 대기할 시간 (마감 시간이 지났으면 None)"""
+        remaining = self.deadline - self.elapsed()
+        if remaining <= 0:
+            return None
+
+        if self.attempts < len(self.checkpoints):
+            previous = self.checkpoints[self.attempts - 1] if self.attempts else 0.0
+            delay = self.checkpoints[self.attempts] - previous
+        else:
+            steps = self.attempts - len(self.checkpoints)
+            delay = min(self.max_interval, self.base_interval * self.backoff ** steps)
+        delay *= 1 + self.jitter * (2 * self.rng() - 1)
+        self.attempts += 1
+        return max(0.0, min(delay, remaining))
+
+    def restart_backoff(self):
+        """진행이 보이면 백오프를 처음 간격으로 되돌려 나머지 결과를 빨리 확인"""
+        self.attempts = len(self.checkpoints)
+
+IMAGE_CALLBACK_PATH = "/image-ready"
+IMAGE_CALLBACK_HOST = "127.0.0.1"  # 기본은 리버스 프록시 뒤에서만 받음 (직접 열려면 IMAGE_CALLBACK_HOST로 명시)
+IMAGE_CALLBACK_PORT = 8765
+
+class CompletionRegistry:
+    """unique_id별 완료 알림을 대기 중인 세션에 전달 (프로세스 내부)"""
+
+    def __init__(self, max_results: int = 1000):
+        self.max_results = max_results
+        self._results: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._listeners: List[Callable[[str], None]] = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener: Callable[[str], None]):
+        """알림이 올 때마다 unique_id와 함께 호출될 함수 등록"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def notify(self, unique_id: str, images: List[str]):
+        with self._lock:
+            self._results[unique_id] = images
+            self._results.move_to_end(unique_id)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(unique_id)
+
+    def result(self, unique_id: str) -> Optional[List[str]]:
+        with self._lock:
+            return self._results.get(unique_id)
+
+    def discard(self, unique_id: str):
+        with self._lock:
+            self._results.pop(unique_id, None)
+
+@st.cache_resource
+def get_completion_registry() -> CompletionRegistry:
+    """프로세스 전체에서 공유하는 완료 알림 레지스트리"""
+    return CompletionRegistry()
+
+class ImageCallbackHandler(BaseHTTPRequestHandler):
+    """이미지 생성 완료 콜백 수신 (POST /image-ready {"uniqueId": ..., "images": [...]})"""
+
+    def do_GET(self):
+        if self.path.split("?")[0].rstrip("/") != METRICS_PATH or self.server.metrics is None:
+            self.send_error(404)
+            return
+        body = self.server.metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.server.registry is None or self.path.split("?")[0].rstrip("/") != IMAGE_CALLBACK_PATH:
+            self.send_error(404)
+            return
+        # 콜백 URL의 이미지는 서버가 직접 내려받으므로 토큰 없이는 받지 않음 (SSRF 방지)
+        received = self.headers.get("X-Callback-Token") or ""
+        if not self.server.token or not hmac.compare_digest(received.encode(), self.server.token.encode()):
+            self.send_error(403)
+            return
 
-            /* 사용자 메시지 스타일 */
-            .stChatMessage[data-testid="user"] {
-                background: rgba(45, 45, 45, 0.95) !important;
-                box-shadow: 0 8px 24px rgba(0, 0, 0, 0.2),
-                            0 2px 8px rgba(0, 0, 0, 0.1),
-                            0 1px 3px rgba(0, 0, 0, 0.05);
-            }
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            unique_id = str(payload["uniqueId"])
+            images = payload.get("images") or []
+        except (ValueError, KeyError, TypeError):
+            self.send_error(400)
+            return
+
+        if isinstance(images, list) and images and all(
+            isinstance(url, str) and url.startswith(('http://', 'https://'))
+            for url in images
+        ):
+            self.server.registry.notify(unique_id, images)
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        # 접근 로그로 Streamlit 로그를 어지럽히지 않음
+        pass
+
+class CallbackServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], registry: Optional[CompletionRegistry], token: Optional[str],
+                 metrics: Optional[Metrics] = None):
+        super().__init__(address, ImageCallbackHandler)
+        self.registry = registry  # None이면 지표만 제공
+        self.token = token
+        self.metrics = metrics
+
+@st.cache_resource
+def get_callback_server() -> Optional[CallbackServer]:
+    """콜백 모드가 설정된 경우 수신 서버를 백그라운드 스레드로 한 번만 실행 (IMAGE_CALLBACK_TOKEN 필수)"""
+    if not get_setting("IMAGE_CALLBACK_URL"):
+        return None
+    if not get_setting("IMAGE_CALLBACK_TOKEN"):
+        logging.getLogger("sf49").warning("IMAGE_CALLBACK_URL is set without IMAGE_CALLBACK_TOKEN; "
+                                          "callback server not started, falling back to polling")
+        return None
+    address = (
+        get_setting("IMAGE_CALLBACK_HOST", IMAGE_CALLBACK_HOST),
+        int(get_setting("IMAGE_CALLBACK_PORT", IMAGE_CALLBACK_PORT))
+    )
+    try:
+        server = CallbackServer(address, get_completion_registry(), get_setting("IMAGE_CALLBACK_TOKEN"),
+                                get_metrics())
+    except OSError:
+        # 다른 프로세스가 포트를 사용 중이면 풀링 방식으로만 동작
+        return None
+    threading.Thread(target=server.serve_forever, name="image-callback", daemon=True).start()
+    return server
+
+@st.cache_resource
+def get_metrics_server() -> Optional[CallbackServer]:
+    """GET /metrics 제공 (콜백 서버가 있으면 함께 쓰고, 없으면 METRICS_PORT가 설정된 경우만 따로 실행)"""
+    server = get_callback_server()
+    if server is not None or not get_setting("METRICS_PORT"):
+        return server
+    address = (get_setting("METRICS_HOST", METRICS_HOST), int(get_setting("METRICS_PORT")))
+    try:
+        server = CallbackServer(address, None, None, get_metrics())
+    except OSError:
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+PROMPT_CACHE_TTL = 24 * 3600  # 같은 프롬프트 결과를 재사용하는 기간(초)
+PROMPT_CACHE_MAX_ENTRIES = 1000
+
+def normalize_prompt(text: str) -> str:
+    """공백·대소문자·문장부호 차이를 없앤 프롬프트"""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = re.sub(r"[^\w\s]|_", " ", text)
+    return " ".join(text.split())
+
+class PromptResultCache:
+    """정규화한 visualization_text 해시 → 생성된 이미지 URL (TTL + 개수 제한 LRU)"""
+
+    def __init__(self, ttl: float = PROMPT_CACHE_TTL, max_entries: int = PROMPT_CACHE_MAX_ENTRIES,
+                 clock: Callable[[], float] = time.time):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, List[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(visualization_text: str) -> str:
+        return hashlib.sha256(normalize_prompt(visualization_text).encode()).hexdigest()
+
+    def get(self, visualization_text: str) -> Optional[List[str]]:
+        key = self.key(visualization_text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, images = entry
+            if self.clock() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return list(images)
+
+    def put(self, visualization_text: str, images: List[str]):
+        key = self.key(visualization_text)
+        with self._lock:
+            self._entries[key] = (self.clock(), list(images))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+PREFILTER_RULES_PATH = os.path.join(APP_DIR, "prefilter_rules.json")
+PREFILTER_RELOAD_INTERVAL = 2.0  # 규칙 파일 변경 여부를 확인하는 최소 간격(초)
+
+class PromptPrefilter:
+    """모델을 부르기 전에 보안 탐색·범위 밖 요청을 규칙으로 걸러 정해진 답변을 돌려줌
+
+    규칙은 JSON 파일에서 읽고, 파일 수정 시각이 바뀌면 다시 읽음 (잘못된 파일은 무시하고
+    이전 규칙 유지). 패턴은 normalize_prompt로 정규화한 입력에 대한 정규식
+    """
+
+    def __init__(self, path: str, reload_interval: float = PREFILTER_RELOAD_INTERVAL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.clock = clock
+        self._rules: List[Tuple[str, "re.Pattern", Optional["re.Pattern"], Optional["re.Pattern"], str]] = []
+        self._mtime: Optional[float] = None
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def compile(config: Dict) -> List[Tuple[str, "re.Pattern", Optional["re.Pattern"], Optional["re.Pattern"], str]]:
+        """규칙 설정 → (이름, 패턴, 제외 패턴, 필요 패턴, 답변) 목록 (규칙마다 패턴을 하나의 정규식으로 묶음)
+
+        최상위 "unless"(디자인 요청을 뜻하는 말)는 모든 규칙의 제외 패턴에 더해지고,
+        "require_request"인 규칙은 최상위 "request_cues"(정보를 달라는 질문·명령)도 맞아야 걸림
+        """
+        responses = config.get("responses", {})
+        common_unless = config.get("unless", [])
+        cues = config.get("request_cues", [])
+        request = re.compile("|".join(f"(?:{p})" for p in cues)) if cues else None
+        rules = []
+        for rule in config.get("rules", []):
+            response = responses.get(rule["response"], rule["response"])
+            pattern = re.compile("|".join(f"(?:{p})" for p in rule["patterns"]))
+            exemptions = common_unless + rule.get("unless", [])
+            unless = re.compile("|".join(f"(?:{p})" for p in exemptions)) if exemptions else None
+            requires = request if rule.get("require_request") else None
+            rules.append((rule["name"], pattern, unless, requires, response))
+        return rules
+
+    def _maybe_reload(self):
+        now = self.clock()
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.reload_interval:
+                return
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                self._rules, self._mtime = [], None
+                return
+            if mtime == self._mtime:
+                return
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._rules = self.compile(json.load(f))
+            except (OSError, ValueError, KeyError, TypeError, re.error) as e:
+                logging.getLogger("sf49").warning("prefilter rules not reloaded: %s", e)
+            self._mtime = mtime
+
+    def check(self, text: str) -> Optional[Tuple[str, str]]:
+        """걸리는 규칙이 있으면 (규칙 이름, 답변), 없으면 None"""
+        self._maybe_reload()
+        normalized = normalize_prompt(text)
+        for name, pattern, unless, requires, response in self._rules:
+            if (pattern.search(normalized) and not (unless and unless.search(normalized))
+                    and not (requires and not requires.search(normalized))):
+                return name, response
+        return None
+
+@st.cache_resource
+def get_prompt_prefilter() -> PromptPrefilter:
+    """프로세스 전체에서 공유하는 사전 필터"""
+    return PromptPrefilter(get_setting("PREFILTER_RULES_PATH", PREFILTER_RULES_PATH))
+
+WEBHOOK_RATE_LIMITS = {
+    # 엔드포인트: (초당 허용 요청 수, 순간 최대 요청 수)
+    "send": (2.0, 5),
+    "retrieve": (10.0, 20),
+}
+WEBHOOK_MIN_RATE = 0.2  # 429를 연달아 받아도 이 아래로는 줄이지 않음
+ADMISSION_TIMEOUT = 120.0  # 대기열에서 이보다 오래 기다리면 요청 포기
+ADMISSION_MAX_429_RETRIES = 3
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After 헤더(초 또는 HTTP 날짜)를 초 단위로 변환"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    """429 응답에 맞춰 속도를 조절하는 토큰 버킷 (실패 시 절반, 성공 시 조금씩 회복)"""
+
+    def __init__(self, rate: float, capacity: int, min_rate: float = WEBHOOK_MIN_RATE,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate
+        self.capacity = capacity
+        self.clock = clock
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._blocked_until = 0.0
+
+    def _refill(self):
+        now = self.clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> float:
+        """토큰을 가져오면 0, 아니면 다음 토큰까지 기다릴 시간(초)"""
+        now = self.clock()
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def penalize(self, retry_after: Optional[float]):
+        """429를 받으면 Retry-After 동안 멈추고 속도를 절반으로 줄임"""
+        self._refill()
+        self.rate = max(self.min_rate, self.rate / 2)
+        self._tokens = 0.0
+        if retry_after:
+            self._blocked_until = max(self._blocked_until, self.clock() + retry_after)
+
+    def reward(self):
+        """성공하면 원래 속도까지 조금씩 회복"""
+        self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def expected_wait(self, position: int) -> float:
+        blocked = max(0.0, self._blocked_until - self.clock())
+        return blocked + position / self.rate
+
+class AdmissionTicket:
+    """대기열에 선 요청 하나 (세션 단위로 공정하게 순서를 정함)"""
+
+    def __init__(self, session_key: Optional[str]):
+        self.session_key = session_key or "anonymous"
+
+class AdmissionController:
+    """토큰 버킷 앞의 세션 간 공정(라운드 로빈) 대기열"""
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()
+        self._cond = threading.Condition()
+
+    def _order(self) -> List[AdmissionTicket]:
+        """세션을 번갈아 가며 처리할 때의 대기 순서"""
+        queues = list(self._queues.values())
+        order = []
+        depth = 0
+        while True:
+            row = [queue[depth] for queue in queues if len(queue) > depth]
+            if not row:
+                return order
+            order.extend(row)
+            depth += 1
+
+    def _remove(self, ticket: AdmissionTicket):
+        queue = self._queues.get(ticket.session_key)
+        if queue is None:
+            return
+        try:
+            queue.remove(ticket)
+        except ValueError:
+            return
+        # 방금 처리된 세션은 맨 뒤로 보내 다른 세션에 차례를 넘김
+        self._queues.pop(ticket.session_key)
+        if queue:
+            self._queues[ticket.session_key] = queue
+
+    def acquire(self, ticket: AdmissionTicket, timeout: float = ADMISSION_TIMEOUT) -> bool:
+        """차례가 오고 토큰을 얻으면 True, timeout 안에 못 얻으면 False"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._queues.setdefault(ticket.session_key, deque()).append(ticket)
+            try:
+                while True:
+                    refill = None
+                    if self._order()[0] is ticket:
+                        refill = self.bucket.try_acquire()
+                        if refill == 0:
+                            return True
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(min(remaining, refill) if refill is not None else remaining)
+            finally:
+                self._remove(ticket)
+                self._cond.notify_all()
+
+    def position(self, ticket: AdmissionTicket) -> Optional[Tuple[int, float]]:
+        """(대기 순번, 예상 대기 시간) — 대기열에 없으면 None"""
+        with self._cond:
+            order = self._order()
+            if ticket not in order:
+                return None
+            index = order.index(ticket)
+            return index + 1, self.bucket.expected_wait(index)
+
+    def report(self, status_code: int, retry_after: Optional[str] = None):
+        """응답 결과를 버킷 속도에 반영"""
+        with self._cond:
+            if status_code == 429:
+                self.bucket.penalize(parse_retry_after(retry_after))
+            elif status_code < 400:
+                self.bucket.reward()
+            self._cond.notify_all()
+
+class AdmissionRejected(requests.exceptions.RequestException):
+    """대기열에서 차례를 얻지 못한 경우"""
+
+@st.cache_resource
+def get_admission_controllers() -> Dict[str, AdmissionController]:
+    """프로세스 전체에서 공유하는 엔드포인트별 대기열·속도 제한"""
+    return {
+        name: AdmissionController(TokenBucket(rate, capacity))
+        for name, (rate, capacity) in WEBHOOK_RATE_LIMITS.items()
+    }
 
-            /* 사용자 메시지 내부 텍스트 스타일 */
-            .stChatMessage[data-testid="user"] p, 
-            .stChatMessage[data-testid="user"] span, 
-            .stChatMessage[data-testid="user"] div {
-                color: rgba(255, 255, 255, 0.9) !important;
+WEBHOOK_CONNECT_TIMEOUT = 3.05
+WEBHOOK_READ_TIMEOUT = 10.0
+WEBHOOK_BUDGETS = {"send": 20.0, "retrieve": 8.0}  # 재시도를 포함한 호출 전체 시간 한도(초)
+WEBHOOK_MAX_RETRIES = 2
+WEBHOOK_RETRY_BACKOFF = 0.5
+WEBHOOK_HEDGE_MIN_DELAY = 0.3  # p95가 이보다 짧아도 이만큼은 기다린 뒤 중복 요청
+WEBHOOK_HEDGE_WORKERS = 16
+BREAKER_FAILURE_THRESHOLD = 5  # 연속 실패가 이만큼 쌓이면 차단
+BREAKER_COOLDOWN = 30.0  # 차단 후 시험 요청을 보내기까지 대기 시간
+
+class WebhookBudget:
+    """웹훅 호출 한 번의 시간 한도 (대기열에서 기다린 시간은 빼고 셈)"""
+
+    def __init__(self, seconds: float):
+        self.deadline = time.monotonic() + seconds
+
+    def exclude(self, seconds: float):
+        """대기열에서 기다린 시간만큼 마감을 미룸"""
+        self.deadline += seconds
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+class LatencyTracker:
+    """엔드포인트별 최근 응답 시간 기록 (p95 계산용)"""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """샘플이 충분하지 않으면 None"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+class CircuitBreaker:
+    """연속 실패 시 일정 시간 호출을 막고, 이후 시험 요청 하나로 회복 여부 확인
+
+    closed(정상) → open(차단) → half-open(시험 요청 1개) → closed / open
+    """
+
+    def __init__(self, threshold: int = BREAKER_FAILURE_THRESHOLD, cooldown: float = BREAKER_COOLDOWN,
+                 clock: Callable[[], float] = time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            now = self.clock()
+            if self.state == "open" and now - self._opened_at >= self.cooldown:
+                self.state = "half-open"
+                self._probe_started = None
+            if self.state == "half-open":
+                # 시험 요청이 결과 없이 사라진 경우에 대비해 cooldown이 지나면 다시 허용
+                if self._probe_started is None or now - self._probe_started >= self.cooldown:
+                    self._probe_started = now
+                    return True
+                return False
+            return self.state == "closed"
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == "half-open" or self._failures >= self.threshold:
+                self.state = "open"
+                self._opened_at = self.clock()
+                self._probe_started = None
+
+class CircuitOpen(requests.exceptions.RequestException):
+    """엔드포인트가 차단 상태라 요청을 보내지 않은 경우"""
+
+class EndpointHealth:
+    """웹훅 엔드포인트 하나의 응답 시간 기록과 차단기"""
+
+    def __init__(self):
+        self.latency = LatencyTracker()
+        self.breaker = CircuitBreaker()
+
+@st.cache_resource
+def get_webhook_health() -> Dict[str, EndpointHealth]:
+    """프로세스 전체에서 공유하는 엔드포인트별 상태"""
+    return {name: EndpointHealth() for name in WEBHOOK_BUDGETS}
+
+@st.cache_resource
+def get_hedge_pool() -> ThreadPoolExecutor:
+    """조회 웹훅 중복(헤지) 요청용 스레드 풀"""
+    return ThreadPoolExecutor(max_workers=WEBHOOK_HEDGE_WORKERS, thread_name_prefix="webhook-hedge")
+
+IMAGE_POLL_CONCURRENCY = 8  # 조회 웹훅에 동시에 보낼 최대 요청 수
+
+class ImagePoller:
+    """모든 세션의 대기 중인 작업을 공유 일정으로 확인하는 프로세스 단일 폴러
+
+    작업 키(job_id)마다 PollScheduler로 다음 확인 시각을 정하고, 시각이 된 것만
+    제한된 동시성으로 웹훅 uniqueId를 조회한 뒤 결과를 구독자에게 나눠줌. 같은 작업을 여러 곳에서
+    기다려도 조회는 한 번만 일어나므로 요청 수는 대기 중인 작업 수에만 비례함
+    """
+
+    def __init__(self, registry: CompletionRegistry, stats: CompletionStats,
+                 concurrency: int = IMAGE_POLL_CONCURRENCY,
+                 clock: Callable[[], float] = time.monotonic,
+                 metrics: Optional[Metrics] = None):
+        self.registry = registry
+        self.stats = stats
+        self.metrics = metrics or Metrics()
+        self.clock = clock
+        self._watches: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="image-poll")
+        # 콜백 알림이 오면 다음 예정 시각을 기다리지 않고 바로 처리
+        registry.add_listener(lambda unique_id: self._wake.set())
+        threading.Thread(target=self._loop, name="image-poller", daemon=True).start()
+
+    def watch(self, job_id: str, unique_id: str, fetch: Callable[[str], Dict], on_done: Callable[[Dict], None],
+              started_at: Optional[float] = None, on_poll: Optional[Callable[[], None]] = None,
+              on_progress: Optional[Callable[[Dict], None]] = None, callback: bool = False):
+        """job_id 작업의 완료를 구독 (웹훅 uniqueId를 fetch로 조회하고, 끝나면 결과 dict로 on_done 호출)
+
+        조회 결과에 일부 이미지만 있으면 새 이미지가 늘어날 때마다 on_progress를 호출함.
+        callback이면 완료는 콜백으로 오므로 조회는 IMAGE_CALLBACK_FALLBACK_* 일정으로만 함
+        """
+        with self._lock:
+            watch = self._watches.get(job_id)
+            if watch is not None:
+                watch["subscribers"].append(on_done)
+                if on_progress is not None:
+                    watch["progress"].append(on_progress)
+                return
+
+            # 이어받은 작업은 처음 시작한 시각 기준으로 첫 대기와 마감 시간을 줄임
+            age = time.time() - started_at if started_at else 0.0
+            if callback:
+                scheduler = PollScheduler(
+                    initial_delay=max(0.0, IMAGE_CALLBACK_FALLBACK_DELAY - age),
+                    base_interval=IMAGE_CALLBACK_FALLBACK_INTERVAL,
+                    max_interval=IMAGE_CALLBACK_FALLBACK_INTERVAL,
+                    deadline=max(0.0, IMAGE_POLL_DEADLINE - age),
+                    probes=(),
+                    clock=self.clock
+                )
+            else:
+                scheduler = PollScheduler(
+                    initial_delay=max(0.0, self.stats.initial_delay() - age),
+                    deadline=max(0.0, IMAGE_POLL_DEADLINE - age),
+                    clock=self.clock
+                )
+            delay = scheduler.next_delay()
+            self._watches[job_id] = {
+                "unique_id": unique_id,
+                "scheduler": scheduler,
+                "due": self.clock() + (delay or 0.0),
+                "expired": delay is None,
+                "in_flight": False,
+                "fetch": fetch,
+                "on_poll": on_poll,
+                "started_at": started_at,
+                "subscribers": [on_done],
+                "progress": [on_progress] if on_progress is not None else [],
+                "seen": 0,  # 지금까지 받은 일부 결과의 이미지 수
+                "first_image": None,  # 첫 이미지가 보이기까지 걸린 시간(초)
             }
+        self._wake.set()
 
-            /* 호버 효과 */
-            .stChatMessage[data-testid="assistant"]:hover {
-                background: rgba(255, 87, 34, 0.85) !important;
-                transform: translateY(-2px);
-                box-shadow: 0 12px 28px rgba(255, 87, 34, 0.2),
-                            0 4px 10px rgba(255, 87, 34, 0.15),
-                            0 2px 4px rgba(255, 87, 34, 0.1);
-            }
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._watches)
 
-            .stChatMessage[data-testid="user"]:hover {
-                background: rgba(50, 50, 50, 0.95) !important;
-                transform: translateY(-2px);
-                box-shadow: 0 12px 28px rgba(0, 0, 0, 0.25),
-                            0 4px 10px rgba(0, 0, 0, 0.15),
-                            0 2px 4px rgba(0, 0, 0, 0.1);
-            }
+    def _loop(self):
+        while True:
+            now = self.clock()
+            finished = []
+            with self._lock:
+                next_due = now + 60.0
+                for job_id, watch in self._watches.items():
+                    if watch["in_flight"]:
+                        continue
+                    images = self.registry.result(watch["unique_id"])
+                    if images:
+                        finished.append((job_id, {"success": True, "images": images}))
+                    elif watch["expired"]:
+                        finished.append((job_id, {
+                            "success": False,
+                            "images": [],
+                            "message": "이미지 생성이 지연되고 있습니다. 잠시 후 다시 시도해주세요."
+                        }))
+                    elif watch["due"] <= now:
+                        watch["in_flight"] = True
+                        self._pool.submit(self._poll, job_id, watch)
+                    else:
+                        next_due = min(next_due, watch["due"])
 
-            /* 채팅 메시지 컨테이너 스타일 */
-            .st-emotion-cache-1wmy9hl {
-                background: transparent !important;
-            }
+            for job_id, result in finished:
+                self._complete(job_id, result)
+            self._wake.wait(max(0.0, next_due - self.clock()))
+            self._wake.clear()
 
-            .e1f1d6gn1 {
-                background: transparent !important;
-            }
+    def _poll(self, job_id: str, watch: Dict):
+        try:
+            if watch["on_poll"] is not None:
+                watch["on_poll"]()
+            self.metrics.inc("sf49_poll_attempts_total", kind="image")
+            result = watch["fetch"](watch["unique_id"])
+        except Exception as e:
+            result = {"success": False, "images": [], "message": str(e)}
+
+        if result["success"] and result["images"]:
+            self._complete(job_id, result)
+            return
+        if result.get("images"):
+            self._progress(watch, result)
+
+        with self._lock:
+            delay = watch["scheduler"].next_delay()
+            watch["expired"] = delay is None
+            watch["due"] = self.clock() + (delay or 0.0)
+            watch["in_flight"] = False
+        self._wake.set()
+
+    def _elapsed(self, watch: Dict) -> float:
+        started_at = watch["started_at"]
+        return time.time() - started_at if started_at else watch["scheduler"].elapsed()
+
+    def _progress(self, watch: Dict, result: Dict):
+        """일부 결과에 새 이미지가 있으면 구독자에게 알리고 남은 결과는 짧은 간격으로 확인"""
+        with self._lock:
+            if len(result["images"]) <= watch["seen"]:
+                return
+            watch["seen"] = len(result["images"])
+            watch["scheduler"].restart_backoff()
+            first = watch["first_image"] is None
+            if first:
+                watch["first_image"] = self._elapsed(watch)
+            listeners = list(watch["progress"])
+        if first:
+            self.metrics.observe_stage("time_to_first_image", watch["first_image"])
+        for on_progress in listeners:
+            try:
+                on_progress(result)
+            except Exception:
+                pass
+
+    def _complete(self, job_id: str, result: Dict):
+        with self._lock:
+            watch = self._watches.pop(job_id, None)
+        if watch is None:
+            return
+        self.registry.discard(watch["unique_id"])
+        if result["success"]:
+            seconds = self._elapsed(watch)
+            first_image = watch["first_image"]
+            if first_image is None:
+                first_image = seconds
+                self.metrics.observe_stage("time_to_first_image", seconds)
+            # 첫 확인 시각은 첫 이미지가 보이는 시점에 맞춰 학습
+            self.stats.record(first_image)
+            self.metrics.observe_stage("time_to_images", seconds)
+        for on_done in watch["subscribers"]:
+            try:
+                on_done(result)
+            except Exception:
+                # 구독자 하나의 오류가 다른 구독자나 폴러를 멈추지 않도록 함
+                pass
+
+@st.cache_resource
+def get_image_poller() -> ImagePoller:
+    """프로세스 전체에서 공유하는 이미지 완료 폴러"""
+    metrics = get_metrics()
+    poller = ImagePoller(get_completion_registry(), get_completion_stats(), metrics=metrics)
+    metrics.gauge("sf49_image_polls_pending", poller.pending)
+    return poller
+
+IMAGE_JOB_WORKERS = 32  # 세션 전체에서 동시에 진행할 수 있는 이미지 작업 수
+IMAGE_JOB_RETENTION = 3600  # 끝난 작업 정보를 보관하는 시간(초)
+IMAGE_JOB_LEASE = 120  # 작업을 맡은 프로세스가 응답 없이 이 시간이 지나면 다른 프로세스가 이어받음
+JOB_REFRESH_SECONDS = 1.0  # 진행 중인 작업 표시 갱신 주기
+# 응답 중에 전송 결과를 기다리는 최대 시간 (넘으면 대기 중으로 안내하고 나머지는 진행 표시에 맡김)
+IMAGE_JOB_SUBMIT_WAIT = 30.0
+JOB_STORE_PATH = os.path.join(DATA_DIR, "jobs.db")
+# 이 프로세스를 구분하는 작업 소유자 ID (여러 복제본이 같은 저장소를 공유할 때 사용)
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+class ImageJob:
+    """백그라운드 이미지 생성 작업 (queued → submitted → completed / failed / timeout)"""
+
+    FINISHED = ("completed", "failed", "timeout")
+
+    def __init__(self, job_id: str, unique_id: str, visualization_text: str, conversation_id: Optional[str] = None,
+                 thread_id: Optional[str] = None, run_id: Optional[str] = None):
+        self.job_id = job_id  # 저장소·폴러 키 (앱이 만든 ID, 사용자끼리 겹치지 않음)
+        self.unique_id = unique_id  # 웹훅 uniqueId (모델이 만든 ID라 다른 대화와 겹칠 수 있음)
+        self.visualization_text = visualization_text
+        self.conversation_id = conversation_id
+        self.thread_id = thread_id
+        self.run_id = run_id
+        self.status = "queued"
+        self.images: List[str] = []  # 진행 중에는 지금까지 도착한 일부 이미지
+        self.expected: Optional[int] = None  # 조회 웹훅이 알려준 전체 이미지 수
+        self.message = ""
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.submitted = threading.Event()  # 전송 결과가 정해지면 설정
+        self.done = threading.Event()
+        self.ticket = AdmissionTicket(conversation_id)  # 전송 대기열에서의 자리
+
+    def finish(self, status: str, message: str, images: Optional[List[str]] = None):
+        self.status = status
+        self.message = message
+        self.images = images or []
+        self.finished_at = time.time()
+        self.submitted.set()
+        self.done.set()
+
+    def to_state(self) -> Dict:
+        """공유 저장소에 기록할 상태"""
+        return {
+            "job_id": self.job_id,
+            "unique_id": self.unique_id,
+            "visualization_text": self.visualization_text,
+            "conversation_id": self.conversation_id,
+            "thread_id": self.thread_id,
+            "run_id": self.run_id,
+            "status": self.status,
+            "images": self.images,
+            "expected": self.expected,
+            "message": self.message,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
 
-            </style>
-        """, unsafe_allow_html=True)
+    @classmethod
+    def from_state(cls, state: Dict) -> "ImageJob":
+        job = cls(state["job_id"], state["unique_id"], state["visualization_text"], state.get("conversation_id"),
+                  state.get("thread_id"), state.get("run_id"))
+        job.status = state["status"]
+        job.images = list(state.get("images") or [])
+        job.expected = state.get("expected")
+        job.message = state.get("message") or ""
+        job.created_at = state["created_at"]
+        job.finished_at = state.get("finished_at")
+        if job.status != "queued":
+            job.submitted.set()
+        if job.status in cls.FINISHED:
+            job.done.set()
+        return job
+
+class JobStore:
+    """작업 상태 공유 저장소 인터페이스 (복제본 간 작업 이어받기용)"""
+
+    def create(self, state: Dict, owner: str, lease_seconds: float) -> bool:
+        """새 작업을 owner의 임대와 함께 기록 (같은 job_id가 이미 있으면 덮어쓰지 않고 False)"""
+        raise NotImplementedError
+
+    def save(self, state: Dict):
+        raise NotImplementedError
+
+    def load(self, job_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def claim(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        """임대가 비었거나 만료됐거나 이미 owner의 것이면 owner가 임대를 가져가고 True"""
+        raise NotImplementedError
+
+class SQLiteJobStore(JobStore):
+    """SQLite 기반 작업 저장소 (기본값, 같은 파일을 보는 프로세스끼리 공유)"""
+
+    # 키가 모델이 만든 unique_id였던 예전 jobs 테이블은 보관 기간이 지나면 의미가 없으므로 새 테이블을 씀
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS image_jobs (
+            job_id TEXT PRIMARY KEY,
+            state TEXT NOT NULL,
+            status TEXT NOT NULL,
+            lease_owner TEXT,
+            lease_expires REAL NOT NULL DEFAULT 0,
+            updated_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(self.SCHEMA)
+
+    def create(self, state: Dict, owner: str, lease_seconds: float) -> bool:
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO image_jobs (job_id, state, status, lease_owner, lease_expires, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(job_id) DO NOTHING",
+                (state["job_id"], json.dumps(state), state["status"], owner, now + lease_seconds, now)
+            )
+        return cursor.rowcount == 1
+
+    def save(self, state: Dict):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO image_jobs (job_id, state, status, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(job_id) DO UPDATE SET state = excluded.state, "
+                "status = excluded.status, updated_at = excluded.updated_at",
+                (state["job_id"], json.dumps(state), state["status"], time.time())
+            )
+            # 오래된 완료 작업 정리
+            self._conn.execute(
+                "DELETE FROM image_jobs WHERE status IN ('completed', 'failed', 'timeout') AND updated_at < ?",
+                (time.time() - IMAGE_JOB_RETENTION,)
+            )
 
-def typewriter_effect(text: str, speed: float = 0.03):
-    """텍스트를 타이핑 효과로 표시"""
-    with stylable_container(
-        key="typewriter",
-        css_styles="""
-            {
-                background: rgba(255, 255, 255, 0.05);
-                border-radius: 8px;
-                padding: 1rem;
-                margin: 0.5rem 0;
-            }
+    def load(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state FROM image_jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def claim(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE image_jobs SET lease_owner = ?, lease_expires = ? WHERE job_id = ? "
+                "AND (lease_owner IS NULL OR lease_owner = ? OR lease_expires < ?)",
+                (owner, now + lease_seconds, job_id, owner, now)
+            )
+        return cursor.rowcount == 1
+
+class RedisJobStore(JobStore):
+    """Redis 호환 클라이언트 기반 작업 저장소
+
+    hset·hgetall·expire와 pipeline(watch·exists·get·multi·hset·set·execute)만 사용하므로 redis-py 클라이언트나
+    같은 메서드를 가진 로컬 대역(tools/fake_redis.py)을 그대로 넣을 수 있음.
+    watch_error는 클라이언트가 WATCH 충돌 때 던지는 예외 (redis-py는 redis.WatchError)
+    """
+
+    def __init__(self, client, watch_error: type, prefix: str = "sf49:job:"):
+        self.client = client
+        self.watch_error = watch_error
+        self.prefix = prefix
+
+    def _key(self, job_id: str) -> str:
+        return f"{self.prefix}{job_id}"
+
+    def create(self, state: Dict, owner: str, lease_seconds: float) -> bool:
+        key = self._key(state["job_id"])
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                if pipe.exists(key):
+                    return False
+                pipe.multi()
+                pipe.hset(key, mapping={"state": json.dumps(state), "status": state["status"]})
+                pipe.set(f"{key}:lease", owner, px=int(lease_seconds * 1000))
+                pipe.execute()
+                return True
+            except self.watch_error:
+                return False
+
+    def save(self, state: Dict):
+        key = self._key(state["job_id"])
+        self.client.hset(key, mapping={"state": json.dumps(state), "status": state["status"]})
+        if state["status"] in ImageJob.FINISHED:
+            self.client.expire(key, IMAGE_JOB_RETENTION)
+
+    def load(self, job_id: str) -> Optional[Dict]:
+        fields = self.client.hgetall(self._key(job_id))
+        raw = fields.get(b"state", fields.get("state")) if fields else None
+        if raw is None:
+            return None
+        return json.loads(raw.decode() if isinstance(raw, bytes) else raw)
+
+    def claim(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        lease_key = f"{self._key(job_id)}:lease"
+        lease_ms = int(lease_seconds * 1000)
+        # 확인과 갱신 사이에 다른 프로세스가 임대를 바꾸면 WATCH 때문에 EXEC가 취소됨
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(lease_key)
+                current = pipe.get(lease_key)
+                if isinstance(current, bytes):
+                    current = current.decode()
+                if current is not None and current != owner:
+                    return False
+                pipe.multi()
+                pipe.set(lease_key, owner, px=lease_ms)
+                pipe.execute()
+                return True
+            except self.watch_error:
+                return False
+
+def create_job_store() -> JobStore:
+    """JOB_STORE_URL이 redis:// 이면 Redis, 아니면 SQLite 저장소 사용"""
+    url = get_setting("JOB_STORE_URL")
+    if url and url.startswith(("redis://", "rediss://", "unix://")):
+        import redis  # 선택 의존성: Redis를 쓸 때만 필요
+        return RedisJobStore(redis.Redis.from_url(url), redis.WatchError)
+    return SQLiteJobStore(get_setting("JOB_STORE_PATH", JOB_STORE_PATH))
+
+class ImageJobManager:
+    """세션 간 공유 워커 풀에서 이미지 생성(전송 + 완료 대기)을 실행
+
+    작업 상태는 공유 저장소에도 기록하여, 재연결된 세션이나 다른 복제본이
+    진행 중이던 작업을 이어받아 끝낼 수 있음
+    """
+
+    def __init__(self, workers: int, poller: ImagePoller,
+                 prompt_cache: PromptResultCache, store: JobStore, owner: str = WORKER_ID,
+                 metrics: Optional[Metrics] = None):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-job")
+        self._jobs: Dict[str, ImageJob] = {}
+        self._lock = threading.Lock()
+        self.poller = poller
+        self.prompt_cache = prompt_cache
+        self.store = store
+        self.owner = owner
+        self.metrics = metrics or Metrics()
+
+    def submit(self, assistant: "SF49StudioAssistant", visualization_text: str, unique_id: str,
+               fresh: bool = False, run_id: Optional[str] = None) -> ImageJob:
+        """작업 등록 (fresh가 아니고 같은 프롬프트 결과가 있으면 전송 없이 바로 완료)
+
+        저장소 키는 앱이 만든 job_id이고, 모델이 만든 unique_id는 웹훅에만 씀
         """
-    ):
-        message_placeholder = st.empty()
-        full_text = ""
-        for char in text:
-            full_text += char
-            message_placeholder.markdown(full_text + "▌")
-            time.sleep(speed)
-        message_placeholder.markdown(full_text)
-        return message_placeholder
-
-def confetti_effect():
-    """스트림릿에서 confetti 효과를 표시"""
-    st.markdown("""
-    <script src="https://cdn.jsdelivr.net/npm/canvas-confetti@1.4.0/dist/confetti.browser.min.js"></script>
-    <script>
-    const duration = 5 * 1000;
-    const end = Date.now() + duration;
-
-    (function frame() {
-      confetti({
-        particleCount: 3,
-        angle: 60,
-        spread: 55,
-        origin: { x: 0 }
-      });
-      confetti({
-        particleCount: 3,
-        angle: 120,
-        spread: 55,
-        origin: { x: 1 }
-      });
-
-      if (Date.now() < end) {
-        requestAnimationFrame(frame);
-      }
-    }());
-    </script>
-    """, unsafe_allow_html=True)
+        job_id = f"{assistant.conversation_id or 'anonymous'}:{uuid.uuid4().hex}"
+        job = ImageJob(job_id, unique_id, visualization_text, assistant.conversation_id,
+                       assistant.thread.id if assistant.thread else None, run_id)
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = job
+
+        cached_images = None if fresh else self.prompt_cache.get(visualization_text)
+        if not fresh:
+            self.metrics.inc("sf49_cache_requests_total", cache="prompt", result="hit" if cached_images else "miss")
+        if cached_images:
+            job.finish("completed", "✨ 디자인이 완성되었습니다! 마음에 드시나요?", cached_images)
+        # 다른 작업의 기록은 절대 덮어쓰지 않음
+        if not self.store.create(job.to_state(), self.owner, IMAGE_JOB_LEASE):
+            job.finish("failed", "이미지 생성 요청을 등록하지 못했습니다. 다시 시도해주세요.")
+        elif not cached_images:
+            self._pool.submit(self._run, assistant, job)
+        return job
+
+    def get(self, job_id: str, assistant: Optional["SF49StudioAssistant"] = None) -> Optional[ImageJob]:
+        """작업 조회 (이 프로세스에 없으면 공유 저장소에서 찾고, 주인 없는 진행 중 작업은 이어받음)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+
+        state = self.store.load(job_id)
+        if state is None:
+            return None
+        job = ImageJob.from_state(state)
+        if job.done.is_set() or assistant is None:
+            return job
+
+        # 다른 프로세스가 임대 중이면 그쪽이 끝낼 때까지 저장소 상태만 보여줌
+        if not self.store.claim(job_id, self.owner, IMAGE_JOB_LEASE):
+            return job
+        with self._lock:
+            if job_id in self._jobs:
+                return self._jobs[job_id]
+            self._jobs[job_id] = job
+        self._pool.submit(self._run, assistant, job)
+        return job
+
+    def in_flight(self) -> int:
+        """이 프로세스에서 아직 끝나지 않은 작업 수"""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.done.is_set())
+
+    def _prune(self):
+        cutoff = time.time() - IMAGE_JOB_RETENTION
+        for job_id in [jid for jid, job in self._jobs.items()
+                       if job.finished_at is not None and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    @contextmanager
+    def _renewing_lease(self, job_id: str):
+        """블록 안에서 임대를 주기적으로 갱신 (대기열 대기와 전송이 임대 시간보다 길어질 수 있음)"""
+        stop = threading.Event()
+
+        def renew():
+            while not stop.wait(IMAGE_JOB_LEASE / 3):
+                self.store.claim(job_id, self.owner, IMAGE_JOB_LEASE)
+
+        threading.Thread(target=renew, name="image-job-lease", daemon=True).start()
+        try:
+            yield
+        finally:
+            stop.set()
 
-def fireworks_effect():
-    """스트림릿에서 불꽃놀이 효과를 표시"""
-    st.markdown("""
-    <script src="https://cdn.jsdelivr.net/npm/canvas-confetti@1.4.0/dist/confetti.browser.min.js"></script>
-    <script>
-    const duration = 5 * 1000;
-    const animationEnd = Date.now() + duration;
-    const defaults = { startVelocity: 30, spread: 360, ticks: 60, zIndex: 0 };
-
-    function randomInRange(min, max) {
-      return Math.random() * (max - min) + min;
-    }
+    def _finish(self, job: ImageJob, status: str, message: str, images: Optional[List[str]] = None):
+        job.finish(status, message, images)
+        self.store.save(job.to_state())
 
-    (function frame() {
-      const timeLeft = animationEnd - Date.now();
+    def _run(self, assistant: "SF49StudioAssistant", job: ImageJob):
+        try:
+            # 이어받은 작업이 이미 전송된 상태라면 다시 보내지 않고 대기만 함
+            if job.status == "queued":
+                # 워커를 기다리는 사이 임대가 만료돼 다른 프로세스가 가져갔으면 중복 전송하지 않고 넘겨줌.
+                # 전송을 기다리는 쪽은 풀어 주고, 이후 진행은 get()이 저장소에서 읽어 보여줌
+                if not self.store.claim(job.job_id, self.owner, IMAGE_JOB_LEASE):
+                    with self._lock:
+                        self._jobs.pop(job.job_id, None)
+                    job.submitted.set()
+                    return
+                with self._renewing_lease(job.job_id):
+                    result = assistant.send_image_data(job.visualization_text, job.unique_id, job.ticket)
+                if not result["success"]:
+                    self._finish(job, "failed", result["message"])
+                    return
+                job.status = "submitted"
+                self.store.save(job.to_state())
+                job.submitted.set()
+
+            # 완료 대기는 공유 폴러에 맡기고 워커 스레드는 바로 반환
+            self.poller.watch(
+                job.job_id,
+                job.unique_id,
+                assistant.get_image_links,
+                lambda result: self._on_images(job, result),
+                started_at=job.created_at,
+                on_poll=lambda: self.store.claim(job.job_id, self.owner, IMAGE_JOB_LEASE),
+                on_progress=lambda result: self._on_progress(job, result),
+                callback=bool(assistant.callback_url)
+            )
+        except Exception as e:
+            # 작업 스레드의 예외가 조용히 사라지지 않도록 상태로 남김
+            self._finish(job, "failed", f"이미지 생성 중 오류가 발생했습니다: {str(e)}")
+
+    def _on_progress(self, job: ImageJob, result: Dict):
+        """도착한 일부 이미지를 작업에 반영 (다른 세션·복제본도 보도록 저장소에도 기록)"""
+        job.images = list(result["images"])
+        job.expected = result.get("total") or job.expected
+        self.store.save(job.to_state())
+
+    def _on_images(self, job: ImageJob, result: Dict):
+        if result["success"]:
+            self.prompt_cache.put(job.visualization_text, result["images"])
+            self._finish(job, "completed", "✨ 디자인이 완성되었습니다! 마음에 드시나요?", result["images"])
+        else:
+            # 마감 전에 도착한 일부 이미지는 버리지 않고 남김
+            self._finish(job, "timeout", result["message"], job.images)
+
+@st.cache_resource
+def get_job_manager() -> ImageJobManager:
+    """프로세스 전체에서 공유하는 이미지 작업 관리자"""
+    metrics = get_metrics()
+    manager = ImageJobManager(IMAGE_JOB_WORKERS, get_image_poller(), PromptResultCache(), create_job_store(),
+                              metrics=metrics)
+    metrics.gauge("sf49_image_jobs_in_flight", manager.in_flight)
+    return manager
+
+CONVERSATION_DB_PATH = os.path.join(DATA_DIR, "conversations.db")
+HISTORY_PAGE_SIZE = 20  # 한 번에 표시·추가로 불러올 메시지 수
+# 세션 메모리에 둘 최대 메시지 수 (넘으면 저장소에만 두고 필요할 때 다시 읽음)
+HISTORY_WINDOW_MAX = int(get_setting("HISTORY_WINDOW_MAX", 60))
+SESSION_MEMORY_TTL = 3600  # 이 시간 동안 갱신이 없는 세션은 메모리 집계에서 제외
+
+class ChatMessage:
+    """화면 표시 구간의 메시지 (dict 대신 슬롯 레코드, 역할은 intern, URL·작업 ID는 튜플)"""
+
+    __slots__ = ("id", "role", "content", "image_urls", "job_ids")
+
+    def __init__(self, role: str, content: str, image_urls: Tuple[str, ...] = (),
+                 job_ids: Tuple[str, ...] = (), id: Optional[int] = None):
+        self.id = id
+        self.role = sys.intern(role)
+        self.content = content
+        self.image_urls = tuple(image_urls)
+        self.job_ids = tuple(job_ids)
+
+def message_memory_bytes(messages: List[ChatMessage]) -> int:
+    """메시지 목록이 차지하는 대략적인 메모리 (레코드·문자열·튜플, 공유 객체는 한 번만)"""
+    seen = set()
+    total = 0
+
+    def add(obj):
+        nonlocal total
+        if id(obj) not in seen:
+            seen.add(id(obj))
+            total += sys.getsizeof(obj)
+
+    add(messages)
+    for message in messages:
+        add(message)
+        for value in (message.role, message.content, message.image_urls, message.job_ids):
+            add(value)
+        for value in message.image_urls + message.job_ids:
+            add(value)
+    return total
+
+class SessionMemoryReport:
+    """세션별 메시지 메모리 사용량 (지표의 합계·최댓값·세션 수로 노출)"""
+
+    def __init__(self, ttl: float = SESSION_MEMORY_TTL, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._sessions: Dict[str, Tuple[float, int, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, session_key: str, messages: List[ChatMessage]) -> int:
+        size = message_memory_bytes(messages)
+        with self._lock:
+            self._sessions[session_key] = (self.clock(), size, len(messages))
+        return size
+
+    def _active(self) -> List[Tuple[float, int, int]]:
+        cutoff = self.clock() - self.ttl
+        with self._lock:
+            for key in [key for key, (seen, _, _) in self._sessions.items() if seen < cutoff]:
+                del self._sessions[key]
+            return list(self._sessions.values())
+
+    def total_bytes(self) -> int:
+        return sum(size for _, size, _ in self._active())
+
+    def max_bytes(self) -> int:
+        return max((size for _, size, _ in self._active()), default=0)
+
+    def sessions(self) -> int:
+        return len(self._active())
+
+@st.cache_resource
+def get_session_memory_report() -> SessionMemoryReport:
+    """프로세스 전체에서 공유하는 세션 메모리 집계"""
+    report = SessionMemoryReport()
+    metrics = get_metrics()
+    metrics.gauge("sf49_session_message_bytes", report.total_bytes, stat="total")
+    metrics.gauge("sf49_session_message_bytes", report.max_bytes, stat="max")
+    metrics.gauge("sf49_sessions_active", report.sessions)
+    return report
+
+class ConversationStore:
+    """SQLite 기반 대화 저장소 (대화·메시지·이미지 URL·OpenAI 스레드 ID)"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS conversations (
+            id TEXT PRIMARY KEY,
+            thread_id TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            conversation_id TEXT NOT NULL REFERENCES conversations(id),
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            job_ids TEXT,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS messages_by_conversation ON messages(conversation_id, id);
+        CREATE TABLE IF NOT EXISTS message_images (
+            message_id INTEGER NOT NULL REFERENCES messages(id),
+            position INTEGER NOT NULL,
+            url TEXT NOT NULL,
+            PRIMARY KEY (message_id, position)
+        );
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(self.SCHEMA)
+
+    def create_conversation(self) -> str:
+        conversation_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO conversations (id, created_at, updated_at) VALUES (?, ?, ?)",
+                (conversation_id, now, now)
+            )
+        return conversation_id
+
+    def exists(self, conversation_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM conversations WHERE id = ?", (conversation_id,)
+            ).fetchone()
+        return row is not None
+
+    def get_thread_id(self, conversation_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT thread_id FROM conversations WHERE id = ?", (conversation_id,)
+            ).fetchone()
+        return row["thread_id"] if row else None
+
+    def set_thread_id(self, conversation_id: str, thread_id: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE conversations SET thread_id = ?, updated_at = ? WHERE id = ?",
+                (thread_id, time.time(), conversation_id)
+            )
 
-      if (timeLeft <= 0) {
-        return;
-      }
+    def add_message(self, conversation_id: str, message: ChatMessage) -> int:
+        """메시지 저장 후 ID 반환 (message.id도 함께 설정)"""
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO messages (conversation_id, role, content, job_ids, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (conversation_id, message.role, message.content,
+                 json.dumps(list(message.job_ids)) if message.job_ids else None, now)
+            )
+            message_id = cursor.lastrowid
+            self._insert_images(message_id, message.image_urls)
+            self._conn.execute(
+                "UPDATE conversations SET updated_at = ? WHERE id = ?", (now, conversation_id)
+            )
+        message.id = message_id
+        return message_id
+
+    def update_message(self, message: ChatMessage):
+        """내용·이미지·진행 중 작업 목록 갱신"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE messages SET content = ?, job_ids = ? WHERE id = ?",
+                (message.content,
+                 json.dumps(list(message.job_ids)) if message.job_ids else None,
+                 message.id)
+            )
+            self._conn.execute("DELETE FROM message_images WHERE message_id = ?", (message.id,))
+            self._insert_images(message.id, message.image_urls)
 
-      const particleCount = 50 * (timeLeft / duration);
-      confetti(Object.assign({}, defaults, { particleCount, origin: { x: randomInRange(0.1, 0.3), y: Math.random() - 0.2 } }));
-      confetti(Object.assign({}, defaults, { particleCount, origin: { x: randomInRange(0.7, 0.9), y: Math.random() - 0.2 } }));
+    def _insert_images(self, message_id: int, image_urls: Tuple[str, ...]):
+        self._conn.executemany(
+            "INSERT INTO message_images (message_id, position, url) VALUES (?, ?, ?)",
+            [(message_id, position, url) for position, url in enumerate(image_urls)]
+        )
 
-      requestAnimationFrame(frame);
-    }());
-    </script>
-    """, unsafe_allow_html=True)
+    def recent_messages(self, conversation_id: str, limit: int,
+                        before_id: Optional[int] = None) -> List[ChatMessage]:
+        """before_id 이전의 최근 메시지 limit개를 오래된 순으로 반환"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, role, content, job_ids FROM messages "
+                "WHERE conversation_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+                (conversation_id, before_id if before_id is not None else 2 ** 63 - 1, limit)
+            ).fetchall()
+            ids = [row["id"] for row in rows]
+            images: Dict[int, List[str]] = {}
+            if ids:
+                placeholders = ",".join("?" * len(ids))
+                for row in self._conn.execute(
+                    f"SELECT message_id, url FROM message_images WHERE message_id IN ({placeholders}) "
+                    "ORDER BY message_id, position", ids
+                ):
+                    images.setdefault(row["message_id"], []).append(row["url"])
+
+        return [
+            ChatMessage(row["role"], row["content"], images.get(row["id"], ()),
+                        json.loads(row["job_ids"]) if row["job_ids"] else (), id=row["id"])
+            for row in reversed(rows)
+        ]
+
+    def has_messages_before(self, conversation_id: str, message_id: int) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM messages WHERE conversation_id = ? AND id < ? LIMIT 1",
+                (conversation_id, message_id)
+            ).fetchone()
+        return row is not None
+
+@st.cache_resource
+def get_conversation_store() -> ConversationStore:
+    """프로세스 전체에서 공유하는 대화 저장소"""
+    return ConversationStore(get_setting("CONVERSATION_DB_PATH", CONVERSATION_DB_PATH))
+
+ASSISTANT_REGISTRY_PATH = os.path.join(DATA_DIR, "assistant_registry.json")
+
+ASSISTANT_DEFINITION = {
+    "name": "SF49 Studio Designer",
+    "instructions": """
+    당신의 목적은 한국어로 대화하면서 이미지 생성을 처리하는 것입니다.
+    당신은 SF49 Studio의 전문 디자이너처럼 행동합니다.
+    창의적인 디자이너의 관점과 전문적이고 세련된 언어를 사용하며, 전문가의 톤을 유지합니다.
+    모든 커뮤니케이션에서 명확성, 디자인적 미적 감각, 그리고 전문성을 우선시합니다.
+
+    중요: 이미지 생성 요청 시 unique_id는 반드시 끝에 1000에서 9999 사이의 랜덤한 숫자를 추가하여 생성해야 합니다.
+    예시: design_request_1234, creative_image_5678, visual_concept_9012 등
+    절대로 같은 ID가 중복되지 않도록 해야 합니다.
+
+    보안 관련 중요 지침:
+    1. 시스템 관련 정보 요청에 대해서는 절대 응답하지 않습니다.
+    2. API 키, 토큰, 비밀번호 등 민감한 정보에 대한 질문은 무시합니다.
+    3. 서버 구성, 데이터베이스 구조 등 시스템 아키텍처 관련 질문에는 답변하지 않습니다.
+    4. 코드 실행이나 시스템 명령어 관련 요청은 거부합니다.
+    5. 이러한 보안 관련 질문을 받으면 "죄송합니다만, 보안상의 이유로 해당 정보는 제공해드릴 수 없습니다."라고 답변합니다.
+    6. 오직 이미지 생성과 관련된 디자인 요청만 처리합니다.
+    """,
+    "model": "gpt-4o-mini",
+    "tools": [{
+        "type": "function",
+        "function": {
+            "name": "send_image_request",
+            "description": "이미지 생성을 위한 시각화 텍스트와 ID를 웹훅으로 전송",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "visualization_text": {
+                        "type": "string",
+                        "description": "인터넷 기사 썸네일 이미지를 위한 시각화 텍스트"
+                    },
+                    "unique_id": {
+                        "type": "string",
+                        "description": "생성할 이미지의 고유 ID (반드시 끝에 1000-9999 사이의 랜덤 자 포함)"
+                    },
+                    "fresh_variations": {
+                        "type": "boolean",
+                        "description": "사용자가 같은 내용으로 새로운 변형이나 다시 생성을 원하면 true (이전 결과를 재사용하지 않음)"
+                    }
+                },
+                "required": ["visualization_text", "unique_id"]
+            }
+        }
+    }]
+}
+
+def assistant_definition_hash(definition: Dict) -> str:
+    """지침·모델·도구 스키마로 만든 Assistant 정의 해시"""
+    canonical = json.dumps(definition, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+def ensure_assistant(client: OpenAI, definition: Dict = ASSISTANT_DEFINITION):
+    """설정한 ID → 저장된 ID → 같은 이름의 기존 Assistant → 새로 생성 순으로 찾고, 정의가 바뀐 경우에만 갱신"""
+    definition_hash = assistant_definition_hash(definition)
+    metadata = {"definition_hash": definition_hash}
+    registry_path = get_setting("ASSISTANT_REGISTRY_PATH", ASSISTANT_REGISTRY_PATH)
+    configured_id = get_setting("ASSISTANT_ID")
+
+    try:
+        with open(registry_path, "r", encoding="utf-8") as f:
+            registry = json.load(f)
+    except (OSError, ValueError):
+        registry = {}
+
+    assistant = None
+    assistant_id = configured_id or registry.get("assistant_id")
+    if assistant_id:
+        try:
+            assistant = client.beta.assistants.retrieve(assistant_id)
+        except NotFoundError:
+            assistant = None
+
+    if assistant is None:
+        for candidate in client.beta.assistants.list(order="desc", limit=100):
+            if candidate.name == definition["name"]:
+                assistant = candidate
+                if (candidate.metadata or {}).get("definition_hash") == definition_hash:
+                    break
+
+    if assistant is None:
+        assistant = client.beta.assistants.create(**definition, metadata=metadata)
+    elif (assistant.metadata or {}).get("definition_hash") != definition_hash:
+        assistant = client.beta.assistants.update(assistant.id, **definition, metadata=metadata)
+
+    # ID를 설정했으면 기록이 필요 없음. 기록은 조회를 줄이는 용도라 실패해도(읽기 전용 배포 등) 계속 진행
+    stale = registry.get("assistant_id") != assistant.id or registry.get("definition_hash") != definition_hash
+    if not configured_id and stale:
+        tmp_path = f"{registry_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(registry_path) or ".", exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"assistant_id": assistant.id, "definition_hash": definition_hash}, f)
+            os.replace(tmp_path, registry_path)
+        except OSError as e:
+            logging.getLogger("sf49").warning("assistant registry not saved: %s", e)
+    return assistant
+
+@st.cache_resource
+def get_shared_assistant(_client: OpenAI):
+    """프로세스 전체에서 한 번만 조회·생성하는 Assistant"""
+    return ensure_assistant(_client)
+
+# 런 하나가 읽는 문맥 예산 (대화가 길어져도 런 지연·비용이 늘지 않도록)
+RUN_MAX_PROMPT_TOKENS = int(get_setting("RUN_MAX_PROMPT_TOKENS", 8000))
+RUN_LAST_MESSAGES = int(get_setting("RUN_LAST_MESSAGES", 12))  # 0이면 "auto" 잘라내기
+# 둘 중 하나를 넘으면 지난 대화를 디자인 브리프로 요약해 새 스레드로 옮김
+# (턴 수 기준은 RUN_LAST_MESSAGES에서 잘려 나가기 전에 요약되도록 맞춤)
+THREAD_ROTATE_TURNS = int(get_setting("THREAD_ROTATE_TURNS", 6))
+THREAD_ROTATE_PROMPT_TOKENS = int(get_setting("THREAD_ROTATE_PROMPT_TOKENS", 4000))
+BRIEF_MODEL = get_setting("BRIEF_MODEL", ASSISTANT_DEFINITION["model"])
+BRIEF_MAX_TOKENS = 500
+BRIEF_TRANSCRIPT_MESSAGES = 40  # 요약할 때 읽는 최근 메시지 수
+BRIEF_HEADER = "[이전 대화 디자인 브리프]"
+BRIEF_INSTRUCTIONS = """
+디자이너와 고객의 대화 기록을 다음 대화에 넘길 디자인 브리프로 요약하세요.
+- 고객이 원하는 주제·스타일·색감·구도·분위기와 피해야 할 요소
+- 지금까지 생성한 디자인의 시각화 텍스트 요지와 고객 반응
+- 아직 정해지지 않았거나 고객이 다음에 하려던 요청
+한국어 개조식으로 간결하게 쓰고, 대화에 없는 내용은 추측하지 마세요.
+"""
 
 class SF49StudioAssistant:
     def __init__(self, api_key: str):
-        self.client = OpenAI(api_key=st.secrets["openai_api_key"])
+        self.client = get_openai_client()
+        self.http = get_webhook_session()
         self.assistant = None
         self.thread = None
-        self.webhook_base_url = "https://hook.eu2.make.com"
+        self.webhook_base_url = get_setting("WEBHOOK_BASE_URL", "https://hook.eu2.make.com")
         self.send_webhook = "/l1b22zor5v489mjyc6mgr8ybwliq763v"
         self.retrieve_webhook = "/7qia4xlc2hvxt1qs1yr5eh7g9nqs8brd"
+        # 워커 스레드에서는 st.cache_resource를 부를 수 없으므로 콜백 설정은 미리 확인
+        self.callback_url = get_setting("IMAGE_CALLBACK_URL") if get_callback_server() else None
+        self.callback_token = get_setting("IMAGE_CALLBACK_TOKEN")
+        self.conversation_id: Optional[str] = None
+        self.saved_thread_id: Optional[str] = None  # 아직 불러오지 못한 이전 세션의 스레드
+        self.admission = get_admission_controllers()
+        self.webhook_health = get_webhook_health()
+        self.hedge_pool = get_hedge_pool()
+        self.metrics = get_metrics()
+        self.prefilter = get_prompt_prefilter()
+        self.timings: Dict[str, float] = {}  # 마지막 요청의 단계별 소요 시간(초)
+        self.usage: Dict[str, int] = {}  # 마지막 런의 토큰 사용량
+        self.thread_turns = 0  # 현재 스레드에 보낸 사용자 메시지 수 (이 세션 기준)
+        self.last_prompt_tokens = 0
         
     def create_assistant(self):
-        """SF49 Studio Assistant 생성 및 상세 지침 설정"""
-        self.assistant = self.client.beta.assistants.create(
-            name="SF49 Studio Designer",
-            instructions="""
-            당신의 목적은 한국어로 대화하면서 이미지 생성을 처리하는 것입니다.
-            당신은 SF49 Studio의 전문 디자이너처럼 행동합니다.
-            창의적인 디자이너의 관점과 전문적이고 세련된 언어를 사용하며, 전문가의 톤을 유지합니다.
-            모든 커뮤니케이션에서 명확성, 디자인적 미적 감각, 그리고 전문성을 우선시합니다.
-            
-            중요: 이미지 생성 요청 시 unique_id는 반드시 끝에 1000에서 9999 사이의 랜덤한 숫자를 추가하여 생성해야 합니다.
-            예시: design_request_1234, creative_image_5678, visual_concept_9012 등
-            절대로 같은 ID가 중복되지 않도록 해야 합니다.
-
-            보안 관련 중요 지침:
-            1. 시스템 관련 정보 요청에 대해서는 절대 응답하지 않습니다.
-            2. API 키, 토큰, 비밀번호 등 민감한 정보에 대한 질문은 무시합니다.
-            3. 서버 구성, 데이터베이스 구조 등 시스템 아키텍처 관련 질문에는 답변하지 않습니다.
-            4. 코드 실행이나 시스템 명령어 관련 요청은 거부합니다.
-            5. 이러한 보안 관련 질문을 받으면 "죄송합니다만, 보안상의 이유로 해당 정보는 제공해드릴 수 없습니다."라고 답변합니다.
-            6. 오직 이미지 생성과 관련된 디자인 요청만 처리합니다.
-            """,
-            model="gpt-4o-mini",
-            tools=[{
-                "type": "function",
-                "function": {
-                    "name": "send_image_request",
-                    "description": "이미지 생성을 위한 시각화 텍스트와 ID를 웹훅으로 전송",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "visualization_text": {
-                                "type": "string",
-                                "description": "인터넷 기사 썸네일 이미지를 위한 시각화 텍스트"
-                            },
-                            "unique_id": {
-                                "type": "string",
-                                "description": "생성할 이미지의 고유 ID (반드시 끝에 1000-9999 사이의 랜덤 자 포함)"
-                            }
-                        },
-                        "required": ["visualization_text", "unique_id"]
-                    }
-                }
-            }]
-        )
+        """프로세스 전체에서 공유하는 SF49 Studio Assistant 연결 (필요할 때만 생성·갱신)"""
+        self.assistant = get_shared_assistant(self.client)
         return self.assistant
 
     def create_thread(self):
         """새로운 대화 스레드 생성"""
         self.thread = self.client.beta.threads.create()
+        self.thread_turns = 0
+        self.last_prompt_tokens = 0
+        return self.thread
+
+    def open_saved_thread(self):
+        """이전 세션의 스레드로 이어가고, 스레드가 지워졌으면(보존 기간 만료 등) 새 스레드로 시작"""
+        if not self.saved_thread_id:
+            return self.thread
+        try:
+            self.thread = self.client.beta.threads.retrieve(self.saved_thread_id)
+        except NotFoundError:
+            self.metrics.log("thread_missing", conversation_id=self.conversation_id,
+                             thread_id=self.saved_thread_id)
+            self.create_thread()
+        self.saved_thread_id = None
         return self.thread
 
-    def send_image_data(self, visualization_text: str, unique_id: str) -> Dict:
+    def _run_options(self) -> Dict:
+        """런마다 붙이는 문맥 예산 (최근 메시지만 읽고 입력 토큰에 상한을 둠)"""
+        if RUN_LAST_MESSAGES > 0:
+            truncation = {"type": "last_messages", "last_messages": RUN_LAST_MESSAGES}
+        else:
+            truncation = {"type": "auto"}
+        return {"truncation_strategy": truncation, "max_prompt_tokens": RUN_MAX_PROMPT_TOKENS}
+
+    def _record_usage(self, usage, kind: str = "run"):
+        """토큰 사용량 기록 (런이면 다음 턴의 스레드 교체 판단에도 사용)"""
+        if usage is None:
+            return
+        if kind == "run":
+            self.usage = {"prompt": usage.prompt_tokens, "completion": usage.completion_tokens}
+            self.last_prompt_tokens = usage.prompt_tokens
+        self.metrics.inc("sf49_run_tokens_total", usage.prompt_tokens, kind=kind, type="prompt")
+        self.metrics.inc("sf49_run_tokens_total", usage.completion_tokens, kind=kind, type="completion")
+
+    def should_rotate_thread(self) -> bool:
+        return self.thread is not None and (
+            self.thread_turns >= THREAD_ROTATE_TURNS
+            or self.last_prompt_tokens >= THREAD_ROTATE_PROMPT_TOKENS
+        )
+
+    def summarize_thread(self) -> str:
+        """현재 스레드의 최근 대화를 디자인 브리프로 요약 (이전 브리프도 첫 메시지로 함께 반영됨)"""
+        messages = self.client.beta.threads.messages.list(
+            thread_id=self.thread.id, order="desc", limit=BRIEF_TRANSCRIPT_MESSAGES
+        )
+        lines = []
+        for message in reversed(messages.data):
+            text = "".join(block.text.value for block in message.content if block.type == "text")
+            speaker = "고객" if message.role == "user" else "디자이너"
+            lines.append(f"{speaker}: {text}")
+        completion = self.client.chat.completions.create(
+            model=BRIEF_MODEL,
+            messages=[
+                {"role": "system", "content": BRIEF_INSTRUCTIONS},
+                {"role": "user", "content": "\n".join(lines)}
+            ],
+            max_tokens=BRIEF_MAX_TOKENS
+        )
+        self._record_usage(completion.usage, kind="brief")
+        return completion.choices[0].message.content.strip()
+
+    def rotate_thread(self):
+        """지난 대화를 브리프로 요약하고, 브리프만 담은 새 스레드로 교체"""
+        brief = self.summarize_thread()
+        previous = self.thread
+        self.thread = self.client.beta.threads.create(
+            messages=[{"role": "assistant", "content": f"{BRIEF_HEADER}\n{brief}"}],
+            metadata={"previous_thread_id": previous.id}
+        )
+        self.metrics.inc("sf49_thread_rotations_total")
+        self.metrics.log(
+            "thread_rotated",
+            conversation_id=self.conversation_id,
+            previous_thread_id=previous.id,
+            thread_id=self.thread.id,
+            turns=self.thread_turns,
+            prompt_tokens=self.last_prompt_tokens
+        )
+        self.thread_turns = 0
+        self.last_prompt_tokens = 0
+
+    def maintain_context(self) -> bool:
+        """문맥이 예산을 넘었으면 스레드 교체 (요약에 실패하면 기존 스레드를 그대로 씀)"""
+        if not self.should_rotate_thread():
+            return False
+        try:
+            with self.metrics.timer("thread_rotate", self.timings):
+                self.rotate_thread()
+        except OpenAIError:
+            return False
+        return True
+
+    def _timed_post(self, endpoint: str, url: str, payload: Dict, timeout: float) -> requests.Response:
+        """웹훅 POST 한 번 (응답 시간을 엔드포인트 기록에 남김)"""
+        latency = self.webhook_health[endpoint].latency
+        started = time.monotonic()
+        try:
+            response = self.http.post(url, json=payload, timeout=(WEBHOOK_CONNECT_TIMEOUT, timeout))
+        except requests.exceptions.Timeout:
+            # 시간 초과도 "최소 이만큼 느렸다"는 정보이므로 p95에 반영
+            latency.record(time.monotonic() - started)
+            raise
+        latency.record(time.monotonic() - started)
+        return response
+
+    def _hedged_post(self, endpoint: str, url: str, payload: Dict, timeout: float) -> requests.Response:
+        """p95 안에 응답이 없으면 같은 요청을 한 번 더 보내고 먼저 온 응답 사용 (멱등 요청 전용)"""
+        hedge_after = self.webhook_health[endpoint].latency.percentile(0.95)
+        if hedge_after is None or hedge_after >= timeout:
+            return self._timed_post(endpoint, url, payload, timeout)
+
+        primary = self.hedge_pool.submit(self._timed_post, endpoint, url, payload, timeout)
+        done, _ = wait([primary], timeout=max(WEBHOOK_HEDGE_MIN_DELAY, hedge_after))
+        # 속도 제한에 여유가 없으면 중복 요청은 보내지 않고 원래 요청을 기다림
+        if done or not self.admission[endpoint].acquire(AdmissionTicket(self.conversation_id), timeout=0):
+            return primary.result()
+
+        backup = self.hedge_pool.submit(self._timed_post, endpoint, url, payload, timeout)
+        fallback: Optional[requests.Response] = None
+        error: Optional[Exception] = None
+        for future in as_completed([primary, backup]):
+            try:
+                response = future.result()
+            except requests.exceptions.RequestException as e:
+                error = e
+                continue
+            if response.status_code < 500:
+                return response
+            fallback = response
+        if fallback is not None:
+            return fallback
+        raise error
+
+    def _admitted_post(self, endpoint: str, url: str, payload: Dict, budget: WebhookBudget,
+                       ticket: Optional[AdmissionTicket]) -> requests.Response:
+        """대기열·속도 제한을 거쳐 웹훅 호출 (429면 Retry-After만큼 물러났다가 다시 시도)"""
+        admission = self.admission[endpoint]
+        post = self._hedged_post if endpoint == "retrieve" else self._timed_post
+        for _ in range(ADMISSION_MAX_429_RETRIES + 1):
+            queued = time.monotonic()
+            admitted = admission.acquire(ticket or AdmissionTicket(self.conversation_id))
+            budget.exclude(time.monotonic() - queued)
+            if not admitted:
+                raise AdmissionRejected("요청이 많아 처리가 지연되고 있습니다. 잠시 후 다시 시도해주세요.")
+            timeout = max(0.5, min(WEBHOOK_READ_TIMEOUT, budget.remaining()))
+            response = post(endpoint, url, payload, timeout)
+            admission.report(response.status_code, response.headers.get("Retry-After"))
+            if response.status_code != 429:
+                break
+        return response
+
+    def _post_webhook(self, endpoint: str, url: str, payload: Dict,
+                      ticket: Optional[AdmissionTicket] = None) -> requests.Response:
+        """차단기·시간 한도·재시도를 적용한 웹훅 호출
+
+        조회는 멱등하므로 시간 초과·5xx를 모두 재시도하고, 전송은 중복 생성을 막기 위해
+        요청이 닿지 않은 연결 실패와 503만 재시도함. 대기열에서 기다린 시간은 한도에 넣지 않고,
+        연결 실패 재시도도 HTTP 어댑터가 아니라 여기서만 하므로 모두 같은 한도 안에 들어감
+        """
+        with self.metrics.timer(f"webhook_{endpoint}"):
+            return self._post_webhook_with_retries(endpoint, url, payload, ticket)
+
+    def _post_webhook_with_retries(self, endpoint: str, url: str, payload: Dict,
+                                   ticket: Optional[AdmissionTicket]) -> requests.Response:
+        health = self.webhook_health[endpoint]
+        idempotent = endpoint == "retrieve"
+        budget = WebhookBudget(WEBHOOK_BUDGETS[endpoint])
+        attempt = 0
+        while True:
+            if not health.breaker.allow():
+                raise CircuitOpen("이미지 서버 응답이 불안정하여 잠시 요청을 중단했습니다. 잠시 후 다시 시도해주세요.")
+            try:
+                response = self._admitted_post(endpoint, url, payload, budget, ticket)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                health.breaker.record_failure()
+                error: Exception = e
+                retryable = idempotent or isinstance(e, requests.exceptions.ConnectionError)
+            else:
+                if response.status_code < 500:
+                    health.breaker.record_success()
+                    response.raise_for_status()
+                    return response
+                health.breaker.record_failure()
+                error = requests.exceptions.HTTPError(
+                    f"{response.status_code} Server Error for url: {url}", response=response
+                )
+                retryable = idempotent or response.status_code == 503
+
+            attempt += 1
+            delay = WEBHOOK_RETRY_BACKOFF * 2 ** (attempt - 1) * random.uniform(0.5, 1.0)
+            if not retryable or attempt > WEBHOOK_MAX_RETRIES or delay >= budget.remaining():
+                raise error
+            time.sleep(delay)
+
+    def send_image_data(self, visualization_text: str, unique_id: str,
+                        ticket: Optional[AdmissionTicket] = None) -> Dict:
         """이미지 생성 요청 전송 및 결과 확인"""
         url = f"{self.webhook_base_url}{self.send_webhook}"
         payload = {
             "imageData": visualization_text,
             "uniqueId": unique_id
         }
+
+        # 콜백 모드: 시나리오가 완료 시 우리 수신기로 직접 알려주도록 주소 전달
+        if self.callback_url:
+            payload["callbackUrl"] = self.callback_url
+            if self.callback_token:
+                payload["callbackToken"] = self.callback_token
         
         try:
-            response = requests.post(url, json=payload, timeout=10)
-            response.raise_for_status()
+            self._post_webhook("send", url, payload, ticket)
             return {
                 "success": True,
                 "message": "이미지 생성이 시작되었습니다",
@@ -632,28 +2522,30 @@ class SF49StudioAssistant:
         payload = {"uniqueId": unique_id}
         
         try:
-            response = requests.post(url, json=payload, timeout=10)
-            response.raise_for_status()
+            response = self._post_webhook("retrieve", url, payload)
             result = response.json()
             
-            if "images" in result and isinstance(result["images"], list) and len(result["images"]) > 0:
-                # URL 유효성 검사
-                valid_urls = all(
-                    url.startswith(('http://', 'https://')) 
-                    for url in result["images"]
-                )
-                
-                if valid_urls:
-                    return {
-                        "success": True,
-                        "images": result["images"],
-                        "message": "이미지가 성공적으로 생성되었습니다!"
-                    }
+            images = result.get("images") if isinstance(result.get("images"), list) else []
+            # URL 유효성 검사
+            valid_urls = [
+                url for url in images
+                if isinstance(url, str) and url.startswith(('http://', 'https://'))
+            ]
+            # 일부 결과를 주는 시나리오는 "complete": false와 전체 개수 "total"을 함께 보냄
+            complete = result.get("complete", True) is not False
+            
+            if valid_urls and complete and len(valid_urls) == len(images):
+                return {
+                    "success": True,
+                    "images": valid_urls,
+                    "message": "이미지가 성공적으로 생성되었습니다!"
+                }
                 
-            # URL이 유효하지 않거나 아직 준비되지 않은 경우
+            # 아직 준비되지 않았거나 일부만 준비된 경우 (도착한 이미지는 함께 반환)
             return {
                 "success": False,
-                "images": [],
+                "images": valid_urls,
+                "total": result.get("total") if isinstance(result.get("total"), int) else None,
                 "message": "이미지가 아직 준비되지 않았습니다."
             }
             
@@ -664,145 +2556,258 @@ class SF49StudioAssistant:
                 "message": f"이미지 조회 중 오류가 발생했습니다: {str(e)}"
             }
 
-    def process_message(self, user_message: str) -> Dict:
+    def process_message(self, user_message: str, stream: bool = STREAM_RESPONSES) -> Dict:
         """사용자 메시지 처리 및 응답 생성"""
-        if self.thread is None:
-            self.create_thread()
-
-        self.client.beta.threads.messages.create(
-            thread_id=self.thread.id,
-            role="user",
-            content=user_message
-        )
+        self.timings = {}
+        self.usage = {}
+        # 보안 탐색·범위 밖 요청은 API를 부르기 전에 정해진 답변으로 끝냄
+        with self.metrics.timer("prefilter", self.timings):
+            verdict = self.prefilter.check(user_message)
+        if verdict is not None:
+            rule, answer = verdict
+            self.metrics.inc("sf49_prefilter_matches_total", rule=rule)
+            return {
+                "status": "success",
+                "response": answer,
+                "displayed": False,
+                "prefiltered": rule
+            }
 
-        run = self.client.beta.threads.runs.create(
-            thread_id=self.thread.id,
-            assistant_id=self.assistant.id
-        )
+        with self.metrics.timer("process_message", self.timings):
+            # 세션을 시작할 때 OpenAI에 연결하지 못했으면 여기서 다시 연결
+            if self.assistant is None:
+                self.create_assistant()
+            if self.thread is None:
+                with self.metrics.timer("threads_create", self.timings):
+                    if self.open_saved_thread() is None:
+                        self.create_thread()
+
+            with self.metrics.timer("messages_create", self.timings):
+                self.client.beta.threads.messages.create(
+                    thread_id=self.thread.id,
+                    role="user",
+                    content=user_message
+                )
+            self.thread_turns += 1
+
+            if stream:
+                return self._run_streaming()
+            return self._run_polling()
+
+    def _handle_tool_calls(self, tool_calls, run_id: Optional[str] = None) -> Tuple[List[Dict], List[str], Optional[Dict]]:
+        """한 런의 도구 호출을 동시에 실행한 뒤 (tool_outputs, job_ids, 오류 응답) 반환"""
+        # 모든 전송을 먼저 백그라운드 작업으로 띄워 두고 전송 결과를 한꺼번에 기다림
+        pending = []
+        tool_outputs = []
+        for tool_call in tool_calls:
+            if tool_call.function.name != "send_image_request":
+                tool_outputs.append({
+                    "tool_call_id": tool_call.id,
+                    "output": json.dumps({"status": "error", "message": "지원하지 않는 도구입니다."})
+                })
+                continue
+            args = json.loads(tool_call.function.arguments)
+            job = get_job_manager().submit(
+                self,
+                args["visualization_text"],
+                args["unique_id"],
+                fresh=bool(args.get("fresh_variations", False)),
+                run_id=run_id
+            )
+            pending.append((tool_call, job))
+
+        job_ids = []
+        failures = []
+        with self.metrics.timer("send_image_data", self.timings):
+            deadline = time.monotonic() + IMAGE_JOB_SUBMIT_WAIT
+            for _, job in pending:
+                job.submitted.wait(max(0.0, deadline - time.monotonic()))
+        for tool_call, job in pending:
+            if not job.submitted.is_set():
+                job_ids.append(job.job_id)
+                response_data = {
+                    "status": "queued",
+                    "unique_id": job.unique_id,
+                    "message": "요청이 많아 대기열에서 차례를 기다리고 있습니다. 순서가 되면 이미지 생성을 시작합니다."
+                }
+            elif job.status == "failed":
+                failures.append(job.message)
+                response_data = {
+                    "status": "error",
+                    "unique_id": job.unique_id,
+                    "message": job.message
+                }
+            else:
+                job_ids.append(job.job_id)
+                response_data = {
+                    "status": "success",
+                    "unique_id": job.unique_id,
+                    "message": "이미지 생성을 시작합니다..."
+                }
+            tool_outputs.append({
+                "tool_call_id": tool_call.id,
+                "output": json.dumps(response_data)
+            })
+
+        if failures and not job_ids:
+            # 오류 결과도 제출해 런이 requires_action에 멈춰 있지 않게 함 (이어지는 응답은 쓰지 않음)
+            if run_id:
+                try:
+                    with self.metrics.timer("submit_tool_outputs", self.timings):
+                        self.client.beta.threads.runs.submit_tool_outputs(
+                            thread_id=self.thread.id,
+                            run_id=run_id,
+                            tool_outputs=tool_outputs
+                        )
+                except OpenAIError as e:
+                    logging.getLogger("sf49").warning("tool outputs not submitted for %s: %s", run_id, e)
+            typewriter_effect(failures[0])
+            return tool_outputs, job_ids, {
+                "status": "error",
+                "response": failures[0],
+                "displayed": True
+            }
+        return tool_outputs, job_ids, None
 
-        generated_id = None
-        status_container = st.empty()
-        loading_container = st.empty()
+    def _run_streaming(self) -> Dict:
+        """런 이벤트 스트림을 소비하며 실제 토큰 델타를 바로 표시"""
+        text = StreamingText(st.empty())
+        job_ids = []
+        message_id = None
+        run_started = time.perf_counter()
 
-        while True:
-            run = self.client.beta.threads.runs.retrieve(
+        with self.metrics.timer("runs_create", self.timings):
+            stream = self.client.beta.threads.runs.create(
                 thread_id=self.thread.id,
-                run_id=run.id
+                assistant_id=self.assistant.id,
+                stream=True,
+                **self._run_options()
             )
-
-            if run.status == "requires_action":
-                tool_outputs = []
-                for tool_call in run.required_action.submit_tool_outputs.tool_calls:
-                    args = json.loads(tool_call.function.arguments)
-                    
-                    if tool_call.function.name == "send_image_request":
-                        result = self.send_image_data(
-                            args["visualization_text"],
-                            args["unique_id"]
+        while stream is not None:
+            next_stream = None
+            with stream:
+                for event in stream:
+                    if event.event == "thread.message.delta":
+                        # 도구 호출 앞뒤처럼 한 턴에 메시지가 여럿이면 문단을 나눠 이어 붙임
+                        if event.data.id != message_id:
+                            message_id = event.data.id
+                            text.new_paragraph()
+                        for block in event.data.delta.content or []:
+                            if block.type == "text" and block.text and block.text.value:
+                                if "first_token" not in self.timings:
+                                    self.metrics.observe_stage("first_token", time.perf_counter() - run_started,
+                                                               self.timings)
+                                text.append(block.text.value)
+
+                    elif event.event == "thread.run.requires_action":
+                        run = event.data
+                        text.flush()
+                        tool_outputs, started_ids, error = self._handle_tool_calls(
+                            run.required_action.submit_tool_outputs.tool_calls, run.id
                         )
-                        generated_id = result["unique_id"]
-                        
-                        if not result["success"]:
-                            typewriter_effect(result["message"])
+                        if error:
+                            return error
+                        job_ids.extend(started_ids)
+
+                        # 도구 결과 제출 후 이어지는 응답도 같은 방식으로 스트리밍
+                        with self.metrics.timer("submit_tool_outputs", self.timings):
+                            next_stream = self.client.beta.threads.runs.submit_tool_outputs(
+                                thread_id=self.thread.id,
+                                run_id=run.id,
+                                tool_outputs=tool_outputs,
+                                stream=True
+                            )
+
+                    elif event.event == "thread.run.completed":
+                        self._record_usage(event.data.usage)
+
+                    elif event.event == "thread.run.incomplete":
+                        # 입력 토큰 상한에 걸린 경우: 다음 턴 전에 스레드를 교체하도록 표시
+                        self._record_usage(event.data.usage)
+                        self.last_prompt_tokens = max(self.last_prompt_tokens, THREAD_ROTATE_PROMPT_TOKENS)
+                        if not text.text and not job_ids:
+                            text.flush()
+                            self.metrics.inc("sf49_errors_total", stage="run")
                             return {
                                 "status": "error",
-                                "response": result["message"]
+                                "response": "처리 중 문제가 발생했습니다. 다시 시도해주세요."
                             }
 
-                        response_data = {
-                            "status": "success",
-                            "unique_id": generated_id,
-                            "message": "이미지 생성을 시작합니다..."
+                    elif event.event in ("thread.run.failed", "thread.run.cancelled",
+                                         "thread.run.expired", "error"):
+                        text.flush()
+                        self.metrics.inc("sf49_errors_total", stage="run")
+                        return {
+                            "status": "error",
+                            "response": "처리 중 문제가 발생했습니다. 다시 시도해주세요."
                         }
-                        tool_outputs.append({
-                            "tool_call_id": tool_call.id,
-                            "output": json.dumps(response_data)
-                        })
+            stream = next_stream
+
+        text.flush()
+        response = {
+            "status": "success",
+            "response": text.text,
+            "displayed": True
+        }
+        if job_ids:
+            response["job_ids"] = job_ids
+            if not text.text:
+                response["response"] = "이미지 생성을 시작합니다..."
+                response["displayed"] = False
+        return response
+
+    def _run_polling(self) -> Dict:
+        """런 상태를 주기적으로 조회하는 방식 (스트리밍 미사용 시)"""
+        with self.metrics.timer("runs_create", self.timings):
+            run = self.client.beta.threads.runs.create(
+                thread_id=self.thread.id,
+                assistant_id=self.assistant.id,
+                **self._run_options()
+            )
+        job_ids = []
 
-                run = self.client.beta.threads.runs.submit_tool_outputs(
+        while True:
+            self.metrics.inc("sf49_poll_attempts_total", kind="run")
+            with self.metrics.timer("runs_retrieve", self.timings):
+                run = self.client.beta.threads.runs.retrieve(
                     thread_id=self.thread.id,
-                    run_id=run.id,
-                    tool_outputs=tool_outputs
+                    run_id=run.id
                 )
 
-                if generated_id:
-                    snail_frames = [
-                        "🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
-                        "⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
-                        "⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
-                        "⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
-                        "⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
-                        "⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
-                        "⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
-                        "⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
-                        "⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
-                        "⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
-                        "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
-                        "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
-                        "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
-                        "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
-                        "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
-                        "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
-                        "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯",
-                        "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯",
-                        "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯⋯",
-                        "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯⋯",
-                        "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯⋯",
-                        "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯⋯",
-                        "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯⋯",
-                        "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯⋯",
-                        "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯⋯",
-                        "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯⋯",
-                        "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌 ⋯",
-                        "⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯⋯ 🐌",
-                    ]
-                    
-                    loading_container = st.empty()
-                    
-                    # 첫 60초 동안 기본 대기
-                    for i in range(60):
-                        frame = snail_frames[i % len(snail_frames)]
-                        loading_container.markdown(f"""
-                            <div style='font-family: monospace; font-size: 1.5em; margin-bottom: 0.5em;'>
-                                {frame}
-                            </div>
-                        """, unsafe_allow_html=True)
-                        time.sleep(1)
-
-                    # 60초 이후부터는 5초마다 이미지 체크
-                    while True:
-                        # 이미지 체크
-                        result = self.get_image_links(generated_id)
-                        if result["success"] and result["images"]:
-                            loading_container.empty()
-                            st.balloons()
-                            confetti_effect()
-                            fireworks_effect()
-                            return {
-                                "status": "success",
-                                "response": "✨ 디자인이 완성되었습니다! 마음에 드시나요?",
-                                "images": result["images"]
-                            }
-                        
-                        # 다음 체크까지 5초 대기하면서 달팽이 애니메이션 표시
-                        for frame in snail_frames:
-                            loading_container.markdown(f"""
-                                <div style='font-family: monospace; font-size: 1.5em; margin-bottom: 0.5em;'>
-                                    {frame}
-                                </div>
-                            """, unsafe_allow_html=True)
-                            time.sleep(0.17)  # 5초 / 프레임 수
+            if run.status == "requires_action":
+                tool_outputs, started_ids, error = self._handle_tool_calls(
+                    run.required_action.submit_tool_outputs.tool_calls, run.id
+                )
+                if error:
+                    return error
+                job_ids.extend(started_ids)
+
+                with self.metrics.timer("submit_tool_outputs", self.timings):
+                    run = self.client.beta.threads.runs.submit_tool_outputs(
+                        thread_id=self.thread.id,
+                        run_id=run.id,
+                        tool_outputs=tool_outputs
+                    )
 
             elif run.status == "completed":
-                messages = self.client.beta.threads.messages.list(
-                    thread_id=self.thread.id
-                )
-                return {
+                self._record_usage(run.usage)
+                with self.metrics.timer("messages_list", self.timings):
+                    messages = self.client.beta.threads.messages.list(
+                        thread_id=self.thread.id
+                    )
+                response = {
                     "status": "success",
                     "response": messages.data[0].content[0].text.value
                 }
-
-            elif run.status == "failed":
+                if job_ids:
+                    response["job_ids"] = job_ids
+                return response
+
+            elif run.status in ("failed", "incomplete"):
+                if run.status == "incomplete":
+                    self._record_usage(run.usage)
+                    self.last_prompt_tokens = max(self.last_prompt_tokens, THREAD_ROTATE_PROMPT_TOKENS)
+                self.metrics.inc("sf49_errors_total", stage="run")
                 return {
                     "status": "error",
                     "response": "처리 중 문제가 발생했습니다. 다시 시도해주세요."
@@ -810,22 +2815,162 @@ class SF49StudioAssistant:
             
             time.sleep(0.5)
 
+def celebrate():
+    """디자인 완성 축하 효과"""
+    st.balloons()
+    confetti_effect()
+    fireworks_effect()
+
+@st.fragment(run_every=JOB_REFRESH_SECONDS)
+def render_job_progress(message: ChatMessage):
+    """백그라운드 이미지 작업 진행 상황 표시 (이 영역만 주기적으로 다시 그림)"""
+    manager = get_job_manager()
+    # 재연결·재시작 후에도 저장소에 남은 진행 중 작업을 이어받아 끝냄
+    assistant = st.session_state.assistant
+    jobs = [(job_id, manager.get(job_id, assistant)) for job_id in message.job_ids]
+    running = [job for _, job in jobs if job is not None and not job.done.is_set()]
+    if running:
+        started = min(job.created_at for job in running)
+        frame = SNAIL_FRAMES[int(time.time() - started) % len(SNAIL_FRAMES)]
+        finished = len(jobs) - len(running)
+        progress = f" ({finished}/{len(jobs)})" if len(jobs) > 1 else ""
+        st.markdown(f"""
+            <div style='font-family: monospace; font-size: 1.5em; margin-bottom: 0.5em;'>
+                {frame}{progress}
+            </div>
+        """, unsafe_allow_html=True)
+
+        # 전송 대기열에 서 있는 작업은 순번과 예상 대기 시간 안내
+        send_queue = get_admission_controllers()["send"]
+        positions = [send_queue.position(job.ticket) for job in running if job.status == "queued"]
+        positions = [position for position in positions if position is not None]
+        if positions:
+            position, wait = min(positions)
+            st.caption(f"⏳ 요청이 많아 대기 중입니다 · {position}번째 · 약 {int(wait) + 1}초")
+
+        # 작업마다 타일 자리를 미리 잡고, 도착한 이미지부터 바로 채움
+        tiles = []
+        for _, job in jobs:
+            if job is None:
+                continue
+            images = list(job.images)
+            tiles.extend(images + [None] * (max(job.expected or IMAGE_TILES_PER_JOB, len(images)) - len(images)))
+        slots = image_grid_slots(len(tiles))
+        for idx, (slot, url) in enumerate(zip(slots, tiles)):
+            if url is None:
+                slot.markdown(image_placeholder_html(idx), unsafe_allow_html=True)
+        fill_image_slots([(slot, url, idx) for idx, (slot, url) in enumerate(zip(slots, tiles)) if url])
+        return
+
+    # 모든 작업이 끝나면 메시지에 결과를 모아 반영하고 전체를 다시 그림
+    message.job_ids = ()
+    images = []
+    notes = []
+    completed = False
+    for _, job in jobs:
+        if job is None:
+            notes.append("작업 정보를 찾을 수 없습니다. 다시 요청해주세요.")
+            continue
+        images.extend(job.images)
+        if job.status == "completed":
+            completed = True
+        else:
+            notes.append(job.message)
+    if images:
+        message.image_urls = tuple(images)
+    if completed:
+        notes.insert(0, "✨ 디자인이 완성되었습니다! 마음에 드시나요?")
+        st.session_state.celebrate = True
+    for note in dict.fromkeys(notes):
+        message.content += f"\n\n{note}"
+    get_conversation_store().update_message(message)
+    st.rerun()
+
+def show_response_text(response: Dict):
+    """아직 화면에 표시되지 않은 응답 텍스트 표시"""
+    if response.get("displayed"):
+        return
+    # 사전 필터의 정해진 답변은 바로 보여줌 (타이핑 효과로 일부러 늦추지 않음)
+    if USE_TYPEWRITER and not response.get("prefiltered"):
+        typewriter_effect(response["response"], speed=0.02)
+    else:
+        st.markdown(response["response"])
+
+def show_latest_messages():
+    """표시 구간을 가장 최근 페이지로 되돌림"""
+    st.session_state.messages = get_conversation_store().recent_messages(
+        st.session_state.conversation_id, HISTORY_PAGE_SIZE
+    )
+    st.session_state.history_limit = HISTORY_PAGE_SIZE
+    st.session_state.history_at_latest = True
+
+def load_older_messages():
+    """이전 페이지를 앞에 붙임 (HISTORY_WINDOW_MAX를 넘으면 최근 쪽을 메모리에서 내려놓음)"""
+    messages = st.session_state.messages
+    older = get_conversation_store().recent_messages(
+        st.session_state.conversation_id, HISTORY_PAGE_SIZE, before_id=messages[0].id
+    )
+    messages = older + messages
+    if len(messages) > HISTORY_WINDOW_MAX:
+        del messages[HISTORY_WINDOW_MAX:]
+        st.session_state.history_at_latest = False
+    st.session_state.messages = messages
+    st.session_state.history_limit = min(HISTORY_WINDOW_MAX, st.session_state.history_limit + len(older))
+
+def append_message(message: ChatMessage):
+    """대화 저장소와 화면 표시 구간에 메시지 추가 (표시 구간은 history_limit개로 유지)"""
+    get_conversation_store().add_message(st.session_state.conversation_id, message)
+    if not st.session_state.history_at_latest:
+        # 이전 대화를 보던 중이면 새 메시지가 이어지도록 최근 구간으로 돌아감
+        show_latest_messages()
+        return
+    st.session_state.messages.append(message)
+    overflow = len(st.session_state.messages) - st.session_state.history_limit
+    if overflow > 0:
+        del st.session_state.messages[:overflow]
+
 def initialize_session_state():
     """세션 상태 초기화"""
+    store = get_conversation_store()
+    if 'conversation_id' not in st.session_state:
+        # 주소의 ?c= 로 이전 대화를 이어가고, 없으면 새 대화 시작
+        conversation_id = st.query_params.get("c")
+        if not conversation_id or not store.exists(conversation_id):
+            conversation_id = store.create_conversation()
+            st.query_params["c"] = conversation_id
+        st.session_state.conversation_id = conversation_id
+
     if 'assistant' not in st.session_state:
         api_key = st.secrets["OPENAI_API_KEY"]
-        st.session_state.assistant = SF49StudioAssistant(api_key)
-        st.session_state.assistant.create_assistant()
+        assistant = SF49StudioAssistant(api_key)
+        assistant.conversation_id = st.session_state.conversation_id
+        assistant.saved_thread_id = store.get_thread_id(st.session_state.conversation_id)
+        st.session_state.assistant = assistant
+        try:
+            assistant.create_assistant()
+            assistant.open_saved_thread()
+        except OpenAIError as e:
+            # 연결되지 않아도 지난 대화는 저장소에서 보여주고, 다음 메시지를 보낼 때 다시 연결함
+            logging.getLogger("sf49").warning("OpenAI unavailable at session start: %s", e)
+        if assistant.thread is not None and store.get_thread_id(assistant.conversation_id) != assistant.thread.id:
+            store.set_thread_id(assistant.conversation_id, assistant.thread.id)
     
     if 'messages' not in st.session_state:
-        st.session_state.messages = []
+        # 최근 메시지만 불러오고, 이전 메시지는 요청할 때 페이지 단위로 추가
+        show_latest_messages()
     
     if 'threads' not in st.session_state:
         st.session_state.threads = []
 
 def main():
+    get_metrics_server()
     initialize_session_state()
     set_custom_style()
+    store = get_conversation_store()
+    conversation_id = st.session_state.conversation_id
+
+    if st.session_state.pop("celebrate", False):
+        celebrate()
 
     # 상단 여백
     st.markdown('<div style="margin-top: 1rem;"></div>', unsafe_allow_html=True)
@@ -886,65 +3031,83 @@ def main():
     with st.container():
         # 메시지 표시 영역
         with st.container():
+            messages = st.session_state.messages
+            if messages and store.has_messages_before(conversation_id, messages[0].id):
+                if st.button("이전 대화 더 보기", key="load_older_messages"):
+                    load_older_messages()
+
+            # 자리만 먼저 잡아두고 표시할 히스토리 이미지를 한 번에 병렬로 받아옴
+            history_slots = []
             for message in st.session_state.messages:
-                with st.chat_message(message["role"]):
-                    st.markdown(message["content"])
+                with st.chat_message(message.role):
+                    st.markdown(message.content)
                     
-                    if "image_urls" in message:
-                        for idx, url in enumerate(message["image_urls"]):
-                            buffer = io.BytesIO()
-                            img = Image.open(requests.get(url, stream=True).raw)
-                            img.save(buffer, format="PNG")
-                            img_base64 = base64.b64encode(buffer.getvalue()).decode()
-                            st.markdown(f"""
-                                <div class="image-container">
-                                    <img src="{url}">
-                                    <div class="overlay-buttons">
-                                        <a href="data:image/png;base64,{img_base64}" download="Design_Option_{idx + 1}.png" class="overlay-button" title="이미지 다운로드">💾</a>
-                                        <a href="{url}" target="_blank" class="overlay-button" title="크게 보기">🔍</a>
-                                    </div>
-                                    <p class="image-caption">Design Option {idx + 1}</p>
-                                </div>
-                            """, unsafe_allow_html=True)
+                    if message.image_urls:
+                        slots = image_grid_slots(len(message.image_urls))
+                        history_slots.extend(
+                            (slot, url, idx) for idx, (slot, url) in enumerate(zip(slots, message.image_urls))
+                        )
+                    elif message.job_ids:
+                        render_job_progress(message)
+            fill_image_slots(history_slots)
+
+            if not st.session_state.history_at_latest:
+                if st.button("최근 대화로 돌아가기", key="show_latest_messages"):
+                    show_latest_messages()
+                    st.rerun()
 
         # 입력 영역
         with st.container():
             st.markdown('<div class="input-container">', unsafe_allow_html=True)
             if prompt := st.chat_input("어떤 이미지를 만들어드릴까요?"):
-                st.session_state.messages.append({"role": "user", "content": prompt})
+                append_message(ChatMessage("user", prompt))
                 with st.chat_message("user"):
                     st.markdown(prompt)
 
-                response = st.session_state.assistant.process_message(prompt)
                 with st.chat_message("assistant"):
+                    assistant = st.session_state.assistant
+                    response = assistant.process_message(prompt)
+                    get_metrics().log(
+                        "request",
+                        conversation_id=conversation_id,
+                        status=response["status"],
+                        jobs=len(response.get("job_ids", [])),
+                        stages=assistant.timings,
+                        tokens=assistant.usage,
+                        prefiltered=response.get("prefiltered"),
+                        session_bytes=message_memory_bytes(st.session_state.messages)
+                    )
+                    if assistant.thread is not None and store.get_thread_id(conversation_id) != assistant.thread.id:
+                        store.set_thread_id(conversation_id, assistant.thread.id)
                     if response["status"] == "success":
-                        typewriter_effect(response["response"], speed=0.02)
-                        message = {"role": "assistant", "content": response["response"]}
-                        
-                        if "images" in response and response["images"]:
-                            message["image_urls"] = response["images"]
-                            cols = st.columns(2)
-                            for idx, url in enumerate(response["images"]):
-                                with cols[idx % 2]:
-                                    buffer = io.BytesIO()
-                                    img = Image.open(requests.get(url, stream=True).raw)
-                                    img.save(buffer, format="PNG")
-                                    img_base64 = base64.b64encode(buffer.getvalue()).decode()
-                                    st.markdown(f"""
-                                        <div class="image-container">
-                                            <img src="{url}">
-                                            <div class="overlay-buttons">
-                                                <a href="data:image/png;base64,{img_base64}" download="Design_Option_{idx + 1}.png" class="overlay-button" title="이미지 다운로드">💾</a>
-                                                <a href="{url}" target="_blank" class="overlay-button" title="크게 보기">🔍</a>
-                                            </div>
-                                            <p class="image-caption">Design Option {idx + 1}</p>
-                                        </div>
-                                    """, unsafe_allow_html=True)
+                        show_response_text(response)
+                        message = ChatMessage("assistant", response["response"])
                         
-                        st.session_state.messages.append(message)
+                        if "job_ids" in response:
+                            # 작업이 곧바로 끝나 전체를 다시 그리더라도 메시지가 남도록 먼저 저장
+                            message.job_ids = tuple(response["job_ids"])
+                            append_message(message)
+                            render_job_progress(message)
+                        elif "images" in response and response["images"]:
+                            message.image_urls = tuple(response["images"])
+                            slots = image_grid_slots(len(response["images"]))
+                            fill_image_slots([
+                                (slot, url, idx)
+                                for idx, (slot, url) in enumerate(zip(slots, response["images"]))
+                            ])
+                            append_message(message)
+                        else:
+                            append_message(message)
                     else:
-                        typewriter_effect(response["response"], speed=0.02)
+                        show_response_text(response)
+
+                    # 응답을 보여준 뒤, 문맥이 예산을 넘었으면 다음 턴 전에 브리프로 새 스레드 시작
+                    if assistant.maintain_context():
+                        store.set_thread_id(conversation_id, assistant.thread.id)
             st.markdown('</div>', unsafe_allow_html=True)
 
+    get_session_memory_report().record(conversation_id, st.session_state.messages)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with get_metrics().timer("script_run"):
+        main()
\ No newline at end of file
@@ -0,0 +1,301 @@
+"""SF49 Studio 오프라인 종단 간 벤치마크
+
+가짜 OpenAI Assistants API(tools/fake_openai.py)와 가짜 웹훅(tools/fake_webhooks.py)을
+띄운 뒤, Streamlit AppTest로 test.py의 main()에 대본 대화를 흘려보내 측정함.
+OpenAI 크레딧이나 외부 웹훅 없이 process_message 변경 전후를 비교할 수 있음.
+
+측정 항목:
+- 첫 토큰까지 시간(TTFT): 앱 지표의 first_token 단계 (/metrics)
+- 응답 턴 시간: 채팅 입력 한 번의 스크립트 실행 시간
+- 이미지까지 시간: 입력부터 메시지에 이미지가 붙을 때까지 (드라이버 측정)
+- 재실행 비용: 입력 없이 다시 그리는 rerun 한 번의 시간
+- 외부 요청 수: 가짜 서버가 받은 엔드포인트별 요청 수
+
+사용법:
+    python tools/benchmark.py --conversations 3 --turns 2 --output before.json
+    python tools/benchmark.py --compare before.json after.json
+
+기본은 콜백 모드로 실행함. 콜백 모드의 조회는 유실 대비 안전망이라 작업당 조회 수(retrieve_per_job)가
+0에 가까워야 함. --polling으로 조회 웹훅 폴링을 측정할 수 있으나,
+완료 기록이 없는 첫 작업은 앱의 IMAGE_POLL_DEFAULT_DELAY(와 그 1/4·1/2 시점의 미리 확인)에 맞춰 조회하고
+이후 작업부터 학습된 첫 대기 시간으로 줄어듦.
+"""
+import argparse
+import json
+import math
+import os
+import re
+import socket
+import statistics
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Dict, List, Optional
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(os.path.dirname(TOOLS_DIR), "test.py")
+sys.path.insert(0, TOOLS_DIR)
+
+from fake_openai import FakeOpenAIServer  # noqa: E402
+from fake_webhooks import FakeWebhookServer  # noqa: E402
+
+DEFAULT_PROMPTS = [
+    "미니멀한 카페 로고를 파스텔 톤으로 만들어주세요",
+    "우주를 배경으로 한 음악 페스티벌 포스터",
+    "어떤 스타일의 디자인을 만들 수 있나요?",
+]
+REPORT_STAGES = ("first_token", "process_message", "messages_create", "runs_create",
+                 "submit_tool_outputs", "webhook_send", "webhook_retrieve", "time_to_first_image",
+                 "time_to_images",
+                 "thread_rotate", "image_download", "render_images", "script_run")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def fetch_json(url: str) -> Dict:
+    with urllib.request.urlopen(url, timeout=5) as response:
+        return json.load(response)
+
+
+def scrape_stages(metrics_url: str) -> Dict[str, Dict[str, float]]:
+    """/metrics의 단계 히스토그램에서 단계별 (횟수, 평균) 추출"""
+    try:
+        with urllib.request.urlopen(metrics_url, timeout=5) as response:
+            text = response.read().decode()
+    except OSError:
+        return {}
+    totals: Dict[str, Dict[str, float]] = {}
+    for kind, stage, value in re.findall(r'^sf49_stage_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)$',
+                                         text, re.MULTILINE):
+        totals.setdefault(stage, {})[kind] = float(value)
+    return {
+        stage: {"count": int(entry.get("count", 0)),
+                "mean": entry.get("sum", 0.0) / entry["count"] if entry.get("count") else None}
+        for stage, entry in totals.items()
+    }
+
+
+def summarize(samples: List[float]) -> Dict[str, Optional[float]]:
+    if not samples:
+        return {"n": 0, "mean": None, "p50": None, "p95": None, "max": None}
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 4),
+        "p50": round(statistics.median(ordered), 4),
+        # 최근접 순위(nearest-rank) 방식: 95% 이상의 표본이 이 값 이하
+        "p95": round(ordered[math.ceil(len(ordered) * 0.95) - 1], 4),
+        "max": round(ordered[-1], 4),
+    }
+
+
+def configure_environment(args, openai_url: str, webhook_url: str) -> str:
+    """앱이 가짜 서버를 쓰도록 환경 변수를 설정하고 지표 주소 반환
+
+    앱이 쓰는 파일(대화·작업 DB, Assistant 기록, 이미지 캐시)은 모두 임시 폴더로 돌려
+    설정 파일(st.secrets)에 운영 경로가 있어도 덮어쓰지 않게 함 (환경 변수가 st.secrets보다 우선)
+    """
+    os.environ["OPENAI_BASE_URL"] = openai_url
+    os.environ["WEBHOOK_BASE_URL"] = webhook_url
+    data_dir = tempfile.mkdtemp(prefix="sf49-bench-")
+    os.environ["DATA_DIR"] = data_dir
+    os.environ["CONVERSATION_DB_PATH"] = os.path.join(data_dir, "conversations.db")
+    os.environ["JOB_STORE_PATH"] = os.path.join(data_dir, "jobs.db")
+    os.environ["JOB_STORE_URL"] = ""
+    os.environ["ASSISTANT_REGISTRY_PATH"] = os.path.join(data_dir, "assistant_registry.json")
+    os.environ["IMAGE_CACHE_DIR"] = os.path.join(data_dir, "image_cache")
+    os.environ.pop("ASSISTANT_ID", None)
+    port = free_port()
+    if args.polling:
+        os.environ.pop("IMAGE_CALLBACK_URL", None)
+        os.environ["METRICS_HOST"] = "127.0.0.1"
+        os.environ["METRICS_PORT"] = str(port)
+    else:
+        os.environ["IMAGE_CALLBACK_URL"] = f"http://127.0.0.1:{port}/image-ready"
+        os.environ["IMAGE_CALLBACK_HOST"] = "127.0.0.1"
+        os.environ["IMAGE_CALLBACK_PORT"] = str(port)
+        os.environ["IMAGE_CALLBACK_TOKEN"] = "sf49-benchmark"
+    return f"http://127.0.0.1:{port}/metrics"
+
+
+SESSION_SECRETS = {"OPENAI_API_KEY": "sk-benchmark", "openai_api_key": "sk-benchmark"}
+
+
+def new_session(timeout: float, with_secrets: bool = True):
+    """AppTest 세션 (with_secrets가 False면 전역 st.secrets를 그대로 씀)"""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    if with_secrets:
+        at.secrets.update(SESSION_SECRETS)
+    return at
+
+
+def run_turn(at, prompt: str, timeout: float, poll_interval: float, results: Dict):
+    """채팅 입력 한 번을 보내고 이미지가 붙을 때까지 다시 그리며 측정"""
+    started = time.perf_counter()
+    at.chat_input[0].set_value(prompt).run()
+    results["turn_seconds"].append(time.perf_counter() - started)
+
+    while True:
+        messages = at.session_state["messages"]
+        last = messages[-1] if messages else None
+        if last is None:
+            return
+        if last.image_urls:
+            results["time_to_images"].append(time.perf_counter() - started)
+            return
+        if not last.job_ids:
+            return
+        if time.perf_counter() - started > timeout:
+            results["errors"].append(f"timeout waiting for images: {prompt}")
+            return
+        time.sleep(poll_interval)
+        rerun_started = time.perf_counter()
+        at.run()
+        results["rerun_seconds"].append(time.perf_counter() - rerun_started)
+
+
+def run_benchmark(args) -> Dict:
+    openai_server = FakeOpenAIServer(0, {
+        "run_latency": args.run_latency,
+        "token_delay": args.token_delay,
+        "chunk": args.chunk,
+    }).start()
+    webhook_server = FakeWebhookServer(0, {
+        "delay": args.delay,
+        "image_count": args.images,
+        "image_size": args.size,
+        "failure_rate": args.failure_rate,
+        "seed": 0,
+        "stagger": args.stagger,
+    }).start()
+    metrics_url = configure_environment(args, openai_server.base_url, webhook_server.base_url)
+
+    results: Dict[str, List] = {"cold_run_seconds": [], "turn_seconds": [], "time_to_images": [],
+                                "rerun_seconds": [], "errors": []}
+    for conversation in range(args.conversations):
+        at = new_session(args.timeout)
+        started = time.perf_counter()
+        at.run()
+        results["cold_run_seconds"].append(time.perf_counter() - started)
+        for turn in range(args.turns):
+            prompt = DEFAULT_PROMPTS[turn % len(DEFAULT_PROMPTS)]
+            # 같은 프롬프트 결과 재사용을 피하려고 대화·턴 번호를 붙임 (?로 끝나는 질문은 그대로)
+            if not prompt.endswith("?"):
+                prompt = f"{prompt} ({conversation + 1}-{turn + 1})"
+            run_turn(at, prompt, args.timeout, args.poll_interval, results)
+        results["errors"].extend(str(e.value) for e in at.exception)
+
+    return {
+        "config": {key: getattr(args, key) for key in (
+            "conversations", "turns", "delay", "stagger", "images", "size", "failure_rate",
+            "run_latency", "token_delay", "polling")},
+        "cold_run_seconds": summarize(results["cold_run_seconds"]),
+        "turn_seconds": summarize(results["turn_seconds"]),
+        "time_to_images": summarize(results["time_to_images"]),
+        "rerun_seconds": summarize(results["rerun_seconds"]),
+        "stages": {stage: entry for stage, entry in scrape_stages(metrics_url).items()
+                   if stage in REPORT_STAGES},
+        "requests": {
+            "openai": fetch_json(openai_server.base_url.rsplit("/v1", 1)[0] + "/stats"),
+            "webhooks": fetch_json(webhook_server.base_url + "/stats"),
+        },
+        "errors": results["errors"],
+    }
+
+
+def retrieve_per_job(report: Dict) -> float:
+    """이미지 작업(전송) 하나당 조회 웹훅 요청 수"""
+    webhooks = report["requests"]["webhooks"]
+    return round(webhooks.get("retrieve", 0) / max(1, webhooks.get("send", 0)), 2)
+
+
+def print_report(report: Dict):
+    print("== timings (seconds) ==")
+    for key in ("cold_run_seconds", "turn_seconds", "time_to_images", "rerun_seconds"):
+        entry = report[key]
+        if entry["n"]:
+            print(f"{key:<20} n={entry['n']:<4} mean={entry['mean']:<8} p50={entry['p50']:<8} p95={entry['p95']}")
+    print("== app stages (mean seconds) ==")
+    for stage in REPORT_STAGES:
+        entry = report["stages"].get(stage)
+        if entry and entry["count"]:
+            print(f"{stage:<20} n={entry['count']:<4} mean={entry['mean']:.4f}")
+    print("== outbound requests ==")
+    for service, counts in report["requests"].items():
+        print(f"{service:<8} " + ", ".join(f"{name}={count}" for name, count in sorted(counts.items())))
+    print(f"retrieve_per_job {retrieve_per_job(report)}")
+    if report["errors"]:
+        print("== errors ==")
+        for error in report["errors"]:
+            print(error)
+
+
+def compare(before_path: str, after_path: str):
+    """두 결과 파일의 주요 수치 비교"""
+    with open(before_path, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(after_path, encoding="utf-8") as f:
+        after = json.load(f)
+
+    rows = []
+    for key in ("cold_run_seconds", "turn_seconds", "time_to_images", "rerun_seconds"):
+        rows.append((f"{key}.p50", before[key]["p50"], after[key]["p50"]))
+        rows.append((f"{key}.p95", before[key]["p95"], after[key]["p95"]))
+    for stage in REPORT_STAGES:
+        rows.append((f"stage.{stage}", (before["stages"].get(stage) or {}).get("mean"),
+                     (after["stages"].get(stage) or {}).get("mean")))
+    for service in ("openai", "webhooks"):
+        names = set(before["requests"][service]) | set(after["requests"][service])
+        for name in sorted(names):
+            rows.append((f"{service}.{name}", before["requests"][service].get(name, 0),
+                         after["requests"][service].get(name, 0)))
+
+    rows.append(("retrieve_per_job", retrieve_per_job(before), retrieve_per_job(after)))
+
+    print(f"{'metric':<36}{'before':>12}{'after':>12}{'change':>10}")
+    for name, old, new in rows:
+        if old is None and new is None:
+            continue
+        change = f"{(new - old) / old * 100:+.1f}%" if old and new is not None else ""
+        print(f"{name:<36}{old if old is not None else '-':>12}{new if new is not None else '-':>12}{change:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=3, help="독립된 세션(대화) 수")
+    parser.add_argument("--turns", type=int, default=2, help="대화마다 보낼 메시지 수")
+    parser.add_argument("--delay", type=float, default=2.0, help="가짜 이미지 생성 시간(초)")
+    parser.add_argument("--stagger", type=float, default=0.0, help="이미지가 하나씩 준비되는 간격(초, 0이면 한꺼번에)")
+    parser.add_argument("--images", type=int, default=4, help="작업당 이미지 수")
+    parser.add_argument("--size", type=int, default=512, help="이미지 한 변 픽셀 수")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="웹훅이 503으로 응답할 비율")
+    parser.add_argument("--run-latency", type=float, default=0.5, help="가짜 런 지연(초)")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="스트리밍 델타 간격(초)")
+    parser.add_argument("--chunk", type=int, default=4, help="델타 하나에 담을 글자 수")
+    parser.add_argument("--polling", action="store_true", help="콜백 대신 조회 웹훅 폴링 사용")
+    parser.add_argument("--poll-interval", type=float, default=0.25, help="이미지 대기 중 rerun 간격(초)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="턴 하나의 최대 대기 시간(초)")
+    parser.add_argument("--output", help="결과를 JSON으로 저장할 경로")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="두 결과 파일 비교")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = run_benchmark(args)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""assets/ 원본을 줄이고 내용 해시를 붙여 static/assets/에 빌드
+
+- style.css → static/assets/style.<해시>.css (주석·공백 제거)
+- *.js → static/assets/<이름>.<해시>.js (주석·들여쓰기 제거)
+- *.min.js → static/assets/<이름>.<해시>.min.js (이미 줄인 외부 라이브러리라 라이선스 주석째 그대로 복사)
+- static/assets/manifest.json: {"style.css": {"file": "style.<해시>.css", "hash": "<해시>"}, ...}
+
+앱은 manifest를 읽어 app/static/assets/<파일>?v=<해시>로 참조함(style.css는 첫 화면에 필요해서 인라인).
+Streamlit 정적 서빙(app/static)은 Cache-Control을 붙이지 않으므로, 장기 캐시는 앞단 리버스 프록시에서
+파일 이름에 해시가 붙은 경로에만 붙임. 내용이 바뀌면 이름이 바뀌므로 immutable로 둬도 됨. 예 (nginx):
+
+    location ~ ^/app/static/assets/.+\.[0-9a-f]{12}(\.min)?\.(css|js)$ {
+        proxy_pass http://streamlit;
+        add_header Cache-Control "public, max-age=31536000, immutable";
+    }
+
+static/assets/는 저장소에 넣지 않으므로, 앱은 시작할 때 manifest가 없거나 원본보다 오래됐으면
+이 스크립트의 build()를 직접 부름. 빌드할 수 없는 환경이면 assets/ 원본을 그대로 인라인으로 사용함.
+
+사용법 (읽기 전용 이미지로 배포할 때는 이미지를 만들면서 미리 실행):
+    python tools/build_assets.py
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+from typing import Dict
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_DIR = os.path.join(ROOT_DIR, "assets")
+OUTPUT_DIR = os.path.join(ROOT_DIR, "static", "assets")
+HASH_LENGTH = 12
+
+
+def minify_css(text: str) -> str:
+    text = re.sub(r"/\*.*?\*/", "", text, flags=re.DOTALL)
+    text = re.sub(r"\s+", " ", text)
+    # 선택자의 "a :hover"가 바뀌지 않도록 콜론 앞 공백은 남김
+    text = re.sub(r"\s*([{};,>])\s*", r"\1", text)
+    text = re.sub(r":\s+", ":", text)
+    text = text.replace(";}", "}")
+    return text.strip()
+
+
+def minify_js(text: str) -> str:
+    """보수적인 축소: 블록 주석·한 줄 주석 줄·들여쓰기·빈 줄만 제거 (문자열 안에 주석 기호를 쓰지 않는 원본 전제)"""
+    text = re.sub(r"/\*.*?\*/", "", text, flags=re.DOTALL)
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith("//"):
+            lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+MINIFIERS = {".css": minify_css, ".js": minify_js}
+
+
+def build(source_dir: str = SOURCE_DIR, output_dir: str = OUTPUT_DIR) -> Dict[str, Dict[str, str]]:
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {}
+    for name in sorted(os.listdir(source_dir)):
+        stem, extension = os.path.splitext(name)
+        minify = MINIFIERS.get(extension)
+        if minify is None:
+            continue
+        if stem.endswith(".min"):
+            # 외부에서 받은 축소본은 건드리지 않음 (ISC 등 라이선스 주석 유지)
+            stem, extension, minify = stem[:-len(".min")], ".min" + extension, str
+        with open(os.path.join(source_dir, name), "r", encoding="utf-8") as f:
+            content = minify(f.read())
+        digest = hashlib.sha256(content.encode()).hexdigest()[:HASH_LENGTH]
+        file_name = f"{stem}.{digest}{extension}"
+        with open(os.path.join(output_dir, file_name), "w", encoding="utf-8") as f:
+            f.write(content)
+        manifest[name] = {"file": file_name, "hash": digest}
+
+    # 이전 빌드에서 남은 해시 파일 정리
+    current = {entry["file"] for entry in manifest.values()}
+    pattern = re.compile(r"^(?P<stem>.+)\.[0-9a-f]{%d}(?P<ext>(\.min)?\.\w+)$" % HASH_LENGTH)
+    for name in os.listdir(output_dir):
+        match = pattern.match(name)
+        if match and name not in current and f"{match['stem']}{match['ext']}" in manifest:
+            os.remove(os.path.join(output_dir, name))
+
+    tmp_path = os.path.join(output_dir, "manifest.json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(output_dir, "manifest.json"))
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=SOURCE_DIR, help="원본 자산 폴더")
+    parser.add_argument("--output", default=OUTPUT_DIR, help="빌드 결과 폴더")
+    args = parser.parse_args()
+
+    manifest = build(args.source, args.output)
+    for name, entry in manifest.items():
+        source_size = os.path.getsize(os.path.join(args.source, name))
+        built_size = os.path.getsize(os.path.join(args.output, entry["file"]))
+        print(f"{name:<24} -> {entry['file']:<40} {source_size:>7} -> {built_size:>7} bytes")
+
+
+if __name__ == "__main__":
+    main()
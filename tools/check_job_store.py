@@ -0,0 +1,136 @@
+"""작업 저장소(SQLiteJobStore·RedisJobStore)의 임대(claim) 동작 확인
+
+앱(test.py)의 저장소를 그대로 불러와, Redis는 tools/fake_redis.py의 FakeRedis로 확인:
+- 비어 있는 임대는 가져가고, 남의 임대는 못 가져가고, 내 임대는 갱신되고, 만료되면 남이 가져감
+- create는 이미 있는 작업을 덮어쓰지 않음
+- 확인(get)과 갱신(set) 사이에 다른 복제본이 끼어들어도 두 복제본이 동시에 임대를 갖지 않음
+- ImageJobManager가 전송하는 동안 임대 시간보다 오래 걸려도 임대가 유지됨
+- 두 복제본이 같은 unique_id로 작업을 등록해도 서로의 기록을 덮어쓰지 않고 둘 다 전송됨
+하나라도 어긋나면 종료 코드 1
+
+사용법:
+    python tools/check_job_store.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from checks import Checks, FakeClock, load_app  # noqa: E402
+from fake_redis import FakeRedis, WatchError  # noqa: E402
+
+LEASE = 0.2
+
+
+class InterleavedRedis(FakeRedis):
+    """다음 get 직후 한 번 between을 실행 (임대 확인과 갱신 사이에 다른 복제본을 끼워 넣음)"""
+
+    def __init__(self, clock=time.monotonic):
+        super().__init__(clock)
+        self.between = None
+
+    def get(self, name: str):
+        value = super().get(name)
+        between, self.between = self.between, None
+        if between is not None:
+            between()
+        return value
+
+
+class StubAssistant:
+    """ImageJobManager가 쓰는 만큼만 흉내 낸 어시스턴트 (전송은 기록만 함)"""
+
+    def __init__(self, conversation_id: str):
+        self.conversation_id = conversation_id
+        self.thread = None
+        self.sent = []
+
+    def send_image_data(self, visualization_text: str, unique_id: str, ticket=None):
+        self.sent.append((unique_id, visualization_text))
+        return {"success": True, "message": "", "unique_id": unique_id}
+
+    def get_image_links(self, unique_id: str):
+        return {"success": False, "images": [], "message": ""}
+
+
+class StubPoller:
+    def watch(self, *args, **kwargs):
+        pass
+
+
+class NoPromptCache:
+    def get(self, visualization_text: str):
+        return None
+
+
+def main():
+    app = load_app()
+    check = Checks()
+
+    stores = {
+        "sqlite": app.SQLiteJobStore(os.path.join(tempfile.mkdtemp(prefix="sf49-jobs-"), "jobs.db")),
+        "redis": app.RedisJobStore(FakeRedis(), WatchError),
+    }
+    for kind, store in stores.items():
+        state = {"job_id": "job-1", "unique_id": "design_1234", "status": "queued", "prompt": "cat"}
+        check(f"{kind}: creates a new job", store.create(state, "a", LEASE))
+        check(f"{kind}: create refuses an existing job",
+              not store.create(dict(state, prompt="dog"), "b", LEASE))
+        check(f"{kind}: existing state kept", store.load("job-1")["prompt"] == "cat")
+        check(f"{kind}: claims a free lease", store.claim("job-1", "a", LEASE))
+        check(f"{kind}: other owner is refused", not store.claim("job-1", "b", LEASE))
+        check(f"{kind}: owner renews", store.claim("job-1", "a", LEASE))
+        time.sleep(LEASE * 1.5)
+        check(f"{kind}: expired lease is taken over", store.claim("job-1", "b", LEASE))
+        check(f"{kind}: previous owner is refused", not store.claim("job-1", "a", LEASE))
+
+    # a가 자기 임대를 확인한 직후 임대가 만료되고 b가 가져가면, a의 갱신은 취소돼야 함
+    clock = FakeClock()
+    redis = InterleavedRedis(clock)
+    store_a = app.RedisJobStore(redis, WatchError)
+    store_b = app.RedisJobStore(redis, WatchError)
+    store_a.claim("job-2", "a", 10)
+    clock.now = 9.0
+
+    def expire_and_take_over():
+        clock.now = 11.0
+        check("redis: takeover between check and renew", store_b.claim("job-2", "b", 10))
+
+    redis.between = expire_and_take_over
+    check("redis: stale renew is rejected", not store_a.claim("job-2", "a", 10))
+    owner = redis.get(f"{store_a.prefix}job-2:lease")
+    check("redis: single owner after race", owner == b"b", owner)
+
+    # 전송이 임대 시간보다 오래 걸려도 작업 관리자가 임대를 갱신함
+    app.IMAGE_JOB_LEASE = LEASE
+    store = app.RedisJobStore(FakeRedis(), WatchError)
+    manager = app.ImageJobManager(1, None, None, store, owner="a")
+    store.claim("job-3", "a", LEASE)
+    with manager._renewing_lease("job-3"):
+        time.sleep(LEASE * 5)
+        check("lease held during long send", not store.claim("job-3", "b", LEASE))
+    time.sleep(LEASE * 1.5)
+    check("lease released after send", store.claim("job-3", "b", LEASE))
+
+    # 복제본 둘이 모델이 만든 같은 unique_id로 동시에 작업을 등록
+    store = app.SQLiteJobStore(os.path.join(tempfile.mkdtemp(prefix="sf49-jobs-"), "jobs.db"))
+    replicas = []
+    for owner, prompt in (("a", "cat"), ("b", "dog")):
+        manager = app.ImageJobManager(1, StubPoller(), NoPromptCache(), store, owner=owner)
+        assistant = StubAssistant(f"conversation-{owner}")
+        job = manager.submit(assistant, prompt, "design_request_1234")
+        check(f"replica {owner}: submit returns", job.submitted.wait(5))
+        replicas.append((prompt, assistant, job))
+    (_, _, job_a), (_, _, job_b) = replicas
+    check("same unique_id gets separate jobs", job_a.job_id != job_b.job_id)
+    for prompt, assistant, job in replicas:
+        check(f"{prompt}: state not overwritten", store.load(job.job_id)["visualization_text"] == prompt)
+        check(f"{prompt}: sent to webhook", assistant.sent == [("design_request_1234", prompt)], assistant.sent)
+
+    check.finish()
+
+
+if __name__ == "__main__":
+    main()
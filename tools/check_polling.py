@@ -0,0 +1,89 @@
+"""이미지 완료 폴링 일정(PollScheduler)과 첫 대기 시간 학습(CompletionStats)을 가짜 시계로 확인
+
+실제로 기다리지 않고 앱(test.py)의 클래스를 그대로 불러와 확인:
+- 미리 확인 → 첫 대기 → 백오프 → 마감 순서와 간격, 지터 범위, restart_backoff
+- 콜백 모드의 안전망 조회 일정이 드문드문한지
+- 폴링만으로 완료를 알게 될 때 학습된 첫 대기 시간이 실제 완료 시간 쪽으로 내려오고
+  (기록이 확인 시각이라 예전에는 올라가기만 했음), 완료가 느려지면 다시 올라가는지
+하나라도 어긋나면 종료 코드 1
+
+사용법:
+    python tools/check_polling.py
+"""
+import os
+import sys
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from checks import Checks, FakeClock, load_app  # noqa: E402
+
+
+def schedule(app, clock: FakeClock, rng, **kwargs) -> List[float]:
+    scheduler = app.PollScheduler(clock=clock, rng=rng, **kwargs)
+    delays = []
+    while True:
+        delay = scheduler.next_delay()
+        if delay is None:
+            return delays
+        delays.append(round(delay, 3))
+        clock.now += delay
+
+
+def simulate_job(app, stats, completion: float) -> float:
+    """완료 시간이 completion초인 작업을 폴링으로 기다린 시간 (완료를 처음 확인한 시각)"""
+    clock = FakeClock()
+    scheduler = app.PollScheduler(initial_delay=stats.initial_delay(), clock=clock, rng=lambda: 0.5)
+    while clock.now < completion:
+        delay = scheduler.next_delay()
+        if delay is None:
+            raise AssertionError(f"deadline before completion {completion}s")
+        clock.now += delay
+    stats.record(clock.now)
+    return clock.now
+
+
+def main():
+    app = load_app()
+    check = Checks()
+
+    # 지터 없이(rng=0.5) 15·30·60초 확인 후 2초부터 1.5배씩, 15초 상한, 마감 300초
+    delays = schedule(app, FakeClock(), lambda: 0.5, initial_delay=60.0)
+    check("probes before initial delay", delays[:3] == [15.0, 15.0, 30.0], delays[:3])
+    check("backoff after initial delay", delays[3:6] == [2.0, 3.0, 4.5], delays[3:6])
+    check("backoff capped", max(delays[3:]) <= app.IMAGE_POLL_MAX_INTERVAL, max(delays[3:]))
+    check("stops at deadline", abs(sum(delays) - app.IMAGE_POLL_DEADLINE) < 1e-6, round(sum(delays), 3))
+
+    # 콜백 모드의 안전망 일정: 미리 확인 없이 한참 뒤 첫 조회, 이후 일정 간격
+    fallback = schedule(app, FakeClock(), lambda: 0.5, initial_delay=app.IMAGE_CALLBACK_FALLBACK_DELAY,
+                        base_interval=app.IMAGE_CALLBACK_FALLBACK_INTERVAL,
+                        max_interval=app.IMAGE_CALLBACK_FALLBACK_INTERVAL, probes=())
+    check("callback fallback skips probes", fallback[0] == app.IMAGE_CALLBACK_FALLBACK_DELAY, fallback[:3])
+    check("callback fallback polls sparsely", len(fallback) <= 8, len(fallback))
+
+    low = schedule(app, FakeClock(), lambda: 0.0, initial_delay=60.0, deadline=20.0)
+    high = schedule(app, FakeClock(), lambda: 1.0, initial_delay=60.0, deadline=20.0)
+    check("jitter lower bound", low[0] == 15.0 * (1 - app.IMAGE_POLL_JITTER), low[0])
+    check("jitter upper bound", high[0] == 15.0 * (1 + app.IMAGE_POLL_JITTER), high[0])
+
+    scheduler = app.PollScheduler(initial_delay=60.0, clock=FakeClock(), rng=lambda: 0.5)
+    scheduler.next_delay()
+    scheduler.restart_backoff()
+    check("restart_backoff returns to base interval", scheduler.next_delay() == app.IMAGE_POLL_BASE_INTERVAL)
+
+    # 폴링 전용: 실제 완료 1초 → 학습된 첫 대기 시간이 하한까지 내려오고 대기 시간도 줄어듦
+    stats = app.CompletionStats()
+    waits = [simulate_job(app, stats, 1.0) for _ in range(6)]
+    check("learned delay decreases", stats.initial_delay() == app.IMAGE_POLL_MIN_DELAY, stats.initial_delay())
+    check("time to images converges", waits[-1] <= app.IMAGE_POLL_MIN_DELAY, waits)
+
+    # 완료가 느려지면(40초) 학습된 값도 다시 올라감
+    for _ in range(60):
+        simulate_job(app, stats, 40.0)
+    check("learned delay increases", 20.0 <= stats.initial_delay() <= 45.0, stats.initial_delay())
+
+    check.finish()
+
+
+if __name__ == "__main__":
+    main()
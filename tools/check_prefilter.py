@@ -0,0 +1,59 @@
+"""사전 필터 규칙(prefilter_rules.json)을 예시 입력(prefilter_examples.json)으로 확인
+
+앱(test.py)의 PromptPrefilter를 그대로 불러와
+- blocked 예시가 기대한 규칙에 걸리는지 (놓치면 미탐)
+- allowed 예시가 어떤 규칙에도 걸리지 않는지 (걸리면 오탐)
+를 확인하고 오탐률·미탐률을 출력함. 하나라도 어긋나면 종료 코드 1 (CI에서 규칙 변경 검증용)
+
+사용법:
+    python tools/check_prefilter.py
+    python tools/check_prefilter.py --rules my_rules.json --examples my_examples.json
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from checks import ROOT_DIR, load_app  # noqa: E402
+
+EXAMPLES_PATH = os.path.join(ROOT_DIR, "prefilter_examples.json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rules", help="규칙 파일 (기본: 앱의 PREFILTER_RULES_PATH)")
+    parser.add_argument("--examples", default=EXAMPLES_PATH, help="예시 파일")
+    args = parser.parse_args()
+
+    app = load_app()
+    prefilter = app.PromptPrefilter(args.rules or app.PREFILTER_RULES_PATH)
+    with open(args.examples, encoding="utf-8") as f:
+        examples = json.load(f)
+
+    missed = []
+    for example in examples["blocked"]:
+        verdict = prefilter.check(example["prompt"])
+        if verdict is None or verdict[0] != example["rule"]:
+            missed.append(f"{example['prompt']!r}: expected {example['rule']}, got {verdict[0] if verdict else None}")
+    false_positives = []
+    for prompt in examples["allowed"]:
+        verdict = prefilter.check(prompt)
+        if verdict is not None:
+            false_positives.append(f"{prompt!r}: blocked by {verdict[0]}")
+
+    for line in missed:
+        print(f"missed: {line}")
+    for line in false_positives:
+        print(f"false positive: {line}")
+    print(f"blocked {len(examples['blocked']) - len(missed)}/{len(examples['blocked'])}"
+          f" (miss rate {len(missed) / max(1, len(examples['blocked'])):.1%}), "
+          f"allowed {len(examples['allowed']) - len(false_positives)}/{len(examples['allowed'])}"
+          f" (false positive rate {len(false_positives) / max(1, len(examples['allowed'])):.1%})")
+    if missed or false_positives:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
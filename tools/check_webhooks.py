@@ -0,0 +1,223 @@
+"""웹훅 호출 보호 장치(속도 제한·공정 대기열·차단기·헤지 요청)를 가짜 시계와 가짜 응답으로 확인
+
+앱(test.py)의 클래스를 그대로 불러와 확인:
+- 토큰 버킷: 순간 최대만큼 바로 허용하고 이후 속도대로 채워지는지, 429면 속도가 절반(하한 있음)이 되고
+  Retry-After(초·HTTP 날짜) 동안 멈추는지, 성공하면 원래 속도까지만 회복하는지
+- 대기열: 한 세션이 여러 요청을 먼저 넣어도 다른 세션과 번갈아 차례가 오는지
+- 차단기: 연속 실패로 열리고, cooldown 뒤 시험 요청은 하나만 보내고, 그 결과로 닫히거나 다시 열리는지,
+  시험 요청이 결과 없이 사라져도 다음 cooldown 뒤 다시 시험하는지
+- 헤지 요청: p95 기록이 없으면 한 번만 보내고, 느리면 중복 요청의 빠른 응답을 쓰고,
+  5xx보다 정상 응답을 고르고, 속도 제한에 여유가 없으면 중복 요청을 보내지 않는지
+하나라도 어긋나면 종료 코드 1
+
+사용법:
+    python tools/check_webhooks.py
+"""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from checks import Checks, FakeClock, load_app  # noqa: E402
+
+
+def wait_until(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def check_token_bucket(app, check: Checks):
+    clock = FakeClock()
+    bucket = app.TokenBucket(2.0, 3, min_rate=0.5, clock=clock)
+    burst = [bucket.try_acquire() for _ in range(3)]
+    check("bucket: burst up to capacity", burst == [0.0, 0.0, 0.0], burst)
+    check("bucket: next token after 1/rate", bucket.try_acquire() == 0.5)
+    clock.now += 10.0
+    refilled = [bucket.try_acquire() for _ in range(4)]
+    check("bucket: refill capped at capacity", refilled[:3] == [0.0] * 3 and refilled[3] > 0, refilled)
+
+    bucket.penalize(retry_after=4.0)
+    check("bucket: 429 halves the rate", bucket.rate == 1.0, bucket.rate)
+    check("bucket: blocked for Retry-After", bucket.try_acquire() == 4.0)
+    check("bucket: expected wait includes Retry-After", bucket.expected_wait(2) == 4.0 + 2 / bucket.rate)
+    clock.now += 3.9
+    check("bucket: still blocked just before Retry-After", bucket.try_acquire() > 0)
+    clock.now += 0.1
+    check("bucket: admits after Retry-After", bucket.try_acquire() == 0.0)
+
+    for _ in range(5):
+        bucket.penalize(retry_after=None)
+    check("bucket: rate floor", bucket.rate == 0.5, bucket.rate)
+    for _ in range(100):
+        bucket.reward()
+    check("bucket: recovery capped at max rate", bucket.rate == 2.0, bucket.rate)
+
+    delay = app.parse_retry_after(formatdate(time.time() + 30, usegmt=True))
+    check("Retry-After as HTTP date", delay is not None and 28.0 <= delay <= 30.0, delay)
+    check("Retry-After in seconds", app.parse_retry_after("7") == 7.0)
+    check("Retry-After invalid", app.parse_retry_after("soon") is None)
+
+
+def check_admission_fairness(app, check: Checks):
+    """세션 a가 요청 3개를 먼저 넣고 b가 1개를 넣어도 a, b, a, a 순서로 차례가 옴"""
+    clock = FakeClock()
+    bucket = app.TokenBucket(1.0, 1, clock=clock)
+    bucket.try_acquire()  # 남은 토큰을 비워 모두 대기열에 서게 함
+    admission = app.AdmissionController(bucket)
+
+    admitted = []
+    tickets = []
+    threads = []
+    for label, session in (("a1", "a"), ("a2", "a"), ("a3", "a"), ("b1", "b")):
+        ticket = app.AdmissionTicket(session)
+        ticket.label = label
+        thread = threading.Thread(
+            target=lambda t=ticket: admission.acquire(t, timeout=10) and admitted.append(t.label),
+            daemon=True
+        )
+        thread.start()
+        wait_until(lambda t=ticket: admission.position(t) is not None)
+        tickets.append(ticket)
+        threads.append(thread)
+
+    positions = {ticket.label: admission.position(ticket)[0] for ticket in tickets}
+    check("admission: sessions interleave in queue", positions == {"a1": 1, "b1": 2, "a2": 3, "a3": 4}, positions)
+    waits = {ticket.label: admission.position(ticket)[1] for ticket in tickets}
+    check("admission: expected wait grows with position", waits["a3"] > waits["a2"] > waits["b1"], waits)
+
+    # 1초마다 토큰 하나: 시계를 옮기고 깨울 때마다 한 요청씩 통과
+    for step in range(1, 5):
+        clock.now += 1.0
+        admission.report(200)
+        wait_until(lambda: len(admitted) >= step)
+    for thread in threads:
+        thread.join(1)
+    check("admission: round-robin order", admitted == ["a1", "b1", "a2", "a3"], admitted)
+
+    admission.report(429, "5")
+    lonely = app.AdmissionTicket("c")
+    check("admission: 429 blocks new requests", not admission.acquire(lonely, timeout=0.05))
+    check("admission: rejected ticket leaves queue", admission.position(lonely) is None)
+    clock.now += 5.0 + 1 / bucket.rate
+    check("admission: admits after Retry-After", admission.acquire(app.AdmissionTicket("c"), timeout=0.05))
+
+
+def check_circuit_breaker(app, check: Checks):
+    clock = FakeClock()
+    breaker = app.CircuitBreaker(threshold=3, cooldown=10.0, clock=clock)
+    for _ in range(2):
+        breaker.record_failure()
+    check("breaker: stays closed below threshold", breaker.allow() and breaker.state == "closed")
+    breaker.record_success()
+    for _ in range(2):
+        breaker.record_failure()
+    check("breaker: success resets failure count", breaker.state == "closed")
+    breaker.record_failure()
+    check("breaker: opens at threshold", breaker.state == "open" and not breaker.allow())
+
+    clock.now += 9.9
+    check("breaker: closed during cooldown", not breaker.allow())
+    clock.now += 0.1
+    check("breaker: one probe after cooldown", breaker.allow() and breaker.state == "half-open")
+    check("breaker: no second probe", not breaker.allow())
+    breaker.record_failure()
+    check("breaker: failed probe reopens", breaker.state == "open" and not breaker.allow())
+
+    clock.now += 10.0
+    check("breaker: probes again after next cooldown", breaker.allow())
+    clock.now += 10.0
+    check("breaker: lost probe is retried", breaker.allow() and not breaker.allow())
+    breaker.record_success()
+    check("breaker: successful probe closes", breaker.state == "closed" and breaker.allow())
+
+
+class FakePosts:
+    """_timed_post 대신 호출 순서대로 (지연 초, 상태 코드)를 돌려줌"""
+
+    def __init__(self, *behaviours):
+        self.behaviours = list(behaviours)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, endpoint: str, url: str, payload, timeout: float):
+        with self._lock:
+            delay, status_code = self.behaviours[self.calls]
+            self.calls += 1
+        time.sleep(delay)
+        return SimpleNamespace(status_code=status_code, delay=delay)
+
+
+def hedging_assistant(app, posts: FakePosts, p95, bucket=None):
+    """_hedged_post가 쓰는 속성만 가진 어시스턴트"""
+    health = app.EndpointHealth()
+    if p95 is not None:
+        for _ in range(health.latency.min_samples):
+            health.latency.record(p95)
+    bucket = bucket or app.TokenBucket(100.0, 10)
+    return SimpleNamespace(
+        webhook_health={"retrieve": health},
+        admission={"retrieve": app.AdmissionController(bucket)},
+        hedge_pool=ThreadPoolExecutor(max_workers=4),
+        conversation_id="check",
+        _timed_post=posts
+    )
+
+
+def hedged(app, assistant):
+    return app.SF49StudioAssistant._hedged_post(assistant, "retrieve", "http://hook.invalid/retrieve", {}, 5.0)
+
+
+def check_hedged_post(app, check: Checks):
+    slow = app.WEBHOOK_HEDGE_MIN_DELAY + 0.5
+
+    posts = FakePosts((slow, 200))
+    response = hedged(app, hedging_assistant(app, posts, None))
+    check("hedge: no p95 yet sends once", posts.calls == 1 and response.status_code == 200, posts.calls)
+
+    posts = FakePosts((0.0, 200))
+    hedged(app, hedging_assistant(app, posts, 0.05))
+    check("hedge: fast primary sends once", posts.calls == 1, posts.calls)
+
+    posts = FakePosts((slow, 200), (0.0, 200))
+    started = time.monotonic()
+    response = hedged(app, hedging_assistant(app, posts, 0.05))
+    elapsed = time.monotonic() - started
+    check("hedge: slow primary is hedged", posts.calls == 2 and response.delay == 0.0, posts.calls)
+    check("hedge: answers before the slow primary", elapsed < slow, round(elapsed, 3))
+
+    posts = FakePosts((slow, 200), (0.0, 503))
+    response = hedged(app, hedging_assistant(app, posts, 0.05))
+    check("hedge: prefers a 2xx over an earlier 5xx", response.status_code == 200, response.status_code)
+
+    posts = FakePosts((slow, 503), (slow + 0.2, 502))
+    response = hedged(app, hedging_assistant(app, posts, 0.05))
+    check("hedge: both 5xx returns a 5xx", response.status_code >= 500, response.status_code)
+
+    empty = app.TokenBucket(1.0, 1, clock=FakeClock())
+    empty.try_acquire()
+    posts = FakePosts((slow, 200), (0.0, 200))
+    hedged(app, hedging_assistant(app, posts, 0.05, empty))
+    check("hedge: no backup without a rate-limit token", posts.calls == 1, posts.calls)
+
+
+def main():
+    app = load_app()
+    check = Checks()
+    check_token_bucket(app, check)
+    check_admission_fairness(app, check)
+    check_circuit_breaker(app, check)
+    check_hedged_post(app, check)
+    check.finish()
+
+
+if __name__ == "__main__":
+    main()
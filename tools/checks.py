@@ -0,0 +1,43 @@
+"""tools/check_*.py가 함께 쓰는 도우미
+
+- load_app(): test.py를 모듈로 불러옴
+- FakeClock: 실제로 기다리지 않고 시간을 옮기는 시계 (clock 인자를 받는 앱 클래스용)
+- Checks: 확인 결과를 한 줄씩 출력하고, 하나라도 어긋났으면 finish()에서 종료 코드 1
+"""
+import importlib.util
+import os
+import sys
+from typing import List
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT_DIR, "test.py")
+
+
+def load_app():
+    """test.py를 모듈로 불러옴 (main()은 __main__일 때만 실행되므로 화면은 그리지 않음)"""
+    spec = importlib.util.spec_from_file_location("sf49_app", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakeClock:
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Checks:
+    def __init__(self):
+        self.failures: List[str] = []
+
+    def __call__(self, name: str, condition: bool, detail=""):
+        print(f"{'ok  ' if condition else 'FAIL'} {name} {detail}")
+        if not condition:
+            self.failures.append(name)
+
+    def finish(self):
+        if self.failures:
+            sys.exit(1)
@@ -0,0 +1,499 @@
+"""SF49 Studio가 쓰는 OpenAI Assistants API(beta)의 로컬 대역
+
+앱이 호출하는 엔드포인트만 구현:
+- assistants: create / retrieve / update / list
+- threads: create(처음 메시지·metadata 포함) / retrieve
+- messages: create / list (order·limit)
+- runs: create(stream 여부 선택) / retrieve / submit_tool_outputs(stream 여부 선택)
+- chat.completions: create (대화 요약용, 고정된 브리프를 돌려줌)
+
+대본대로 동작하는 가짜 모델:
+- 사용자 메시지가 "?"로 끝나면 도구 없이 짧은 답변만 함
+- 그 외에는 send_image_request 도구 호출(requires_action)을 요청하고,
+  도구 결과를 받으면 안내 문구로 런을 마침
+- 스트리밍 응답은 --chunk 글자씩 --token-delay 간격으로 나눠 보냄
+- 스트리밍하지 않은 런은 --run-latency 초가 지나야 다음 상태로 넘어감
+- 런의 usage는 지침과 truncation_strategy로 남긴 메시지의 글자 수로 추정하며,
+  max_prompt_tokens를 넘으면 "auto"는 오래된 메시지를 버리고, last_messages는 incomplete로 끝냄
+
+사용법:
+    python tools/fake_openai.py --port 8700
+    OPENAI_BASE_URL=http://localhost:8700/v1 streamlit run test.py
+"""
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+TOOL_REPLY = "요청하신 디자인을 생성하고 있습니다. 완성되면 바로 보여드릴게요!"
+CHAT_REPLY = "SF49 Studio 디자이너입니다. 원하시는 이미지를 자세히 설명해 주시면 바로 만들어 드릴게요."
+BRIEF_REPLY = "- 고객 요청: 이전 대화의 디자인 요청\n- 스타일: 대화에서 정한 스타일 유지"
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """대략적인 토큰 수 (한글은 글자당 토큰이 많아 글자 수의 절반으로 셈)"""
+    return max(1, len(text) // 2)
+
+
+def content_text(content) -> str:
+    """요청 본문의 content (문자열 또는 텍스트 파트 목록)를 문자열로"""
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content
+
+
+def message_text(message: Dict) -> str:
+    return "".join(part["text"]["value"] for part in message["content"] if part.get("type") == "text")
+
+
+def new_id(prefix: str) -> str:
+    return f"{prefix}_{uuid.uuid4().hex[:24]}"
+
+
+class FakeAssistantsAPI:
+    """assistant·thread·message·run 상태와 요청 통계 보관"""
+
+    def __init__(self, run_latency: float, token_delay: float, chunk: int):
+        self.run_latency = run_latency
+        self.token_delay = token_delay
+        self.chunk = chunk
+        self.assistants: Dict[str, Dict] = {}
+        self.threads: Dict[str, Dict] = {}
+        self.messages: Dict[str, List[Dict]] = {}
+        self.runs: Dict[str, Dict] = {}
+        self.counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def count(self, kind: str):
+        with self._lock:
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+
+    # assistants
+
+    def create_assistant(self, body: Dict) -> Dict:
+        assistant = {
+            "id": new_id("asst"),
+            "object": "assistant",
+            "created_at": int(time.time()),
+            "name": body.get("name"),
+            "description": body.get("description"),
+            "model": body.get("model", "gpt-4o-mini"),
+            "instructions": body.get("instructions"),
+            "tools": body.get("tools", []),
+            "metadata": body.get("metadata") or {},
+        }
+        with self._lock:
+            self.assistants[assistant["id"]] = assistant
+        return assistant
+
+    def update_assistant(self, assistant_id: str, body: Dict) -> Optional[Dict]:
+        with self._lock:
+            assistant = self.assistants.get(assistant_id)
+            if assistant is not None:
+                assistant.update({k: v for k, v in body.items() if k in assistant})
+            return assistant
+
+    # threads · messages
+
+    def create_thread(self, body: Optional[Dict] = None) -> Dict:
+        body = body or {}
+        thread = {"id": new_id("thread"), "object": "thread", "created_at": int(time.time()),
+                  "metadata": body.get("metadata") or {}}
+        with self._lock:
+            self.threads[thread["id"]] = thread
+            self.messages[thread["id"]] = []
+        for message in body.get("messages") or []:
+            self.add_message(thread["id"], message.get("role", "user"), content_text(message.get("content", "")))
+        return thread
+
+    def add_message(self, thread_id: str, role: str, text: str, run_id: Optional[str] = None,
+                    assistant_id: Optional[str] = None) -> Dict:
+        message = {
+            "id": new_id("msg"),
+            "object": "thread.message",
+            "created_at": int(time.time()),
+            "thread_id": thread_id,
+            "role": role,
+            "status": "completed",
+            "content": [{"type": "text", "text": {"value": text, "annotations": []}}],
+            "assistant_id": assistant_id,
+            "run_id": run_id,
+            "attachments": [],
+            "metadata": {},
+        }
+        with self._lock:
+            self.messages[thread_id].append(message)
+        return message
+
+    # runs
+
+    def list_messages(self, thread_id: str, order: str = "desc", limit: int = 20) -> List[Dict]:
+        with self._lock:
+            data = list(self.messages[thread_id])
+        if order != "asc":
+            data.reverse()
+        return data[:limit]
+
+    def prompt_tokens(self, state: Dict) -> Optional[int]:
+        """런 한 번이 읽는 입력 토큰 수 (last_messages 예산을 넘으면 None)"""
+        run = state["run"]
+        with self._lock:
+            messages = list(self.messages[run["thread_id"]])
+            assistant = self.assistants.get(run["assistant_id"]) or {}
+        base = estimate_tokens(assistant.get("instructions") or "")
+        sizes = [estimate_tokens(message_text(m)) + MESSAGE_OVERHEAD_TOKENS for m in messages]
+        truncation = run.get("truncation_strategy") or {"type": "auto"}
+        if truncation.get("type") == "last_messages":
+            sizes = sizes[-truncation["last_messages"]:]
+        limit = run.get("max_prompt_tokens")
+        if limit:
+            if truncation.get("type") != "last_messages":
+                while sizes and base + sum(sizes) > limit:
+                    sizes.pop(0)
+            elif base + sum(sizes) > limit:
+                return None
+        return base + sum(sizes)
+
+    def create_run(self, thread_id: str, assistant_id: str, options: Optional[Dict] = None) -> Dict:
+        with self._lock:
+            last_user = next((m for m in reversed(self.messages[thread_id]) if m["role"] == "user"), None)
+        prompt = last_user["content"][0]["text"]["value"] if last_user else ""
+        run = {
+            "id": new_id("run"),
+            "object": "thread.run",
+            "created_at": int(time.time()),
+            "thread_id": thread_id,
+            "assistant_id": assistant_id,
+            "status": "queued",
+            "required_action": None,
+            "last_error": None,
+            "model": "gpt-4o-mini",
+            "instructions": "",
+            "tools": [],
+            "metadata": {},
+            "usage": None,
+            "truncation_strategy": (options or {}).get("truncation_strategy") or {"type": "auto"},
+            "max_prompt_tokens": (options or {}).get("max_prompt_tokens"),
+        }
+        state = {
+            "run": run,
+            "prompt": prompt,
+            "wants_tool": not prompt.rstrip().endswith("?"),
+            "phase": "thinking",  # thinking → (requires_action → answering) → completed
+            "ready_at": time.monotonic() + self.run_latency,
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0},
+        }
+        with self._lock:
+            self.runs[run["id"]] = state
+        return state
+
+    def charge(self, state: Dict, output: str) -> bool:
+        """모델 호출 한 번의 토큰을 런 usage에 더함 (입력 예산을 넘으면 False)"""
+        prompt = self.prompt_tokens(state)
+        if prompt is None:
+            return False
+        usage = state["usage"]
+        usage["prompt_tokens"] += prompt
+        usage["completion_tokens"] += estimate_tokens(output)
+        state["run"]["usage"] = dict(usage, total_tokens=usage["prompt_tokens"] + usage["completion_tokens"])
+        return True
+
+    def incomplete(self, state: Dict) -> Dict:
+        run = state["run"]
+        run["status"] = "incomplete"
+        run["required_action"] = None
+        run["incomplete_details"] = {"reason": "max_prompt_tokens"}
+        state["phase"] = "completed"
+        return run
+
+    def tool_call(self, state: Dict) -> Dict:
+        unique_id = f"bench_{uuid.uuid4().hex[:8]}_{1000 + int(time.time() * 1000) % 9000}"
+        return {
+            "id": new_id("call"),
+            "type": "function",
+            "function": {
+                "name": "send_image_request",
+                "arguments": json.dumps({"visualization_text": state["prompt"], "unique_id": unique_id},
+                                        ensure_ascii=False),
+            },
+        }
+
+    def require_action(self, state: Dict) -> Dict:
+        run = state["run"]
+        tool_call = self.tool_call(state)
+        if not self.charge(state, tool_call["function"]["arguments"]):
+            return self.incomplete(state)
+        run["status"] = "requires_action"
+        run["required_action"] = {
+            "type": "submit_tool_outputs",
+            "submit_tool_outputs": {"tool_calls": [tool_call]},
+        }
+        state["phase"] = "requires_action"
+        return run
+
+    def complete(self, state: Dict, reply: str) -> Dict:
+        run = state["run"]
+        if not self.charge(state, reply):
+            return self.incomplete(state)
+        run["status"] = "completed"
+        run["required_action"] = None
+        run["completed_at"] = int(time.time())
+        state["phase"] = "completed"
+        self.add_message(run["thread_id"], "assistant", reply, run["id"], run["assistant_id"])
+        return run
+
+    def advance(self, state: Dict) -> Dict:
+        """스트리밍하지 않은 런: 지연 시간이 지났으면 다음 상태로"""
+        with self._lock:
+            if state["phase"] in ("requires_action", "completed") or time.monotonic() < state["ready_at"]:
+                if state["phase"] == "thinking":
+                    state["run"]["status"] = "in_progress"
+                return state["run"]
+        if state["phase"] == "thinking" and state["wants_tool"]:
+            return self.require_action(state)
+        return self.complete(state, TOOL_REPLY if state["phase"] == "answering" else CHAT_REPLY)
+
+    def submit_tool_outputs(self, state: Dict) -> Dict:
+        run = state["run"]
+        run["status"] = "in_progress"
+        run["required_action"] = None
+        state["phase"] = "answering"
+        state["ready_at"] = time.monotonic() + self.run_latency
+        return run
+
+    def stream_events(self, state: Dict) -> List[Tuple[str, Dict, float]]:
+        """(이벤트 이름, 데이터, 보내기 전 대기 시간) 목록"""
+        run = state["run"]
+        events = []
+        if state["phase"] == "thinking":
+            events.append(("thread.run.created", dict(run), 0.0))
+            run["status"] = "in_progress"
+            events.append(("thread.run.in_progress", dict(run), 0.0))
+            if state["wants_tool"]:
+                run = self.require_action(state)
+                events.append((f"thread.run.{run['status']}", dict(run), self.run_latency))
+                return events
+            reply = CHAT_REPLY
+        else:
+            events.append(("thread.run.in_progress", dict(run), 0.0))
+            reply = TOOL_REPLY
+
+        # 입력 예산은 응답을 만들기 전에 검사하므로, 넘으면 델타 없이 incomplete로 끝냄
+        if self.prompt_tokens(state) is None:
+            events.append(("thread.run.incomplete", dict(self.incomplete(state)), self.run_latency))
+            return events
+
+        message_id = new_id("msg")
+        for n, start in enumerate(range(0, len(reply), self.chunk)):
+            delta = {
+                "id": message_id,
+                "object": "thread.message.delta",
+                "delta": {"content": [{
+                    "index": 0,
+                    "type": "text",
+                    "text": {"value": reply[start:start + self.chunk], "annotations": []},
+                }]},
+            }
+            events.append(("thread.message.delta", delta, self.run_latency if n == 0 else self.token_delay))
+        events.append(("thread.run.completed", dict(self.complete(state, reply)), 0.0))
+        return events
+
+    def summarize(self, body: Dict) -> Dict:
+        """chat.completions: 입력과 상관없이 고정된 브리프로 응답"""
+        prompt = "".join(content_text(m.get("content", "")) for m in body.get("messages", []))
+        usage = {"prompt_tokens": estimate_tokens(prompt), "completion_tokens": estimate_tokens(BRIEF_REPLY)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        return {
+            "id": new_id("chatcmpl"),
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": BRIEF_REPLY}}],
+            "usage": usage,
+        }
+
+ROUTES = [
+    ("POST", r"/v1/assistants", "assistants.create"),
+    ("GET", r"/v1/assistants", "assistants.list"),
+    ("GET", r"/v1/assistants/(?P<assistant_id>[^/]+)", "assistants.retrieve"),
+    ("POST", r"/v1/assistants/(?P<assistant_id>[^/]+)", "assistants.update"),
+    ("POST", r"/v1/chat/completions", "chat.completions.create"),
+    ("POST", r"/v1/threads", "threads.create"),
+    ("GET", r"/v1/threads/(?P<thread_id>[^/]+)", "threads.retrieve"),
+    ("POST", r"/v1/threads/(?P<thread_id>[^/]+)/messages", "messages.create"),
+    ("GET", r"/v1/threads/(?P<thread_id>[^/]+)/messages", "messages.list"),
+    ("POST", r"/v1/threads/(?P<thread_id>[^/]+)/runs", "runs.create"),
+    ("GET", r"/v1/threads/(?P<thread_id>[^/]+)/runs/(?P<run_id>[^/]+)", "runs.retrieve"),
+    ("POST", r"/v1/threads/(?P<thread_id>[^/]+)/runs/(?P<run_id>[^/]+)/submit_tool_outputs",
+     "runs.submit_tool_outputs"),
+]
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status: int, payload: Dict):
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _not_found(self, what: str):
+        self._send_json(404, {"error": {"message": f"No {what} found", "type": "invalid_request_error"}})
+
+    def _send_stream(self, events: List[Tuple[str, Dict, float]]):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        for name, data, delay in events:
+            if delay:
+                time.sleep(delay)
+            self.wfile.write(f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"event: done\ndata: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _route(self, method: str) -> Tuple[Optional[str], Dict]:
+        path = self.path.split("?")[0].rstrip("/")
+        for route_method, pattern, name in ROUTES:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                return name, match.groupdict()
+        return None, {}
+
+    def _body(self) -> Dict:
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        api = self.server.api
+        if self.path == "/stats":
+            self._send_json(200, api.counts)
+            return
+        name, params = self._route("GET")
+        if name is None:
+            self._not_found("route")
+            return
+        api.count(name)
+
+        if name == "assistants.list":
+            data = sorted(api.assistants.values(), key=lambda a: a["created_at"], reverse=True)
+            self._send_json(200, {"object": "list", "data": data, "has_more": False,
+                                  "first_id": data[0]["id"] if data else None,
+                                  "last_id": data[-1]["id"] if data else None})
+        elif name == "assistants.retrieve":
+            assistant = api.assistants.get(params["assistant_id"])
+            self._send_json(200, assistant) if assistant else self._not_found("assistant")
+        elif name == "threads.retrieve":
+            thread = api.threads.get(params["thread_id"])
+            self._send_json(200, thread) if thread else self._not_found("thread")
+        elif name == "messages.list":
+            if params["thread_id"] not in api.messages:
+                self._not_found("thread")
+                return
+            query = parse_qs(urlsplit(self.path).query)
+            data = api.list_messages(params["thread_id"], query.get("order", ["desc"])[0],
+                                     int(query.get("limit", ["20"])[0]))
+            self._send_json(200, {"object": "list", "data": data, "has_more": False,
+                                  "first_id": data[0]["id"] if data else None,
+                                  "last_id": data[-1]["id"] if data else None})
+        elif name == "runs.retrieve":
+            state = api.runs.get(params["run_id"])
+            self._send_json(200, api.advance(state)) if state else self._not_found("run")
+
+    def do_POST(self):
+        api = self.server.api
+        name, params = self._route("POST")
+        if name is None:
+            self._not_found("route")
+            return
+        try:
+            body = self._body()
+        except ValueError:
+            self._send_json(400, {"error": {"message": "invalid json", "type": "invalid_request_error"}})
+            return
+        api.count(name)
+
+        if name == "assistants.create":
+            self._send_json(200, api.create_assistant(body))
+        elif name == "assistants.update":
+            assistant = api.update_assistant(params["assistant_id"], body)
+            self._send_json(200, assistant) if assistant else self._not_found("assistant")
+        elif name == "threads.create":
+            self._send_json(200, api.create_thread(body))
+        elif name == "chat.completions.create":
+            self._send_json(200, api.summarize(body))
+        elif params.get("thread_id") not in api.threads:
+            self._not_found("thread")
+        elif name == "messages.create":
+            content = content_text(body.get("content", ""))
+            self._send_json(200, api.add_message(params["thread_id"], body.get("role", "user"), content))
+        elif name == "runs.create":
+            state = api.create_run(params["thread_id"], body.get("assistant_id", ""), body)
+            if body.get("stream"):
+                self._send_stream(api.stream_events(state))
+            else:
+                self._send_json(200, state["run"])
+        elif name == "runs.submit_tool_outputs":
+            state = api.runs.get(params["run_id"])
+            if state is None or state["phase"] != "requires_action":
+                self._send_json(400, {"error": {"message": "Run is not waiting for tool outputs",
+                                                "type": "invalid_request_error"}})
+                return
+            api.submit_tool_outputs(state)
+            if body.get("stream"):
+                self._send_stream(api.stream_events(state))
+            else:
+                self._send_json(200, state["run"])
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int, api_kwargs: Dict):
+        super().__init__(("127.0.0.1", port), FakeOpenAIHandler)
+        self.api = FakeAssistantsAPI(**api_kwargs)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        threading.Thread(target=self.serve_forever, name="fake-openai", daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--run-latency", type=float, default=0.8, help="런이 다음 상태로 넘어가기까지 걸리는 시간(초)")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="스트리밍 델타 사이 간격(초)")
+    parser.add_argument("--chunk", type=int, default=4, help="델타 하나에 담을 글자 수")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(args.port, {
+        "run_latency": args.run_latency,
+        "token_delay": args.token_delay,
+        "chunk": args.chunk,
+    })
+    print(f"fake OpenAI API listening on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
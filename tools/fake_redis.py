@@ -0,0 +1,174 @@
+"""RedisJobStore에서 쓰는 명령만 구현한 인메모리 Redis 대역
+
+redis-py 기본 설정(decode_responses=False)처럼 값을 bytes로 돌려줌.
+여러 "복제본"이 같은 FakeRedis 인스턴스를 공유하면 작업 이어받기를
+실제 Redis 없이 재현할 수 있음 (tools/check_job_store.py에서 사용):
+
+    from tools.fake_redis import FakeRedis, WatchError
+    store = RedisJobStore(FakeRedis(), WatchError)
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+Value = Union[str, bytes, int, float]
+
+
+def _encode(value: Value) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode()
+
+
+class WatchError(Exception):
+    """WATCH한 키가 EXEC 전에 바뀜 (redis.WatchError에 해당)"""
+
+
+class FakePipeline:
+    """WATCH 뒤에는 명령을 바로 실행하고, MULTI 뒤에는 모았다가 EXEC에서 한꺼번에 실행"""
+
+    def __init__(self, redis: "FakeRedis"):
+        self.redis = redis
+        self._watched: Dict[str, int] = {}
+        self._queued: Optional[List[Tuple[str, tuple, dict]]] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.reset()
+
+    def reset(self):
+        self._watched = {}
+        self._queued = None
+
+    def watch(self, *names: str):
+        with self.redis._lock:
+            for name in names:
+                self.redis._alive(name)
+                self._watched[name] = self.redis._versions.get(name, 0)
+
+    def multi(self):
+        self._queued = []
+
+    def _command(self, method: str, *args, **kwargs):
+        if self._queued is None:
+            return getattr(self.redis, method)(*args, **kwargs)
+        self._queued.append((method, args, kwargs))
+        return self
+
+    def exists(self, *names: str):
+        return self._command("exists", *names)
+
+    def get(self, name: str):
+        return self._command("get", name)
+
+    def set(self, name: str, value: Value, **kwargs):
+        return self._command("set", name, value, **kwargs)
+
+    def hset(self, name: str, key: Optional[str] = None, value: Optional[Value] = None,
+             mapping: Optional[Dict[str, Value]] = None):
+        return self._command("hset", name, key, value, mapping=mapping)
+
+    def execute(self) -> list:
+        with self.redis._lock:
+            try:
+                for name, version in self._watched.items():
+                    self.redis._alive(name)
+                    if self.redis._versions.get(name, 0) != version:
+                        raise WatchError(name)
+                return [getattr(self.redis, method)(*args, **kwargs)
+                        for method, args, kwargs in self._queued or []]
+            finally:
+                self.reset()
+
+
+class FakeRedis:
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._data: Dict[str, object] = {}
+        self._expires: Dict[str, float] = {}
+        self._versions: Dict[str, int] = {}  # WATCH용 키별 변경 횟수
+        self._lock = threading.RLock()
+
+    def _touch(self, name: str):
+        self._versions[name] = self._versions.get(name, 0) + 1
+
+    def _alive(self, name: str) -> bool:
+        expires = self._expires.get(name)
+        if expires is not None and self.clock() >= expires:
+            self._data.pop(name, None)
+            self._expires.pop(name, None)
+            self._touch(name)
+        return name in self._data
+
+    def pipeline(self) -> FakePipeline:
+        return FakePipeline(self)
+
+    def set(self, name: str, value: Value, ex: Optional[float] = None, px: Optional[int] = None,
+            nx: bool = False, xx: bool = False) -> Optional[bool]:
+        with self._lock:
+            exists = self._alive(name)
+            if (nx and exists) or (xx and not exists):
+                return None
+            self._data[name] = _encode(value)
+            self._touch(name)
+            self._expires.pop(name, None)
+            if ex is not None:
+                self._expires[name] = self.clock() + ex
+            elif px is not None:
+                self._expires[name] = self.clock() + px / 1000
+            return True
+
+    def exists(self, *names: str) -> int:
+        with self._lock:
+            return sum(1 for name in names if self._alive(name))
+
+    def get(self, name: str) -> Optional[bytes]:
+        with self._lock:
+            if not self._alive(name):
+                return None
+            value = self._data[name]
+            return value if isinstance(value, bytes) else None
+
+    def hset(self, name: str, key: Optional[str] = None, value: Optional[Value] = None,
+             mapping: Optional[Dict[str, Value]] = None) -> int:
+        with self._lock:
+            if not self._alive(name) or not isinstance(self._data[name], dict):
+                self._data[name] = {}
+            fields = self._data[name]
+            items = dict(mapping or {})
+            if key is not None:
+                items[key] = value
+            added = 0
+            for field, field_value in items.items():
+                field_key = _encode(field)
+                added += field_key not in fields
+                fields[field_key] = _encode(field_value)
+            self._touch(name)
+            return added
+
+    def hgetall(self, name: str) -> Dict[bytes, bytes]:
+        with self._lock:
+            if not self._alive(name) or not isinstance(self._data[name], dict):
+                return {}
+            return dict(self._data[name])
+
+    def expire(self, name: str, seconds: float) -> bool:
+        with self._lock:
+            if not self._alive(name):
+                return False
+            self._expires[name] = self.clock() + seconds
+            self._touch(name)
+            return True
+
+    def delete(self, *names: str) -> int:
+        with self._lock:
+            removed = 0
+            for name in names:
+                if self._alive(name):
+                    removed += 1
+                    self._data.pop(name, None)
+                    self._expires.pop(name, None)
+                    self._touch(name)
+            return removed
@@ -0,0 +1,219 @@
+"""SF49 Studio 이미지 생성 시나리오(Make 웹훅)의 로컬 대역
+
+실제 시나리오와 같은 방식으로 동작:
+- 전송 웹훅: {"imageData", "uniqueId", ["callbackUrl", "callbackToken"]} 접수
+- 조회 웹훅: {"uniqueId"} → 준비되면 {"images": [...]}, 아니면 {}
+- --stagger 초를 주면 이미지가 그 간격으로 하나씩 준비되고, 조회 웹훅은
+  {"images": [지금까지 준비된 것], "total": N, "complete": bool}로 일부 결과를 돌려줌
+- callbackUrl이 있으면 준비되는 즉시 {"uniqueId", "images"}를 POST
+- 생성된 이미지는 이 서버의 /images/... 에서 PNG로 제공
+- --failure-rate 비율만큼 전송·조회 요청에 503으로 응답 (재시도·차단기 확인용)
+- --latency 초만큼 전송·조회 응답을 늦춤
+
+사용법:
+    python tools/fake_webhooks.py --port 8600 --delay 20
+    python tools/fake_webhooks.py --port 8600 --delay 8 --stagger 4
+    WEBHOOK_BASE_URL=http://localhost:8600 \\
+    IMAGE_CALLBACK_URL=http://localhost:8765/image-ready \\
+    IMAGE_CALLBACK_TOKEN=local-secret \\
+        streamlit run test.py
+"""
+import argparse
+import hashlib
+import json
+import random
+import struct
+import threading
+import time
+import urllib.request
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+
+def make_png(width: int, height: int, rgb: tuple) -> bytes:
+    """단색 PNG 생성 (의존성 없이)"""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return (struct.pack(">I", len(data)) + kind + data
+                + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+    row = b"\x00" + bytes(rgb) * width
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(row * height))
+            + chunk(b"IEND", b""))
+
+
+class FakeScenario:
+    """이미지 생성 작업 상태와 요청 통계 보관"""
+
+    def __init__(self, base_url: str, delay: float, image_count: int, image_size: int,
+                 failure_rate: float = 0.0, latency: float = 0.0, seed: Optional[int] = None,
+                 stagger: float = 0.0):
+        self.base_url = base_url.rstrip("/")
+        self.delay = delay
+        self.image_count = image_count
+        self.image_size = image_size
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self.stagger = stagger
+        self.jobs: Dict[str, Dict] = {}
+        self.counts: Dict[str, int] = {"send": 0, "retrieve": 0, "image": 0, "callback": 0, "failed": 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            return self._rng.random() < self.failure_rate
+
+    def count(self, kind: str):
+        with self._lock:
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+
+    def submit(self, payload: Dict):
+        unique_id = str(payload["uniqueId"])
+        with self._lock:
+            self.jobs[unique_id] = {
+                "prompt": payload.get("imageData", ""),
+                "ready_at": time.monotonic() + self.delay,
+            }
+        if payload.get("callbackUrl"):
+            # 콜백은 모든 이미지가 준비된 뒤 한 번만 보냄
+            timer = threading.Timer(
+                self.delay + self.stagger * (self.image_count - 1), self._send_callback,
+                args=(unique_id, payload["callbackUrl"], payload.get("callbackToken"))
+            )
+            timer.daemon = True
+            timer.start()
+
+    def images(self, unique_id: str) -> List[str]:
+        with self._lock:
+            job = self.jobs.get(unique_id)
+        if job is None or time.monotonic() < job["ready_at"]:
+            return []
+        ready = self.image_count
+        if self.stagger:
+            ready = min(self.image_count, 1 + int((time.monotonic() - job["ready_at"]) / self.stagger))
+        return [f"{self.base_url}/images/{unique_id}_{n}.png" for n in range(ready)]
+
+    def retrieve(self, unique_id: str) -> Dict:
+        images = self.images(unique_id)
+        if not self.stagger:
+            return {"images": images} if images else {}
+        return {"images": images, "total": self.image_count, "complete": len(images) == self.image_count}
+
+    def _send_callback(self, unique_id: str, callback_url: str, token: Optional[str]):
+        body = json.dumps({"uniqueId": unique_id, "images": self.images(unique_id)}).encode()
+        request = urllib.request.Request(callback_url, data=body, method="POST")
+        request.add_header("Content-Type", "application/json")
+        if token:
+            request.add_header("X-Callback-Token", token)
+        try:
+            urllib.request.urlopen(request, timeout=5).close()
+            self.count("callback")
+        except OSError:
+            pass
+
+
+class FakeWebhookHandler(BaseHTTPRequestHandler):
+    def _send_json(self, status: int, payload: Dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        scenario = self.server.scenario
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": "invalid json"})
+            return
+
+        if scenario.latency:
+            time.sleep(scenario.latency)
+        if scenario.should_fail():
+            scenario.count("failed")
+            self._send_json(503, {"error": "temporarily unavailable"})
+            return
+
+        # 경로 대신 본문으로 전송/조회를 구분하여 앱의 웹훅 경로를 그대로 사용
+        if "imageData" in payload and "uniqueId" in payload:
+            scenario.count("send")
+            scenario.submit(payload)
+            self._send_json(200, {"accepted": True})
+        elif "uniqueId" in payload:
+            scenario.count("retrieve")
+            self._send_json(200, scenario.retrieve(str(payload["uniqueId"])))
+        else:
+            self._send_json(400, {"error": "unknown request"})
+
+    def do_GET(self):
+        scenario = self.server.scenario
+        if self.path == "/stats":
+            self._send_json(200, scenario.counts)
+            return
+        if not self.path.startswith("/images/"):
+            self.send_error(404)
+            return
+
+        scenario.count("image")
+        digest = hashlib.sha256(self.path.encode()).digest()
+        body = make_png(scenario.image_size, scenario.image_size, digest[:3])
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeWebhookServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int, scenario_kwargs: Dict):
+        super().__init__(("127.0.0.1", port), FakeWebhookHandler)
+        base_url = f"http://127.0.0.1:{self.server_address[1]}"
+        self.scenario = FakeScenario(base_url, **scenario_kwargs)
+
+    @property
+    def base_url(self) -> str:
+        return self.scenario.base_url
+
+    def start(self) -> "FakeWebhookServer":
+        threading.Thread(target=self.serve_forever, name="fake-webhooks", daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--delay", type=float, default=20.0, help="이미지 생성에 걸리는 시간(초)")
+    parser.add_argument("--images", type=int, default=4, help="작업당 이미지 수")
+    parser.add_argument("--size", type=int, default=1024, help="이미지 한 변 픽셀 수")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="503으로 응답할 요청 비율 (0~1)")
+    parser.add_argument("--latency", type=float, default=0.0, help="전송·조회 응답 지연(초)")
+    parser.add_argument("--stagger", type=float, default=0.0, help="이미지가 하나씩 준비되는 간격(초, 0이면 한꺼번에)")
+    parser.add_argument("--seed", type=int, default=None, help="실패 여부 난수 시드")
+    args = parser.parse_args()
+
+    server = FakeWebhookServer(args.port, {
+        "delay": args.delay,
+        "image_count": args.images,
+        "image_size": args.size,
+        "failure_rate": args.failure_rate,
+        "latency": args.latency,
+        "seed": args.seed,
+        "stagger": args.stagger,
+    })
+    print(f"fake webhooks listening on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
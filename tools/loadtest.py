@@ -0,0 +1,268 @@
+"""SF49 Studio 다중 세션 부하 테스트 (프로세스 하나당 수용 가능한 동시 사용자 수 측정)
+
+benchmark.py와 같은 가짜 OpenAI·웹훅 서버를 띄우고, 한 프로세스 안에서 N개의 AppTest
+세션을 스레드로 동시에 돌려 Streamlit 서버 프로세스 하나에 N명이 붙은 상황을 흉내 냄.
+st.cache_resource 자원(HTTP 풀, 작업 관리자, 폴러 등)은 실제 서버처럼 모든 세션이 공유함.
+
+동시 세션 수를 단계적으로 늘리며 단계마다 보고:
+- 처리량: 초당 끝난 턴 수
+- rerun 지연: 채팅 입력·진행 표시 갱신을 포함한 스크립트 실행 시간 백분위
+- 스레드 수·RSS 최댓값 (측정 중 주기적으로 표본 추출)
+
+한계: 실제 `streamlit run` 서버가 아니라 측정 도구와 같은 프로세스에서 AppTest로 돌리므로
+- 스레드 수·RSS에는 가짜 OpenAI·웹훅 서버, AppTest 세션 스레드, 표본 추출 스레드가 함께 들어감.
+  세션을 띄우기 전에 잰 값을 "harness"로 따로 보고하니 단계별 값과의 차이로 읽어야 함
+- 웹소켓·프로토콜 직렬화·브라우저 렌더링 비용은 들어가지 않음
+- share_apptest_globals()가 Streamlit 비공개 내부를 바꿔 끼우므로 Streamlit을 올리면 다시 확인해야 함
+절대값보다 같은 환경에서 변경 전후를 비교하는 용도로 씀
+
+rerun p95가 --slo 이하이고 오류가 없는 가장 높은 단계를 "수용량"으로 보고하며,
+--baseline으로 이전 결과를 주면 처리량·p95가 --tolerance 이상 나빠진 단계가 있을 때
+종료 코드 1로 끝남 (CI에서 확장성 퇴행 감지용)
+
+사용법:
+    python tools/loadtest.py --levels 1,4,8,16 --turns 2 --output load.json
+    python tools/loadtest.py --levels 1,4,8,16 --baseline load.json
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark import (  # noqa: E402
+    DEFAULT_PROMPTS, SESSION_SECRETS, configure_environment, new_session, run_turn, summarize
+)
+from fake_openai import FakeOpenAIServer  # noqa: E402
+from fake_webhooks import FakeWebhookServer  # noqa: E402
+
+
+def share_apptest_globals():
+    """AppTest를 여러 스레드에서 동시에 돌릴 수 있도록 실행마다 바꾸는 프로세스 전역을 고정
+
+    AppTest.run()은 실행 동안 Runtime 인스턴스·st.secrets·global.appTest 설정을 바꿨다가
+    끝나면 되돌리므로, 동시에 돌면 먼저 끝난 세션이 다른 세션의 전역을 지움
+    ("Runtime hasn't been created!", 비밀값 없음). 또 실행마다 새 ScriptCache로 test.py를
+    다시 컴파일하는데, 여러 스레드가 동시에 ast.parse하면 3.11에서 SystemError가 남.
+    - st.secrets·global.appTest는 시작 전에 한 번 설정하고 세션에는 비밀값을 주지 않음
+    - Runtime.instance()는 인스턴스가 잠시 비어 있으면 마지막 모의 런타임을 돌려줌
+    - 스크립트 바이트코드는 프로세스 공용 ScriptCache 하나에서 한 번만 컴파일함
+    공개 API가 아닌 Runtime.instance·ScriptCache.get_bytecode를 바꾸므로 Streamlit 버전에 묶여 있음
+    """
+    import streamlit as st
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.runtime.secrets import Secrets
+
+    secrets = Secrets()
+    secrets._secrets = dict(SESSION_SECRETS)
+    st.secrets = secrets
+    config.set_option("global.appTest", True)
+
+    shared_cache = ScriptCache()
+    get_bytecode = ScriptCache.get_bytecode
+    ScriptCache.get_bytecode = lambda self, script_path: get_bytecode(shared_cache, script_path)
+
+    instance = Runtime.instance.__func__
+    last = []
+
+    def shared_instance(cls):
+        if cls._instance is not None:
+            last[:] = [cls._instance]
+            return cls._instance
+        return last[0] if last else instance(cls)
+
+    Runtime.instance = classmethod(shared_instance)
+
+
+def rss_bytes() -> int:
+    """현재 RSS (리눅스가 아니면 최대 RSS로 대신함)"""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+class ResourceSampler:
+    """측정 구간 동안 스레드 수와 RSS의 최댓값 기록"""
+
+    def __init__(self, interval: float = 0.2):
+        self.interval = interval
+        self.max_threads = 0
+        self.max_rss = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="loadtest-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.max_threads = max(self.max_threads, threading.active_count())
+            self.max_rss = max(self.max_rss, rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> "ResourceSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def simulate_session(index: int, args, results: Dict):
+    """세션 하나: 첫 화면을 그린 뒤 정해진 턴 수만큼 대화"""
+    try:
+        at = new_session(args.timeout, with_secrets=False)
+        started = time.perf_counter()
+        at.run()
+        results["rerun_seconds"].append(time.perf_counter() - started)
+        for turn in range(args.turns):
+            prompt = DEFAULT_PROMPTS[turn % len(DEFAULT_PROMPTS)]
+            if not prompt.endswith("?"):
+                prompt = f"{prompt} (load {index + 1}-{turn + 1}-{time.monotonic_ns()})"
+            run_turn(at, prompt, args.timeout, args.poll_interval, results)
+            results["completed_turns"].append(1)
+        results["errors"].extend(str(e.value) for e in at.exception)
+    except Exception as e:
+        results["errors"].append(f"session {index + 1}: {e!r}")
+
+
+def run_level(concurrency: int, args) -> Dict:
+    results: Dict[str, List] = {"turn_seconds": [], "time_to_images": [], "rerun_seconds": [],
+                                "completed_turns": [], "errors": []}
+    sessions = [
+        threading.Thread(target=simulate_session, args=(n, args, results), name=f"session-{n + 1}")
+        for n in range(concurrency)
+    ]
+    with ResourceSampler() as sampler:
+        started = time.perf_counter()
+        for session in sessions:
+            session.start()
+        for session in sessions:
+            session.join()
+        elapsed = time.perf_counter() - started
+
+    # 채팅 입력 rerun도 사용자가 기다리는 rerun이므로 함께 집계
+    reruns = results["rerun_seconds"] + results["turn_seconds"]
+    return {
+        "concurrency": concurrency,
+        "elapsed_seconds": round(elapsed, 3),
+        "completed_turns": len(results["completed_turns"]),
+        "throughput_turns_per_second": round(len(results["completed_turns"]) / elapsed, 4),
+        "rerun_seconds": summarize(reruns),
+        "turn_seconds": summarize(results["turn_seconds"]),
+        "time_to_images": summarize(results["time_to_images"]),
+        "max_threads": sampler.max_threads,
+        "max_rss_mb": round(sampler.max_rss / (1024 * 1024), 1),
+        "errors": results["errors"],
+    }
+
+
+def capacity(levels: List[Dict], slo: float) -> int:
+    """rerun p95가 slo 이하이고 오류가 없는 가장 높은 동시 세션 수 (없으면 0)"""
+    passing = [level["concurrency"] for level in levels
+               if not level["errors"] and level["rerun_seconds"]["p95"] is not None
+               and level["rerun_seconds"]["p95"] <= slo]
+    return max(passing, default=0)
+
+
+def regressions(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """기준 결과보다 처리량이 줄거나 p95가 늘어난 단계 목록"""
+    previous = {level["concurrency"]: level for level in baseline["levels"]}
+    problems = []
+    for level in report["levels"]:
+        before = previous.get(level["concurrency"])
+        if before is None:
+            continue
+        if level["throughput_turns_per_second"] < before["throughput_turns_per_second"] * (1 - tolerance):
+            problems.append(f"N={level['concurrency']}: throughput {before['throughput_turns_per_second']}"
+                            f" -> {level['throughput_turns_per_second']}")
+        old_p95, new_p95 = before["rerun_seconds"]["p95"], level["rerun_seconds"]["p95"]
+        if old_p95 and new_p95 and new_p95 > old_p95 * (1 + tolerance):
+            problems.append(f"N={level['concurrency']}: rerun p95 {old_p95}s -> {new_p95}s")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", default="1,2,4,8,16", help="쉼표로 구분한 동시 세션 수 단계")
+    parser.add_argument("--turns", type=int, default=2, help="세션마다 보낼 메시지 수")
+    parser.add_argument("--delay", type=float, default=2.0, help="가짜 이미지 생성 시간(초)")
+    parser.add_argument("--images", type=int, default=4, help="작업당 이미지 수")
+    parser.add_argument("--size", type=int, default=512, help="이미지 한 변 픽셀 수")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="웹훅이 503으로 응답할 비율")
+    parser.add_argument("--run-latency", type=float, default=0.5, help="가짜 런 지연(초)")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="스트리밍 델타 간격(초)")
+    parser.add_argument("--chunk", type=int, default=4, help="델타 하나에 담을 글자 수")
+    parser.add_argument("--polling", action="store_true", help="콜백 대신 조회 웹훅 폴링 사용")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="이미지 대기 중 rerun 간격(초)")
+    parser.add_argument("--timeout", type=float, default=180.0, help="턴 하나의 최대 대기 시간(초)")
+    # 채팅 입력 rerun에는 가짜 런 지연(--run-latency × 2, 도구 호출 전후)이 포함되므로 그보다 커야 함
+    parser.add_argument("--slo", type=float, default=2.5, help="수용량 판단 기준 rerun p95(초)")
+    parser.add_argument("--output", help="결과를 JSON으로 저장할 경로")
+    parser.add_argument("--baseline", help="비교할 이전 결과 JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="퇴행으로 보지 않을 변화 폭 (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    openai_server = FakeOpenAIServer(0, {
+        "run_latency": args.run_latency,
+        "token_delay": args.token_delay,
+        "chunk": args.chunk,
+    }).start()
+    webhook_server = FakeWebhookServer(0, {
+        "delay": args.delay,
+        "image_count": args.images,
+        "image_size": args.size,
+        "failure_rate": args.failure_rate,
+        "seed": 0,
+    }).start()
+    configure_environment(args, openai_server.base_url, webhook_server.base_url)
+    share_apptest_globals()
+
+    # 세션 없이 측정 도구와 가짜 서버만 있는 상태 (단계별 스레드 수·RSS에 포함되어 있음)
+    harness = {"threads": threading.active_count(), "rss_mb": round(rss_bytes() / (1024 * 1024), 1)}
+    print(f"harness (included below): threads={harness['threads']} RSS={harness['rss_mb']} MB")
+
+    levels = []
+    print(f"{'N':>4}{'turns/s':>10}{'rerun p50':>11}{'rerun p95':>11}{'threads':>9}{'RSS MB':>9}{'errors':>8}")
+    for concurrency in [int(level) for level in args.levels.split(",") if level.strip()]:
+        level = run_level(concurrency, args)
+        levels.append(level)
+        rerun = level["rerun_seconds"]
+        print(f"{concurrency:>4}{level['throughput_turns_per_second']:>10}{rerun['p50'] or '-':>11}"
+              f"{rerun['p95'] or '-':>11}{level['max_threads']:>9}{level['max_rss_mb']:>9}{len(level['errors']):>8}")
+
+    report = {
+        "config": {key: getattr(args, key) for key in (
+            "levels", "turns", "delay", "images", "size", "failure_rate", "run_latency", "polling", "slo")},
+        "harness": harness,
+        "levels": levels,
+        "capacity": capacity(levels, args.slo),
+    }
+    print(f"capacity: {report['capacity']} concurrent sessions (rerun p95 <= {args.slo}s, no errors)")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            problems = regressions(report, json.load(f), args.tolerance)
+        for problem in problems:
+            print(f"regression: {problem}")
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
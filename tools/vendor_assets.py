@@ -0,0 +1,68 @@
+"""외부 브라우저 라이브러리를 assets/에 받아 두기 (앱은 실행 중에 CDN을 부르지 않음)
+
+- canvas-confetti 1.4.0 dist/confetti.browser.min.js → assets/canvas-confetti.min.js
+  패키지의 LICENSE(ISC) 전문을 /*! */ 머리 주석으로 붙여 저장함.
+  tools/build_assets.py는 *.min.js를 줄이지 않고 그대로 복사하므로 머리 주석이 빌드본에도 남음.
+
+받은 파일은 저장소에 커밋함. 버전을 올릴 때만 다시 실행하고, 출력된 sha256을 커밋 메시지에 남겨
+--sha256으로 같은 파일인지 다시 확인할 수 있게 함.
+
+사용법:
+    python tools/vendor_assets.py
+    python tools/vendor_assets.py --sha256 <이전에 기록한 해시>
+"""
+import argparse
+import hashlib
+import os
+import sys
+import urllib.request
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ASSET_DIR = os.path.join(ROOT_DIR, "assets")
+
+CONFETTI_VERSION = "1.4.0"
+CONFETTI_BASE_URL = f"https://cdn.jsdelivr.net/npm/canvas-confetti@{CONFETTI_VERSION}"
+CONFETTI_FILE = "canvas-confetti.min.js"
+
+
+def fetch(url: str) -> str:
+    with urllib.request.urlopen(url, timeout=30) as response:
+        return response.read().decode("utf-8")
+
+
+def license_header(name: str, version: str, license_text: str) -> str:
+    lines = [f"{name} v{version} | https://github.com/catdad/canvas-confetti", ""]
+    lines += license_text.strip().splitlines()
+    body = "\n".join(f" * {line}".rstrip() for line in lines)
+    return f"/*!\n{body}\n */\n"
+
+
+def vendor_confetti(output_dir: str = ASSET_DIR) -> str:
+    source = fetch(f"{CONFETTI_BASE_URL}/dist/confetti.browser.min.js")
+    license_text = fetch(f"{CONFETTI_BASE_URL}/LICENSE")
+    content = license_header("canvas-confetti", CONFETTI_VERSION, license_text) + source
+    if not content.endswith("\n"):
+        content += "\n"
+    path = os.path.join(output_dir, CONFETTI_FILE)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=ASSET_DIR, help="받은 파일을 둘 폴더")
+    parser.add_argument("--sha256", help="받은 파일이 이 해시와 다르면 종료 코드 1")
+    args = parser.parse_args()
+
+    path = vendor_confetti(args.output)
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    print(f"{os.path.relpath(path, ROOT_DIR)} sha256={digest}")
+    if args.sha256 and args.sha256 != digest:
+        print(f"expected sha256={args.sha256}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()